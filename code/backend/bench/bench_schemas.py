@@ -0,0 +1,138 @@
+"""
+Micro-benchmark: per-request CPU for parsing, validation and serialization.
+  old - json.loads + manual data.get(...) checks + validateAddress (eth_utils checksum),
+        jsonable_encoder + json.dumps (FastAPI's default JSONResponse)
+  new - json.loads + pydantic request model (schemas.py),
+        response model serialization (pydantic-core) + orjson (ORJSONResponse)
+Both do what FastAPI does per request, without the ASGI / routing part.
+
+Run from code/backend:  python bench/bench_schemas.py [--batch 1,20,200]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from eth_utils import to_checksum_address
+from fastapi.encoders import jsonable_encoder
+
+import schemas
+
+SENDER = "0x2222222222222222222222222222222222222222"
+BOT_WALLET = "0xb0b0b0b0b0b0b0b0b0b0b0b0b0b0b0b0b0b0b0b0"
+TX_HASH = "0x" + "ab" * 32
+
+
+def old_validate_address(user_address):
+    # functions_testnet.validateAddress before schemas.py
+    if not user_address:
+        return {"success": False, "msg": "Address is required"}
+    if not user_address.startswith("0x") or len(user_address) != 42:
+        return {"success": False, "msg": "Invalid address format"}
+    try:
+        to_checksum_address(user_address)
+    except Exception:
+        return {"success": False, "msg": "Invalid address"}
+    return {"success": True}
+
+
+def old_render(content) -> bytes:
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def new_render(model, content) -> bytes:
+    return orjson.dumps(model.model_validate(content).model_dump(mode="json"))
+
+
+# (name, request body, old handler, new request model, response, response model)
+def old_wallet(data):
+    wallet = data.get("wallet")
+    if not wallet:
+        raise ValueError("No wallet!")
+    if not old_validate_address(wallet)["success"]:
+        raise ValueError("Invalid address")
+    return wallet
+
+
+def old_verify(data):
+    fields = [data.get(f) for f in ("address_from", "address_to", "tx_hash", "amount")]
+    token = data.get("token", "ETH").upper()
+    if not all(fields):
+        raise ValueError("Missing parameters")
+    return fields, token
+
+
+def old_verify_batch(data):
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        raise ValueError("No items!")
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("Invalid item!")
+        row = {f: item.get(f) for f in ("address_from", "address_to", "tx_hash", "amount")}
+        row["token"] = (item.get("token") or "ETH").upper()
+        parsed.append(row)
+    return parsed
+
+
+def verify_item():
+    return {"address_from": SENDER, "address_to": BOT_WALLET, "tx_hash": TX_HASH, "token": "usdc", "amount": "1000000"}
+
+
+def verify_result():
+    return {"success": True, "verified": True, "tx_hash": TX_HASH, "token": "USDC", "block": 123456}
+
+
+USER = {
+    "success": True,
+    "info": {"wallet": SENDER, "id": 18, "created_at": "2025-12-20T20:16:41.898289+00:00", "practice_sent": 2,
+             "practice_received": 1, "completed_all": False, "completed_theory": True, "completed_practice": False},
+    "progress": {"id": 11, "wallet": SENDER, "created_at": "2025-12-20T20:16:41.997225+00:00", "theory": True,
+                 "faucet": True, "send": False, "receive": False, "mint": False, "launch": False},
+}
+
+
+def cases(batch_sizes):
+    yield ("get-user", {"wallet": SENDER}, old_wallet, schemas.WalletRequest, USER, schemas.UserResponse)
+    yield ("verify", verify_item(), old_verify, schemas.TestnetVerifyRequest, verify_result(), schemas.VerifyResponse)
+    for n in batch_sizes:
+        yield (f"verify-batch {n}", {"items": [verify_item() for _ in range(n)]}, old_verify_batch,
+               schemas.TestnetVerifyBatchRequest, {"success": True, "results": [verify_result() for _ in range(n)]},
+               schemas.VerifyBatchResponse)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", default="1,20,200")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':>16} {'old us/op':>12} {'new us/op':>12} {'speedup':>8}")
+    for name, body, old_handler, request_model, response, response_model in cases(
+            int(n) for n in args.batch.split(",")):
+        raw = json.dumps(body).encode()
+
+        def old():
+            old_handler(json.loads(raw))
+            return old_render(response)
+
+        def new():
+            request_model.model_validate(json.loads(raw))
+            return new_render(response_model, response)
+
+        assert json.loads(old()) == json.loads(new())
+
+        number = max(1, 20000 // len(raw))
+        old_time = min(timeit.repeat(old, number=number, repeat=args.repeat)) / number
+        new_time = min(timeit.repeat(new, number=number, repeat=args.repeat)) / number
+        print(f"{name:>16} {old_time * 1e6:>12.1f} {new_time * 1e6:>12.1f} {old_time / new_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: USDC Transfer matching on a receipt.
+  old - usdc_contract.events.Transfer().process_receipt(receipt) + loop over args
+  new - transfers.TransferMatcher on raw logs
+
+Run from code/backend:  python bench/bench_transfers.py [--logs 1,20,200,1000]
+"""
+import argparse
+import os
+import sys
+import timeit
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hexbytes import HexBytes
+from web3 import Web3
+
+import transfers
+from functions_mainnet import USDC_ADDRESS, USDC_ABI
+
+OUR_WALLET = "0x1111111111111111111111111111111111111111"
+SENDER = "0x2222222222222222222222222222222222222222"
+OTHER = "0x3333333333333333333333333333333333333333"
+OTHER_TOKEN = "0x4444444444444444444444444444444444444444"
+
+
+def make_log(i, token, sender, recipient, value):
+    return {
+        "address": Web3.to_checksum_address(token),
+        "topics": [
+            HexBytes(transfers.TRANSFER_TOPIC),
+            HexBytes(transfers.address_topic(sender)),
+            HexBytes(transfers.address_topic(recipient)),
+        ],
+        "data": HexBytes(value.to_bytes(32, "big")),
+        "logIndex": i,
+        "transactionIndex": 0,
+        "transactionHash": HexBytes(bytes(32)),
+        "blockHash": HexBytes(bytes(32)),
+        "blockNumber": 1,
+        "removed": False,
+    }
+
+
+def make_receipt(n_logs):
+    """n_logs transfers (half USDC to others, half other tokens), ours is the last one."""
+    logs = []
+    for i in range(n_logs - 1):
+        token = USDC_ADDRESS if i % 2 else OTHER_TOKEN
+        logs.append(make_log(i, token, SENDER, OTHER, 1_000 + i))
+    logs.append(make_log(n_logs - 1, USDC_ADDRESS, SENDER, OUR_WALLET, 5_000_000))
+    return {"status": 1, "blockNumber": 1, "logs": logs}
+
+
+def old_path(contract, receipt):
+    for event in contract.events.Transfer().process_receipt(receipt):
+        if event["args"]["to"].lower() == OUR_WALLET.lower():
+            return event["args"]["from"].lower() == SENDER.lower(), event["args"]["value"]
+    return None
+
+
+def new_path(receipt):
+    _, matches = transfers.get_matcher(USDC_ADDRESS, OUR_WALLET).match(receipt["logs"])
+    if not matches:
+        return None
+    from_topic, value = matches[0]
+    return from_topic == transfers.address_topic(SENDER), value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logs", default="1,20,200,1000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    contract = Web3().eth.contract(address=Web3.to_checksum_address(USDC_ADDRESS), abi=USDC_ABI)
+    warnings.simplefilter("ignore")  # process_receipt warns on every log it can't decode
+
+    print(f"{'logs':>6} {'old us/op':>12} {'new us/op':>12} {'speedup':>8}")
+    for n_logs in (int(n) for n in args.logs.split(",")):
+        receipt = make_receipt(n_logs)
+        assert old_path(contract, receipt) == new_path(receipt)
+
+        number = max(1, 2000 // n_logs)
+        old = min(timeit.repeat(lambda: old_path(contract, receipt), number=number, repeat=args.repeat)) / number
+        new = min(timeit.repeat(lambda: new_path(receipt), number=number, repeat=args.repeat)) / number
+        print(f"{n_logs:>6} {old * 1e6:>12.1f} {new * 1e6:>12.1f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
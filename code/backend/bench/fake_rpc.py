@@ -0,0 +1,230 @@
+"""
+Fake JSON-RPC node for benchmarks - canned receipts, transactions, logs and
+balances, answered after a configurable delay (one delay per HTTP request, so a
+batch costs one round trip like on a real node). Every network is served on its
+own path: http://host:port/testnet, http://host:port/mainnet.
+
+Standalone:  python bench/fake_rpc.py --port 8545 --latency 50
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import random
+
+from aiohttp import web
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+BALANCE_OF = "0x70a08231"
+EMPTY_BLOOM = "0x" + "00" * 256
+ZERO_HASH = "0x" + "00" * 32
+
+
+def _topic(address: str) -> str:
+    return "0x" + address.lower()[2:].rjust(64, "0")
+
+
+class FakeNode:
+    def __init__(self, chain_id: int, head: int = 1_000_000, balance: int = 10 ** 30):
+        self.chain_id = chain_id
+        self.head = head
+        self.balance = balance  # ETH and every token balance of every address
+        self.transactions = {}  # tx_hash -> (receipt, tx)
+        self.sent = 0
+        self._hashes = itertools.count(1)
+
+    def _new_hash(self) -> str:
+        return "0x" + hashlib.sha256(f"{self.chain_id}-{next(self._hashes)}".encode()).hexdigest()
+
+    def _add(self, sender: str, to: str, value: int, logs: list, confirmations: int) -> str:
+        tx_hash = self._new_hash()
+        block = hex(self.head - confirmations)
+        for i, log in enumerate(logs):
+            log.update({
+                "blockHash": ZERO_HASH,
+                "blockNumber": block,
+                "logIndex": hex(i),
+                "removed": False,
+                "transactionHash": tx_hash,
+                "transactionIndex": "0x0",
+            })
+        receipt = {
+            "blockHash": ZERO_HASH,
+            "blockNumber": block,
+            "contractAddress": None,
+            "cumulativeGasUsed": "0xc350",
+            "effectiveGasPrice": "0x3b9aca00",
+            "from": sender,
+            "gasUsed": "0xc350",
+            "logs": logs,
+            "logsBloom": EMPTY_BLOOM,
+            "status": "0x1",
+            "to": to,
+            "transactionHash": tx_hash,
+            "transactionIndex": "0x0",
+            "type": "0x2",
+        }
+        tx = {
+            "blockHash": ZERO_HASH,
+            "blockNumber": block,
+            "chainId": hex(self.chain_id),
+            "from": sender,
+            "gas": "0x186a0",
+            "gasPrice": "0x3b9aca00",
+            "maxFeePerGas": "0x77359400",
+            "maxPriorityFeePerGas": "0x3b9aca00",
+            "hash": tx_hash,
+            "input": "0x",
+            "nonce": "0x0",
+            "to": to,
+            "transactionIndex": "0x0",
+            "value": hex(value),
+            "type": "0x2",
+            "accessList": [],
+            "v": "0x0",
+            "yParity": "0x0",
+            "r": "0x1",
+            "s": "0x1",
+        }
+        self.transactions[tx_hash] = (receipt, tx)
+        return tx_hash
+
+    def add_token_transfer(self, token: str, sender: str, recipient: str, value: int,
+                           extra_logs: int = 0, confirmations: int = 20) -> str:
+        """Token transfer tx (+ extra_logs unrelated Transfer logs before it)."""
+        logs = [
+            {
+                "address": token,
+                "topics": [TRANSFER_TOPIC, _topic(sender), _topic("0x" + "ee" * 20)],
+                "data": "0x" + hex(1)[2:].rjust(64, "0"),
+            }
+            for _ in range(extra_logs)
+        ]
+        logs.append({
+            "address": token,
+            "topics": [TRANSFER_TOPIC, _topic(sender), _topic(recipient)],
+            "data": "0x" + hex(value)[2:].rjust(64, "0"),
+        })
+        return self._add(sender, token, 0, logs, confirmations)
+
+    def add_eth_transfer(self, sender: str, recipient: str, value: int, confirmations: int = 20) -> str:
+        return self._add(sender, recipient, value, [], confirmations)
+
+    def _logs(self, log_filter: dict) -> list:
+        from_block = int(log_filter.get("fromBlock", "0x0"), 16)
+        to_block = int(log_filter.get("toBlock", hex(self.head)), 16)
+        address = (log_filter.get("address") or "").lower()
+        topics = log_filter.get("topics") or []
+        found = []
+        for receipt, _ in self.transactions.values():
+            for log in receipt["logs"]:
+                if not from_block <= int(log["blockNumber"], 16) <= to_block:
+                    continue
+                if address and log["address"].lower() != address:
+                    continue
+                if any(t is not None and t != log["topics"][i] for i, t in enumerate(topics)):
+                    continue
+                found.append(log)
+        return found
+
+    def handle(self, method: str, params: list):
+        if method == "eth_chainId":
+            return hex(self.chain_id)
+        if method == "eth_blockNumber":
+            return hex(self.head)
+        if method == "eth_getTransactionReceipt":
+            return self.transactions.get(params[0], (None, None))[0]
+        if method == "eth_getTransactionByHash":
+            return self.transactions.get(params[0], (None, None))[1]
+        if method == "eth_getLogs":
+            return self._logs(params[0])
+        if method == "eth_getBalance":
+            return hex(self.balance)
+        if method == "eth_call":
+            if params[0].get("data", params[0].get("input", "")).startswith(BALANCE_OF):
+                return "0x" + hex(self.balance)[2:].rjust(64, "0")
+            return "0x"
+        if method == "eth_getTransactionCount":
+            return hex(self.sent)
+        if method == "eth_sendRawTransaction":
+            self.sent += 1
+            return "0x" + hashlib.sha256(params[0].encode()).hexdigest()
+        if method == "eth_gasPrice":
+            return "0x3b9aca00"
+        if method == "eth_maxPriorityFeePerGas":
+            return "0xf4240"
+        if method == "eth_estimateGas":
+            return "0x186a0"
+        if method == "eth_feeHistory":
+            blocks = int(params[0], 16) if isinstance(params[0], str) else params[0]
+            return {
+                "oldestBlock": hex(self.head - blocks + 1),
+                "baseFeePerGas": ["0x3b9aca00"] * (blocks + 1),
+                "gasUsedRatio": [0.5] * blocks,
+                "reward": [["0xf4240"]] * blocks,
+            }
+        raise KeyError(method)
+
+
+class FakeRpcServer:
+    def __init__(self, nodes: dict, latency: float = 0.0, jitter: float = 0.0):
+        """nodes = {"testnet": FakeNode, ...}, latency/jitter in seconds"""
+        self.nodes = nodes
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.calls = 0
+        self._runner = None
+
+    def _answer(self, node: FakeNode, call: dict) -> dict:
+        self.calls += 1
+        answer = {"jsonrpc": "2.0", "id": call.get("id")}
+        try:
+            answer["result"] = node.handle(call["method"], call.get("params") or [])
+        except KeyError:
+            answer["error"] = {"code": -32601, "message": f"method {call.get('method')} not found"}
+        return answer
+
+    async def handle(self, request: web.Request) -> web.Response:
+        node = self.nodes.get(request.match_info["network"])
+        if node is None:
+            raise web.HTTPNotFound()
+        body = await request.json()
+        self.requests += 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if isinstance(body, list):
+            return web.json_response([self._answer(node, call) for call in body])
+        return web.json_response(self._answer(node, body))
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts serving, returns the base url (http://host:port)."""
+        app = web.Application()
+        app.router.add_post("/{network}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+        self._runner = None
+
+
+async def _serve(port: int, latency: float):
+    server = FakeRpcServer({"mainnet": FakeNode(8453), "testnet": FakeNode(84532)}, latency=latency)
+    url = await server.start(port=port)
+    print(f"Fake RPC on {url}/mainnet and {url}/testnet")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--latency", type=float, default=0, help="ms per request")
+    args = parser.parse_args()
+    asyncio.run(_serve(args.port, args.latency / 1000))
@@ -0,0 +1,31 @@
+"""
+In-memory stand-in for Supabase: the SQLite backend on an in-memory database,
+with a fixed delay per call to model the PostgREST round trip. The delay blocks
+like the (sync) supabase client does, so it stalls the event loop the same way.
+"""
+import time
+from collections import Counter
+
+import storage
+
+
+class FakeSupabase(storage.Storage):
+    def __init__(self, latency: float = 0.0):
+        self.backend = storage.SqliteStorage(":memory:")
+        self.latency = latency  # seconds per call
+        self.calls = Counter()
+
+
+def _delegate(name):
+    def method(self, *args, **kwargs):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return getattr(self.backend, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+for _name, _value in list(vars(storage.Storage).items()):
+    if callable(_value) and not _name.startswith("_"):
+        setattr(FakeSupabase, _name, _delegate(_name))
@@ -0,0 +1,205 @@
+"""
+Load test of the FastAPI app against local stand-ins - no Supabase, no public RPC.
+The app runs in-process (httpx ASGI transport, lifespan included), storage is
+bench/fake_storage.FakeSupabase, both networks point at bench/fake_rpc.
+
+Run from code/backend:
+  python bench/loadtest.py
+  python bench/loadtest.py --scenarios get-user,verify -n 2000 -c 50 --rpc-latency 80 --db-latency 30
+  python bench/loadtest.py --json > before.json
+
+Per scenario: requests/s, error count and latency percentiles (ms). Faucet
+scenarios measure the endpoint only; the queued payouts are drained afterwards
+and reported as "payouts".
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("init-user", "get-user", "update_field", "verify", "send-test", "drip-eth")
+
+# throwaway key, only ever signs for the fake node
+BENCH_KEY = "0x" + "42" * 32
+BOT_WALLET = "0x" + "b0" * 20
+
+
+def wallet(prefix: int, i: int) -> str:
+    return "0x" + f"{prefix:02x}" + f"{i:038x}"
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[k]
+
+
+async def run_scenario(client, path: str, payloads: list, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    items = iter(payloads)
+
+    async def worker():
+        nonlocal errors
+        for payload in items:
+            start = time.perf_counter()
+            response = await client.post(path, json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400 or response.json().get("success") is False:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        **{f"p{p}_ms": round(percentile(latencies, p) * 1000, 2) for p in (50, 90, 99)},
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def main(args):
+    from fake_rpc import FakeNode, FakeRpcServer
+
+    nodes = {"mainnet": FakeNode(8453), "testnet": FakeNode(84532)}
+    rpc = FakeRpcServer(nodes, latency=args.rpc_latency / 1000, jitter=args.rpc_jitter / 1000)
+    rpc_url = await rpc.start()
+
+    # env has to be in place before the app modules read it
+    os.environ.update({
+        "MAINNET_RPC_URL": f"{rpc_url}/mainnet",
+        "TESTNET_RPC_URL": f"{rpc_url}/testnet",
+        "PRIVATE_KEY": BENCH_KEY,
+        "MY_WALLET": BOT_WALLET,
+        "MM_WALLET": BOT_WALLET,
+        "INDEXER_ENABLED": "false",
+        "VERIFY_CACHE_PERSIST": "false",
+    })
+
+    import httpx
+    from fake_storage import FakeSupabase
+    import storage, ratelimit, payouts, functions_testnet
+    import main as app_main
+
+    fake_db = FakeSupabase(latency=args.db_latency / 1000)
+    storage.set_storage(fake_db)
+    # the load comes from a handful of wallets - rate limits would only measure 429s
+    for endpoint in ratelimit.LIMITS:
+        ratelimit.LIMITS[endpoint] = (10 ** 9, 10 ** 9, 10 ** 9, 10 ** 9)
+
+    n = args.requests
+    setup = fake_db.backend  # no fake latency while preparing data
+    payloads = {}
+    for name in args.scenarios:
+        prefix = SCENARIOS.index(name) + 1
+        wallets = [wallet(prefix, i) for i in range(n)]
+        if name in ("get-user", "update_field", "send-test"):
+            for w in wallets:
+                setup.add_user(w)
+                if name == "send-test":
+                    setup.update_field("USER_INFO", "practice_sent", w, 10 ** 6)
+
+        if name in ("init-user", "get-user"):
+            payloads[name] = [{"wallet": w} for w in wallets]
+        elif name == "update_field":
+            payloads[name] = [
+                {"wallet": w, "table_name": "USER_PROGRESS", "field_name": "lab1", "value": True}
+                for w in wallets
+            ]
+        elif name == "verify":
+            testnet = nodes["testnet"]
+            payloads[name] = []
+            for w in wallets:
+                tx_hash = testnet.add_token_transfer(functions_testnet.USDC_ADDRESS, w, BOT_WALLET, 1_000000,
+                                                     extra_logs=args.extra_logs)
+                payloads[name].append({"address_from": w, "address_to": BOT_WALLET, "tx_hash": tx_hash,
+                                       "token": "USDC", "amount": "1000000"})
+        else:
+            payloads[name] = [{"wallet": w} for w in wallets]
+
+    paths = {
+        "init-user": "/api/database/init-user",
+        "get-user": "/api/database/get-user",
+        "update_field": "/api/database/update_field",
+        "verify": "/api/testnet/verify-transaction",
+        "send-test": "/api/testnet/send-test",
+        "drip-eth": "/api/testnet/drip-eth",
+    }
+
+    results = {}
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.app.router.lifespan_context(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for name in args.scenarios:
+                rpc.requests = rpc.calls = 0
+                fake_db.calls.clear()
+                result = await run_scenario(client, paths[name], payloads[name], args.concurrency)
+
+                if name in ("send-test", "drip-eth"):
+                    # wait for the queue to drain, payout results are not part of the latency
+                    deadline = time.monotonic() + 60
+                    while time.monotonic() < deadline:
+                        jobs = list(payouts._jobs.values())
+                        if all(job["status"] in payouts.DONE_STATUSES for job in jobs):
+                            break
+                        await asyncio.sleep(0.05)
+                    statuses = [job["status"] for job in payouts._jobs.values()]
+                    result["payouts"] = {s: statuses.count(s) for s in set(statuses)}
+                    # every accepted payout has to leave the queue - a dead worker leaves them queued
+                    result["payouts_stuck"] = statuses.count("queued") + statuses.count("sending")
+                    payouts._jobs.clear()
+
+                result["rpc_requests"] = rpc.requests
+                result["rpc_calls"] = rpc.calls
+                result["db_calls"] = sum(fake_db.calls.values())
+                results[name] = result
+
+    await rpc.stop()
+    return results
+
+
+def print_table(results: dict):
+    columns = ("requests", "errors", "rps", "p50_ms", "p90_ms", "p99_ms", "max_ms", "rpc_calls", "db_calls")
+    print(f"{'scenario':<14}" + "".join(f"{c:>11}" for c in columns))
+    for name, result in results.items():
+        print(f"{name:<14}" + "".join(f"{result[c]:>11}" for c in columns))
+        if "payouts" in result:
+            print(f"{'':<14}payouts: {result['payouts']}")
+            if result["payouts_stuck"]:
+                print(f"{'':<14}ERROR: {result['payouts_stuck']} payouts never reached 'sent'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("-n", "--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("-c", "--concurrency", type=int, default=20)
+    parser.add_argument("--rpc-latency", type=float, default=50, help="ms per RPC round trip")
+    parser.add_argument("--rpc-jitter", type=float, default=10, help="ms, uniform on top of --rpc-latency")
+    parser.add_argument("--db-latency", type=float, default=20, help="ms per storage call")
+    parser.add_argument("--extra-logs", type=int, default=0, help="unrelated Transfer logs per verified receipt")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(main(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+    if any(result.get("payouts_stuck") for result in results.values()):
+        sys.exit(1)
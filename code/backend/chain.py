@@ -0,0 +1,226 @@
+import asyncio
+import itertools
+import os
+
+import aiohttp
+import coldstart
+import metrics
+import rpcpool
+
+# Async chain access - one AsyncWeb3 client per network, all of them sharing
+# one keep-alive aiohttp connection pool, so RPC calls never block the event loop.
+# Every request goes through the network's provider pool (rpcpool.py).
+# web3 itself is imported on first use only (it's the heaviest import of the app
+# and endpoints like get-user never need it).
+
+
+def _rpc_urls(prefix: str, defaults: list) -> list:
+    """MAINNET_RPC_URLS=url1,url2 (pool) or MAINNET_RPC_URL=url (single node), else defaults."""
+    urls = os.getenv(f"{prefix}_RPC_URLS")
+    if urls:
+        return [url.strip() for url in urls.split(",") if url.strip()]
+    url = os.getenv(f"{prefix}_RPC_URL")
+    return [url] if url else defaults
+
+
+NETWORKS = {
+    "mainnet": {  # Base Mainnet
+        "rpc_urls": _rpc_urls("MAINNET", ["https://base.publicnode.com", "https://mainnet.base.org"]),
+        "chain_id": 8453,
+    },
+    "testnet": {  # Base Sepolia
+        "rpc_urls": _rpc_urls("TESTNET", ["https://sepolia.base.org", "https://base-sepolia-rpc.publicnode.com"]),
+        "chain_id": 84532,
+    },
+}
+
+POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "100"))
+POOL_SIZE_PER_HOST = int(os.getenv("RPC_POOL_SIZE_PER_HOST", "50"))
+KEEPALIVE_TIMEOUT = float(os.getenv("RPC_KEEPALIVE_TIMEOUT", "30"))
+REQUEST_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "15"))
+BATCH_SIZE = int(os.getenv("RPC_BATCH_SIZE", "50"))  # max calls in one JSON-RPC batch request
+
+_session = None
+_pools = {}
+_clients = {}
+_contracts = {}
+_lock = asyncio.Lock()
+_ids = itertools.count(1)
+
+
+async def get_session():
+    """Shared aiohttp session (keep-alive connection pool) for all RPC traffic."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_SIZE,
+            limit_per_host=POOL_SIZE_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        )
+    return _session
+
+
+def get_pool(network: str) -> rpcpool.Pool:
+    pool = _pools.get(network)
+    if pool is None:
+        pool = _pools[network] = rpcpool.Pool(network, NETWORKS[network]["rpc_urls"], get_session)
+    return pool
+
+
+async def rpc_request(network: str, payload):
+    """One JSON-RPC request (single call or batch) through the pool - reads hedged, writes to one node."""
+    calls = payload if isinstance(payload, list) else [payload]
+    read = all(call["method"] in rpcpool.READ_METHODS for call in calls)
+    return await get_pool(network).request(payload, read)
+
+
+async def get_w3(network: str):
+    """AsyncWeb3 client for 'mainnet' / 'testnet', created on first use."""
+    w3 = _clients.get(network)
+    if w3 is not None:
+        return w3
+
+    async with _lock:
+        w3 = _clients.get(network)
+        if w3 is None:
+            with coldstart.timed(f"web3 {network}"):
+                from web3 import AsyncWeb3
+
+                provider = _pool_provider(network)
+                w3 = AsyncWeb3(provider)
+            _clients[network] = w3
+    return w3
+
+
+def _pool_provider(network: str):
+    """
+    web3 provider that sends every call through the network's provider pool
+    and times it (rpc_call_duration_seconds, network + method).
+    """
+    from web3 import AsyncHTTPProvider
+
+    class PoolProvider(AsyncHTTPProvider):
+        async def make_request(self, method, params):
+            payload = {"jsonrpc": "2.0", "id": next(_ids), "method": method, "params": params}
+            with metrics.timer("rpc_call_duration_seconds", f"rpc.{method}", network=network, method=method):
+                return await rpc_request(network, payload)
+
+    return PoolProvider(NETWORKS[network]["rpc_urls"][0])
+
+
+async def get_contract(network: str, address: str, abi: list):
+    """Contract objects are cached too - building them is not free."""
+    key = (network, address.lower(), id(abi))
+    contract = _contracts.get(key)
+    if contract is None:
+        w3 = await get_w3(network)
+        with coldstart.timed(f"contract {network} {address}"):
+            contract = w3.eth.contract(address=w3.to_checksum_address(address), abi=abi)
+        _contracts[key] = contract
+    return contract
+
+
+async def rpc_batch(network: str, calls: list):
+    """
+    Raw JSON-RPC batch: calls = [(method, params), ...] -> list of results in the same order.
+    Calls are chunked by BATCH_SIZE and chunks go out concurrently.
+    A call that errors or returns null gives None.
+    """
+    async def send_chunk(chunk):
+        payload = [
+            {"jsonrpc": "2.0", "id": next(_ids), "method": method, "params": params}
+            for method, params in chunk
+        ]
+        methods = {method for method, _ in chunk}
+        label = methods.pop() if len(methods) == 1 else "batch"
+        with metrics.timer("rpc_call_duration_seconds", f"rpc.{label}", network=network, method=label):
+            # the pool rejects non-list answers (whole batch refused) and tries another node
+            body = await rpc_request(network, payload)
+
+        by_id = {item.get("id"): item.get("result") for item in body}
+        return [by_id.get(req["id"]) for req in payload]
+
+    chunks = [calls[i:i + BATCH_SIZE] for i in range(0, len(calls), BATCH_SIZE)]
+    results = await asyncio.gather(*(send_chunk(chunk) for chunk in chunks))
+    return [result for chunk in results for result in chunk]
+
+
+async def receipt_statuses(network: str, tx_hashes: list) -> dict:
+    """{tx_hash: 1 / 0 / None} in one JSON-RPC batch, None = not mined yet."""
+    if not tx_hashes:
+        return {}
+    receipts = await rpc_batch(network, [("eth_getTransactionReceipt", [h]) for h in tx_hashes])
+    return {
+        tx_hash: int(receipt["status"], 16) if receipt is not None else None
+        for tx_hash, receipt in zip(tx_hashes, receipts)
+    }
+
+
+def _receipt(raw: dict) -> dict:
+    """
+    Raw JSON-RPC receipt -> status / blockNumber as ints, like web3's get_transaction_receipt.
+    Logs stay hex strings (transfers.py matches both), addresses stay as the node sent them.
+    """
+    return dict(raw, status=int(raw["status"], 16), blockNumber=int(raw["blockNumber"], 16))
+
+
+def _transaction(raw: dict) -> dict:
+    """Raw JSON-RPC transaction -> blockNumber / nonce / value as ints, like web3's get_transaction."""
+    formatted = dict(raw)
+    for field in ("blockNumber", "nonce", "value"):
+        if raw.get(field) is not None:
+            formatted[field] = int(raw[field], 16)
+    return formatted
+
+
+async def fetch_transactions(network: str, tx_hashes: list):
+    """
+    Receipts + transactions for many hashes (plus the head block) in as few
+    round trips as possible. Returns ({tx_hash: (receipt, tx)}, head).
+    Pending / unknown hashes map to (None, None).
+    """
+    unique = list(dict.fromkeys(tx_hashes))
+    calls = [("eth_blockNumber", [])]
+    for tx_hash in unique:
+        calls.append(("eth_getTransactionReceipt", [tx_hash]))
+        calls.append(("eth_getTransactionByHash", [tx_hash]))
+
+    results = await rpc_batch(network, calls)
+    head = int(results[0], 16) if results[0] is not None else None
+
+    found = {}
+    for i, tx_hash in enumerate(unique):
+        raw_receipt = results[1 + 2 * i]
+        raw_tx = results[2 + 2 * i]
+        if raw_receipt is None or raw_tx is None:
+            found[tx_hash] = (None, None)
+            continue
+        # the fields the verify checks read come out the same as from the single web3 calls
+        found[tx_hash] = (_receipt(raw_receipt), _transaction(raw_tx))
+    return found, head
+
+
+def to_checksum_address(address: str) -> str:
+    """Checksum without pulling in web3 (eth_utils is a lot lighter)."""
+    from eth_utils import to_checksum_address as checksum
+    return checksum(address)
+
+
+def chain_id(network: str) -> int:
+    return NETWORKS[network]["chain_id"]
+
+
+async def close():
+    """Close the shared pool (app shutdown)."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _pools.clear()
+    _clients.clear()
+    _contracts.clear()
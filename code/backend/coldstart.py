@@ -0,0 +1,79 @@
+import importlib.abc
+import importlib.machinery
+import sys
+import time
+from contextlib import contextmanager
+
+# Cold-start profiling for the serverless deployment.
+# Imported first by main.py: from then on every top-level module import is timed
+# (total = with its own imports, self = without them), and lazily created clients
+# report their init cost through timed(). See /api/startup-timing.
+STARTED = time.perf_counter()
+
+imports = {}  # module -> {"total_ms", "self_ms"}
+inits = {}  # name -> ms
+_stack = []
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+
+    def __getattr__(self, attr):
+        # get_resource_reader, is_package, ... of the real loader
+        return getattr(self.loader, attr)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        _stack.append(0.0)
+        try:
+            self.loader.exec_module(module)
+        finally:
+            nested = _stack.pop()
+            total = time.perf_counter() - start
+            if _stack:
+                _stack[-1] += total
+            imports[self.name] = {"total_ms": round(total * 1000, 2), "self_ms": round((total - nested) * 1000, 2)}
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        # top-level modules only, submodules count into their package
+        if "." in name or name in imports:
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(name, path)
+        if spec is None or spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return None
+        spec.loader = _TimedLoader(name, spec.loader)
+        return spec
+
+
+def install():
+    if not any(isinstance(finder, _TimingFinder) for finder in sys.meta_path):
+        sys.meta_path.insert(0, _TimingFinder())
+
+
+@contextmanager
+def timed(name: str):
+    """Init cost of a lazily created client, e.g. with timed("web3 mainnet"): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        inits[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def report() -> dict:
+    ordered = sorted(imports.items(), key=lambda item: item[1]["self_ms"], reverse=True)
+    return {
+        "uptime_ms": round((time.perf_counter() - STARTED) * 1000, 2),
+        "imports": [{"module": name, **times} for name, times in ordered],
+        "init": [{"name": name, "ms": ms} for name, ms in sorted(inits.items(), key=lambda item: -item[1])],
+    }
+
+
+install()
@@ -0,0 +1,28 @@
+from progress import FIELDS, SECTION_MASKS, BITS
+
+# Course completion rules - each USER_INFO flag is one section mask of progress.Progress.
+# progress field -> completion flag of its section
+FIELD_SECTION = {
+    field: flag for flag, section_mask in SECTION_MASKS.items()
+    for field in FIELDS if BITS[field] & section_mask
+}
+
+
+def evaluate(info: dict, progress, changed_fields=None) -> dict:
+    """
+    USER_INFO flags that should flip to True, e.g. {"completed_security": True, "completed_all": True}.
+    progress is a progress.Progress. With changed_fields only the sections of those fields are re-checked.
+    """
+    if changed_fields is None:
+        flags = SECTION_MASKS.keys()
+    else:
+        flags = {FIELD_SECTION[field] for field in changed_fields if field in FIELD_SECTION}
+
+    updates = {}
+    for flag in flags:
+        if not info[flag] and progress.is_complete(flag):
+            updates[flag] = True
+
+    if not info["completed_all"] and all(updates.get(flag) or info[flag] for flag in SECTION_MASKS):
+        updates["completed_all"] = True
+    return updates
@@ -0,0 +1,5 @@
+from dotenv import load_dotenv
+
+# .env is loaded once, by the `import config` in main.py - it comes before every
+# module that reads os.getenv at import time, so they don't import it themselves.
+load_dotenv()
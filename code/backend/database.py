@@ -1,158 +1,315 @@
-import os
+from storage import get_storage
+from progress import Progress, BITS
+import completion
+import metrics
+import versions
+import events
 
-from sqlalchemy import null
-from supabase import create_client, Client
-from dotenv import load_dotenv
+# All DB access goes through the storage backend (storage.py, STORAGE_BACKEND=supabase/sqlite).
+# Functions here keep the old error handling - None instead of exceptions where callers expect it.
+# USER_PROGRESS is stored as one bitset column (progress.py), rows handed out from here
+# still have one boolean per lesson.
+# Writes of a wallet's rows drop its cached version (versions.py) - the DB bumps it.
+# Progress / completion changes are pushed to the wallet's event stream (events.py).
 
-load_dotenv()
+class _TimedStorage:
+    """Storage backend whose calls are timed (db_call_duration_seconds, op + table)."""
 
-url: str = os.getenv("SUPABASE_URL")
-key: str = os.getenv("SUPABASE_SECRET_KEY")
-supabase: Client = create_client(url, key)
+    __slots__ = ("table_name",)
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+
+    def __getattr__(self, op):
+        method = getattr(get_storage(), op)
+        table_name = self.table_name
+
+        def call(*args, **kwargs):
+            with metrics.timer("db_call_duration_seconds", f"db.{op}.{table_name}", op=op, table=table_name):
+                return method(*args, **kwargs)
+        return call
+
+
+def db(table_name: str):
+    return _TimedStorage(table_name)
 
-# BASIC DB FUNCTIONS
-def init_user_info(wallet: str) :
-    user_info = {
-        "wallet": wallet,
-        "practice_sent": 0,
-        "practice_received": 0,
-        "completed_theory": False,
-        "completed_practice": False,
-        "completed_security": False,
-        "completed_all": False,
-        "claimed_nft": False,
-        "last_drip": None
-    }
-    response = supabase.table("USER_INFO").insert(user_info).execute()
-    return response.data
-
-def init_user_progress(wallet: str) :
-    user_progress = {
-        "wallet": wallet,
-        "faucet": False,
-        "send": False,
-        "receive": False,
-        "mint": False,
-        "launch": False,
-        "lab1": False,
-        "lab2": False,
-        "lab3": False,
-        "lab4": False,
-        "lab5": False,
-        "theory1": False,
-        "theory2": False,
-        "theory3": False,
-        "theory4": False,
-        "theory5": False
-    }
-    response = supabase.table("USER_PROGRESS").insert(user_progress).execute()
-    return response.data
 
+def expand_progress(row):
+    """{..., 'flags': 5} -> {..., 'faucet': True, 'send': False, 'receive': True, ...}"""
+    if row is None:
+        return None
+    row = dict(row)
+    row.update(Progress(row.pop("flags", 0)).to_dict())
+    return row
+
+# BASIC DB FUNCTIONS
 def get_user_info(wallet: str):
-    response = (
-        supabase.table("USER_INFO").select("*").eq("wallet", wallet)
-        .maybe_single()  # returns Dict / None
-        .execute()
-    )
-    return response.data
+    return db("USER_INFO").get_user_info(wallet)
 
 def get_user_progress(wallet: str):
-    response = (
-        supabase.table("USER_PROGRESS").select("*").eq("wallet", wallet).maybe_single().execute()
-    )
-    return response.data
+    return expand_progress(db("USER_PROGRESS").get_user_progress(wallet))
 
 def get_field(table_name: str, field_name: str, wallet: str):
-    response = (
-        supabase.table(table_name)
-        .select(field_name).eq("wallet", wallet).maybe_single() .execute()
-    )
-    row = response.data
-    if row is None:
-        return None
-    return row[field_name]
+    if table_name == "USER_PROGRESS" and field_name in BITS:
+        flags = db("USER_PROGRESS").get_field("USER_PROGRESS", "flags", wallet)
+        if flags is None:
+            return None
+        return Progress(flags).has(field_name)
+    return db(table_name).get_field(table_name, field_name, wallet)
 
 def update_field(table_name: str, field_name: str, wallet: str, value):
     try:
-        response = (
-            supabase.table(table_name).update({field_name: value}).eq("wallet", wallet).execute()
-        )
-        return response.data
+        if table_name == "USER_PROGRESS":
+            # lesson flag -> atomic bit set / clear
+            bit = BITS.get(field_name)
+            if bit is None:
+                return None
+            if value:
+                rows = db("USER_PROGRESS").set_progress_flags(wallet, bit, 0)
+            else:
+                rows = db("USER_PROGRESS").set_progress_flags(wallet, 0, bit)
+            if rows:
+                events.publish(wallet, "progress", fields={field_name: bool(value)})
+            return [expand_progress(row) for row in rows]
+        return db(table_name).update_field(table_name, field_name, wallet, value)
     except Exception as e :
         return None
+    finally:
+        versions.forget(wallet)
+
+# several columns of one row in one write
+def update_fields(table_name: str, wallet: str, fields: dict):
+    try:
+        return db(table_name).update_fields(table_name, wallet, fields)
+    except Exception as e :
+        return None
+    finally:
+        versions.forget(wallet)
+
+# {table_name: {field_name: value}} for one wallet -> one write per table
+#returns: {table_name: updated rows}, None on error
+def patch_fields(wallet: str, changes: dict):
+    try:
+        updated = {}
+        for table_name, fields in changes.items():
+            if table_name == "USER_PROGRESS":
+                set_mask = clear_mask = 0
+                for field_name, value in fields.items():
+                    if value:
+                        set_mask |= BITS[field_name]
+                    else:
+                        clear_mask |= BITS[field_name]
+                rows = db("USER_PROGRESS").set_progress_flags(wallet, set_mask, clear_mask)
+                if rows:
+                    events.publish(wallet, "progress", fields={k: bool(v) for k, v in fields.items()})
+                updated[table_name] = [expand_progress(row) for row in rows]
+            else:
+                updated[table_name] = db(table_name).update_fields(table_name, wallet, fields)
+        return updated
+    except Exception as e :
+        return None
+    finally:
+        versions.forget(wallet)
 # SOPHISTICATED DB FUNCTIONS
 #returns: ([{'wallet': 'test_user', 'id': 18, 'created_at': '2025-12-20T20:16:41.898289+00:00', 'practice_sent': 0, 'practice_received': 0, 'completed_all': False, 'completed_theory': False, 'completed_practice': False}], [{'id': 11, 'wallet': 'test_user', 'created_at': '2025-12-20T20:16:41.997225+00:00', 'theory': False, 'faucet': False, 'send': False, 'receive': False, 'mint': False, 'launch': False}])
 def add_user(wallet: str) :
     try:
-        row_info = init_user_info(wallet)
-        row_progress = init_user_progress(wallet)
-        return row_info, row_progress
+        row_info, row_progress = db("USER_INFO+USER_PROGRESS").add_user(wallet)
+        return row_info, [expand_progress(row) for row in row_progress]
 
     except Exception as e :
         return e
+    finally:
+        versions.forget(wallet)
 
 #returns: ({'wallet': 'test_user', 'id': 18, 'created_at': '2025-12-20T20:16:41.898289+00:00', 'practice_sent': 0, 'practice_received': 0, 'completed_all': False, 'completed_theory': False, 'completed_practice': False}, {'id': 11, 'wallet': 'test_user', 'created_at': '2025-12-20T20:16:41.997225+00:00', 'theory': False, 'faucet': False, 'send': False, 'receive': False, 'mint': False, 'launch': False})
+# None if the user doesn't exist, both rows come from one query
 def get_user(wallet: str):
     try:
-        info = get_user_info(wallet)
-        progress = get_user_progress(wallet)
-        return info, progress
+        since = versions.writes()
+        user = db("USER_SNAPSHOT").get_user(wallet)
+        if user is None:
+            return None
+        versions.remember(wallet, user_etag(user[0]), since)
+        return user[0], expand_progress(user[1])
     except Exception as e :
         return None
 
+def user_etag(info: dict) -> str:
+    return versions.etag(info["id"], info.get("version", 0))
+
+# ETag of the wallet's current state without reading its rows - from memory,
+# else one single-column query. None if the user doesn't exist / on error
+def get_user_version(wallet: str):
+    tag = versions.get(wallet)
+    if tag is not None:
+        return tag
+    try:
+        since = versions.writes()
+        row = db("USER_INFO").get_user_version(wallet)
+        if row is None:
+            return None
+        tag = versions.etag(*row)
+        versions.remember(wallet, tag, since)
+        return tag
+    except Exception as e:
+        return None
+
 #returns: {'progress_deleted': [{'id': 11, 'wallet': 'test_user', 'created_at': '2025-12-20T20:16:41.997225+00:00', 'theory': False, 'faucet': False, 'send': False, 'receive': False, 'mint': False, 'launch': False}], 'info_deleted': [{'wallet': 'test_user', 'id': 18, 'created_at': '2025-12-20T20:16:41.898289+00:00', 'practice_sent': 0, 'practice_received': 0, 'completed_all': False, 'completed_theory': False, 'completed_practice': False}]}
 def delete_user(wallet: str) :
     try:
-        prog_resp = (
-            supabase.table("USER_PROGRESS")
-            .delete().eq("wallet", wallet).execute()
-        )
-        info_resp = (
-            supabase.table("USER_INFO")
-            .delete().eq("wallet", wallet).execute()
-        )
-
-        return {
-            "progress_deleted": prog_resp.data,
-            "info_deleted": info_resp.data,
-        }
+        deleted = db("USER_INFO+USER_PROGRESS").delete_user(wallet)
+        deleted["progress_deleted"] = [expand_progress(row) for row in deleted["progress_deleted"]]
+        return deleted
     except Exception as e :
         return None
+    finally:
+        versions.forget(wallet)
+
+# atomic counter changes in one round trip, e.g.
+# increment_counters([("USER_INFO", wallet, {"practice_received": 1}), ("MY_WALLET", bot, {"balance-USDC": -1})])
+#returns: list of updated rows, None on error (nothing is changed then)
+def increment_counters(changes: list):
+    try:
+        tables = "+".join(sorted({change[0] for change in changes}))
+        return db(tables).increment_counters(changes)
+    except Exception as e:
+        return None
+    finally:
+        for change in changes:
+            versions.forget(change[1])
+
+# send-test: eligibility check and practice_received += 1 in one atomic write
+#returns: list with the updated row, [] if not eligible (nothing sent yet / limit reached), None on error
+def reserve_practice_payout(wallet: str):
+    try:
+        return db("USER_INFO").reserve_practice_payout(wallet)
+    except Exception as e:
+        return None
+    finally:
+        versions.forget(wallet)
 
-def check_completion(wallet: str):
+# changed_fields = USER_PROGRESS fields that just changed -> only their sections are re-checked
+#returns: dict of completion flags that flipped ({} if none), None on error
+def check_completion(wallet: str, changed_fields=None):
     try:
-        info, progress = get_user(wallet)
-        if not info["completed_practice"]:
-            if progress["faucet"] and progress["send"] and progress["receive"] and progress["mint"] and progress["launch"]:
-                update_field("USER_INFO", "completed_practice", wallet, True)
-                info["completed_practice"] = True
+        info, progress_row = db("USER_SNAPSHOT").get_user(wallet)
+        # section checks are single mask comparisons on the bitset
+        updates = completion.evaluate(info, Progress(progress_row["flags"]), changed_fields)
+        if updates:
+            # all flags in one write
+            if update_fields("USER_INFO", wallet, updates) is None:
+                return None
+            events.publish(wallet, "completion", sections=updates)
+        return updates
 
-        if not info["completed_security"]:
-            if progress["lab1"] and progress["lab2"] and progress["lab3"] and progress["lab4"] and progress["lab5"]:
-                update_field("USER_INFO", "completed_security", wallet, True)
-                info["completed_security"] = True
+    except Exception as e:
+        return None
 
-        if not info["completed_theory"]:
-            if progress["theory1"] and progress["theory2"] and progress["theory3"] and progress["theory4"] and progress["theory5"]:
-                update_field("USER_INFO", "completed_theory", wallet, True)
-                info["completed_theory"] = True
+def get_my_donations():
+    try:
+        return db("MY_WALLET").get_my_donations()
+    except Exception as e:
+        return None
 
-        if not info["completed_all"] and info["completed_practice"] and info["completed_theory"] and info["completed_security"]:
-             update_field("USER_INFO", "completed_all", wallet, True)
 
-        return True
+# VERIFICATION CACHE (persistent tier, see verify_cache.py)
+def get_verification(key: str):
+    try:
+        return db("TX_VERIFICATION").get_verification(key)
+    except Exception as e:
+        return None
 
+def save_verification(key: str, network: str, tx_hash: str, result: dict):
+    try:
+        return db("TX_VERIFICATION").save_verification(key, network, tx_hash, result)
     except Exception as e:
         return None
 
-def get_my_donations():
+
+# MINT JOBS (see mints.py)
+#returns the reserved job row, None if the wallet has an active mint already or on error
+def reserve_mint_job(wallet: str):
+    try:
+        return db("MINT_JOBS").reserve_mint_job(wallet)
+    except Exception as e:
+        return None
+
+def set_mint_job(job_id: int, status: str, tx_hash: str = None):
+    try:
+        return db("MINT_JOBS").set_mint_job(job_id, status, tx_hash)
+    except Exception as e:
+        return None
+
+def update_mint_job(tx_hash: str, status: str):
+    try:
+        return db("MINT_JOBS").update_mint_job(tx_hash, status)
+    except Exception as e:
+        return None
+
+#returns latest mint job of the wallet or None
+def get_mint_job(wallet: str):
+    try:
+        return db("MINT_JOBS").get_mint_job(wallet)
+    except Exception as e:
+        return None
+
+def get_pending_mints():
+    try:
+        return db("MINT_JOBS").get_pending_mints()
+    except Exception as e:
+        return None
+
+
+# PAYOUT JOBS (see payouts.py)
+def save_payout_jobs(jobs: list):
+    try:
+        return db("PAYOUT_JOBS").save_payout_jobs(jobs)
+    except Exception as e:
+        return None
+
+#returns: list of the claimed rows, None on error
+def claim_payout_jobs(job_ids: list):
+    try:
+        return db("PAYOUT_JOBS").claim_payout_jobs(job_ids)
+    except Exception as e:
+        return None
+
+def get_payout_job(job_id: str):
+    try:
+        return db("PAYOUT_JOBS").get_payout_job(job_id)
+    except Exception as e:
+        return None
+
+def get_queued_payouts(before: str):
+    try:
+        return db("PAYOUT_JOBS").get_queued_payouts(before)
+    except Exception as e:
+        return None
+
+
+# IDEMPOTENCY KEYS (see idempotency.py)
+#returns: (created, row), None on error
+def claim_idempotency_key(key: str, request_hash: str, lease: float):
+    try:
+        return db("IDEMPOTENCY_KEYS").claim_idempotency_key(key, request_hash, lease)
+    except Exception as e:
+        return None
+
+def extend_idempotency_key(key: str, lease: float):
+    try:
+        return db("IDEMPOTENCY_KEYS").extend_idempotency_key(key, lease)
+    except Exception as e:
+        return None
+
+def finish_idempotency_key(key: str, status_code: int, response):
+    try:
+        return db("IDEMPOTENCY_KEYS").finish_idempotency_key(key, status_code, response)
+    except Exception as e:
+        return None
+
+def release_idempotency_key(key: str):
     try:
-        response = (
-            supabase.table("MY_WALLET").select("*")
-            .execute()
-        )
-        prev_amount = response.data[0]["real_amount"]
-        prev_count = response.data[0]["real_count"]
-        return prev_count, prev_amount
+        return db("IDEMPOTENCY_KEYS").release_idempotency_key(key)
     except Exception as e:
-        return None
\ No newline at end of file
+        return None
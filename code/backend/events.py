@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import os
+
+import orjson
+
+import metrics
+
+# In-process pub/sub for the per-wallet event stream (GET /api/events/{wallet}, SSE).
+# Publishers (database.py, payouts.py, mints.py) call publish(); if nobody listens
+# to the wallet it's one dict lookup. Every subscriber has its own bounded queue -
+# a client that doesn't keep up loses its backlog and gets one "resync" event
+# (= re-read the state) instead of slowing down the publisher or the others.
+QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+MAX_PER_WALLET = int(os.getenv("EVENTS_MAX_PER_WALLET", "10"))
+HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))  # seconds, keeps proxies from closing idle streams
+
+_ids = itertools.count(1)
+
+
+class Subscription:
+    __slots__ = ("wallet", "queue")
+
+    def __init__(self, wallet: str):
+        self.wallet = wallet
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def push(self, event: tuple):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((next(_ids), "resync", {}))
+            metrics.inc("events_dropped_total")
+
+
+class Hub:
+    def __init__(self):
+        self._subscribers = {}  # wallet -> set of Subscription
+        self._loop = None
+
+    def full(self, wallet: str) -> bool:
+        return len(self._subscribers.get(wallet, ())) >= MAX_PER_WALLET
+
+    def subscribe(self, wallet: str):
+        """-> Subscription, None if the wallet already has MAX_PER_WALLET streams open."""
+        if self.full(wallet):
+            return None
+        subscribers = self._subscribers.setdefault(wallet, set())
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(wallet)
+        subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.wallet)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.wallet]
+
+    def publish(self, wallet: str, event_type: str, data: dict):
+        if wallet not in self._subscribers:
+            return
+        metrics.inc("events_published_total", type=event_type)
+        event = (next(_ids), event_type, data)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # DB writes can run in worker threads (asyncio.to_thread) - queues belong to the loop
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._fan_out, wallet, event)
+            return
+        self._fan_out(wallet, event)
+
+    def _fan_out(self, wallet: str, event: tuple):
+        for subscription in self._subscribers.get(wallet, ()):
+            subscription.push(event)
+
+    def listeners(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+hub = Hub()
+
+
+def publish(wallet: str, event_type: str, **data):
+    """publish(wallet, "progress", fields={"lab1": True}) - payload keys are free, "kind" included"""
+    if wallet:
+        hub.publish(wallet, event_type, data)
+
+
+def format_event(event: tuple) -> bytes:
+    event_id, event_type, data = event
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event_type.encode(), orjson.dumps(data))
+
+
+async def stream(wallet: str):
+    """SSE body - events as they come, a comment line every HEARTBEAT seconds of silence."""
+    # subscribed only once the response is streaming - a generator that never
+    # starts would never run its finally
+    subscription = hub.subscribe(wallet)
+    if subscription is None:
+        return
+    try:
+        yield b"retry: 3000\n\n"
+        yield format_event((next(_ids), "ready", {"wallet": subscription.wallet}))
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            yield format_event(event)
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+
+import chain
+
+# EIP-1559 fee oracle shared by all senders (faucet payouts, NFT mints).
+# Fees come from eth_feeHistory: priority fee = median of the FEE_PERCENTILE
+# reward over the last FEE_HISTORY_BLOCKS blocks, max fee = next block's base
+# fee * BASE_FEE_MULTIPLIER + priority fee (headroom for several full blocks).
+# The result is cached for FEE_TTL seconds and, while somebody is sending,
+# refreshed in the background every block - a send never waits for an RPC call.
+TTL = float(os.getenv("FEE_TTL", "4"))
+REFRESH_INTERVAL = float(os.getenv("FEE_REFRESH_INTERVAL", "2"))  # ~ Base block time
+IDLE_TIMEOUT = float(os.getenv("FEE_IDLE_TIMEOUT", "120"))  # background refresh stops after this long without sends
+MAX_STALE = float(os.getenv("FEE_MAX_STALE", "60"))  # last known fees are still used this long if the RPC fails
+HISTORY_BLOCKS = int(os.getenv("FEE_HISTORY_BLOCKS", "10"))
+PERCENTILE = float(os.getenv("FEE_PERCENTILE", "50"))
+BASE_FEE_MULTIPLIER = 2
+MIN_PRIORITY_FEE = int(os.getenv("FEE_MIN_PRIORITY_WEI", "1000000"))  # 0.001 gwei
+
+
+def compute_fees(history: dict) -> dict:
+    """eth_feeHistory result (hex) -> {"maxFeePerGas", "maxPriorityFeePerGas", "block"}"""
+    # baseFeePerGas has one more item than blocks asked for - the next block's base fee
+    base_fee = int(history["baseFeePerGas"][-1], 16)
+    rewards = sorted(int(reward[0], 16) for reward in history.get("reward") or [] if reward)
+    priority_fee = rewards[len(rewards) // 2] if rewards else 0
+    priority_fee = max(priority_fee, MIN_PRIORITY_FEE)
+    newest_block = int(history["oldestBlock"], 16) + len(history["baseFeePerGas"]) - 2
+    return {
+        "maxFeePerGas": base_fee * BASE_FEE_MULTIPLIER + priority_fee,
+        "maxPriorityFeePerGas": priority_fee,
+        "block": newest_block,
+    }
+
+
+class FeeOracle:
+    def __init__(self, network: str):
+        self.network = network
+        self._fees = None
+        self._updated = 0.0
+        self._used = 0.0
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def refresh(self) -> dict:
+        history, = await chain.rpc_batch(
+            self.network,
+            [("eth_feeHistory", [hex(HISTORY_BLOCKS), "latest", [PERCENTILE]])],
+        )
+        if history is None:
+            raise RuntimeError("eth_feeHistory failed")
+        self._fees = compute_fees(history)
+        self._updated = time.monotonic()
+        return self._fees
+
+    async def fees(self) -> dict:
+        """{"maxFeePerGas", "maxPriorityFeePerGas"} for a type-2 tx."""
+        self._used = time.monotonic()
+        self._start()
+        if self._fees is None or time.monotonic() - self._updated > TTL:
+            async with self._lock:
+                # somebody else may have refreshed while we waited
+                if self._fees is None or time.monotonic() - self._updated > TTL:
+                    try:
+                        await self.refresh()
+                    except Exception:
+                        if self._fees is None or time.monotonic() - self._updated > MAX_STALE:
+                            raise
+        return {
+            "maxFeePerGas": self._fees["maxFeePerGas"],
+            "maxPriorityFeePerGas": self._fees["maxPriorityFeePerGas"],
+        }
+
+    def _start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while time.monotonic() - self._used < IDLE_TIMEOUT:
+            await asyncio.sleep(REFRESH_INTERVAL)
+            try:
+                async with self._lock:
+                    await self.refresh()
+            except Exception as e:
+                print(f"Fee oracle error ({self.network}): {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+_oracles = {}
+
+
+def get_oracle(network: str) -> FeeOracle:
+    oracle = _oracles.get(network)
+    if oracle is None:
+        oracle = _oracles[network] = FeeOracle(network)
+    return oracle
+
+
+async def get_fees(network: str) -> dict:
+    return await get_oracle(network).fees()
+
+
+async def stop():
+    for oracle in _oracles.values():
+        await oracle.stop()
@@ -1,15 +1,11 @@
-from web3 import Web3
+import asyncio
 import os
-from dotenv import load_dotenv
-from eth_account import Account
+import chain, verify_cache, nonces, indexer, coldstart, transfers, fees, metrics
 
-load_dotenv()
-
-#web3 setup
-RPC_URL = "https://base.publicnode.com"
+#web3 setup (async client + pool lives in chain.py)
+NETWORK = "mainnet"
 USDC_ADDRESS = "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913"
 
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
 MY_WALLET = os.getenv("MM_WALLET")
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")
 NFT_CONTRACT_ADDRESS = os.getenv("BATCH1_NFT_ADDRESS")
@@ -36,9 +32,10 @@ USDC_ABI = [
         "type": "event"
     }
 ]
-usdc_contract = w3.eth.contract(address=Web3.to_checksum_address(USDC_ADDRESS), abi=USDC_ABI)
 
-def verify_mainnet_transaction(address_from, tx_hash, token, amount):
+indexer.configure(NETWORK, USDC_ADDRESS, MY_WALLET)
+
+async def verify_mainnet_transaction(address_from, tx_hash, token, amount):
     # catch errors
     if not address_from  or not tx_hash or not token or not amount:
         return {"success": False, "msg": "Missing parameters"}
@@ -46,111 +43,218 @@ def verify_mainnet_transaction(address_from, tx_hash, token, amount):
     if not MY_WALLET:
         return {"success": False, "msg": "MY_WALLET not configured in .env"}
 
-    try:
-        receipt = w3.eth.get_transaction_receipt(tx_hash)
-        if receipt["status"] != 1:
-            return {"success": False, "msg": "Transaction failed"}
+    key = verify_cache.make_key(NETWORK, tx_hash, token, address_from, amount)
+    cached = verify_cache.get(key)
+    if cached is not None:
+        return cached
 
-        # Get transaction details
-        tx = w3.eth.get_transaction(tx_hash)
+    # USDC transfer na náš wallet už může být v lokálním indexu - bez RPC
+    if token == "USDC":
+        indexed = indexer.lookup(NETWORK, tx_hash, address_from, amount)
+        if indexed is not None:
+            return indexed
 
-        if token == "ETH":
-            if tx['to'].lower() != MY_WALLET.lower():
-                return {"success": False, "msg": f"Wrong recipient wallet {tx['to'].lower()}"}
+    try:
+        w3 = await chain.get_w3(NETWORK)
+        # receipt, tx a head bloku souběžně - latence jednoho round tripu místo tří
+        receipt, tx, head = await asyncio.gather(
+            w3.eth.get_transaction_receipt(tx_hash),
+            w3.eth.get_transaction(tx_hash),
+            w3.eth.block_number,
+        )
+        result = check_mainnet_transaction(receipt, tx, address_from, tx_hash, token, amount)
+
+        # finalized receipt se už nezmění -> výsledek jde do cache
+        if verify_cache.is_final(receipt["blockNumber"], head):
+            verify_cache.put(key, NETWORK, tx_hash, result)
+        return result
+    except Exception as e:
+        return {"success": False, "msg": str(e)}
 
-            if tx['from'].lower() != address_from.lower():
-                return {"success": False, "msg": "Sender address mismatch"}
 
-            #todo amount check
+async def verify_mainnet_batch(items):
+    """
+    Bulk verify - items are dicts with the same fields as the single verify.
+    Cached results are answered locally, all the rest is fetched in one
+    JSON-RPC batch (chunked in chain.py). Returns results in input order.
+    """
+    results = [None] * len(items)
+    pending = []
+
+    for i, item in enumerate(items):
+        address_from = item.get("address_from")
+        tx_hash = item.get("tx_hash")
+        token = item.get("token")
+        amount = item.get("amount")
+        if not address_from or not tx_hash or not token or not amount:
+            results[i] = {"success": False, "msg": "Missing parameters"}
+        elif not MY_WALLET:
+            results[i] = {"success": False, "msg": "MY_WALLET not configured in .env"}
+        else:
+            key = verify_cache.make_key(NETWORK, tx_hash, token, address_from, amount)
+            cached = verify_cache.get(key)
+            if cached is None and token == "USDC":
+                cached = indexer.lookup(NETWORK, tx_hash, address_from, amount)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, key, (address_from, tx_hash, token, amount)))
+
+    if not pending:
+        return results
 
-        elif token == "USDC":
-            if tx['to'].lower() != USDC_ADDRESS.lower():
-                return {"success": False, "msg": "Not a USDC transaction"}
+    try:
+        found, head = await chain.fetch_transactions(NETWORK, [params[1] for _, _, params in pending])
+    except Exception as e:
+        for i, _, _ in pending:
+            results[i] = {"success": False, "msg": str(e)}
+        return results
+
+    for i, key, params in pending:
+        tx_hash = params[1]
+        receipt, tx = found[tx_hash]
+        if receipt is None:
+            results[i] = {"success": False, "msg": "Transaction not found"}
+            continue
+        try:
+            result = check_mainnet_transaction(receipt, tx, *params)
+        except Exception as e:
+            results[i] = {"success": False, "msg": str(e)}
+            continue
+
+        if verify_cache.is_final(receipt["blockNumber"], head):
+            verify_cache.put(key, NETWORK, tx_hash, result)
+        results[i] = result
+
+    return results
+
+
+def check_mainnet_transaction(receipt, tx, address_from, tx_hash, token, amount):
+    """Per-token checks on an already fetched receipt + transaction."""
+    if receipt["status"] != 1:
+        return {"success": False, "msg": "Transaction failed"}
+
+    if token == "ETH":
+        if tx['to'].lower() != MY_WALLET.lower():
+            return {"success": False, "msg": f"Wrong recipient wallet {tx['to'].lower()}"}
+
+        if tx['from'].lower() != address_from.lower():
+            return {"success": False, "msg": "Sender address mismatch"}
+
+        #todo amount check
+
+    elif token == "USDC":
+        if tx['to'].lower() != USDC_ADDRESS.lower():
+            return {"success": False, "msg": "Not a USDC transaction"}
+
+        # Transfer logs matched on raw topics, only our wallet's transfer gets decoded
+        seen, matches = transfers.get_matcher(USDC_ADDRESS, MY_WALLET).match(receipt["logs"])
+        if not seen:
+            return {"success": False, "msg": "No USDC transfer found"}
+
+        # First transfer to your wallet
+        if not matches:
+            return {"success": False, "msg": "Transfer not to your wallet"}
+        from_topic, value = matches[0]
+
+        # Verify sender
+        if from_topic != transfers.address_topic(address_from):
+            return {"success": False, "msg": "Sender mismatch"}
+
+        if value < int(amount):
+            return {"success": False,
+                    "msg": f"Insufficient amount: sent {value}, expected {amount}"}
+    else:
+        return {"success": False, "msg": "Unsupported token (use ETH or USDC)"}
+
+    return {
+        "success": True,
+        "verified": True,
+        "tx_hash": tx_hash,
+        "token": token,
+        "block": receipt["blockNumber"]
+    }
 
-            # Parse Transfer event from logs
-            transfer_events = usdc_contract.events.Transfer().process_receipt(receipt)
-            if not transfer_events:
-                return {"success": False, "msg": "No USDC transfer found"}
 
-            # Find the right transfer event (to your wallet)
-            found = False
-            for event in transfer_events:
-                if event['args']['to'].lower() == MY_WALLET.lower():
-                    # Verify sender
-                    if event['args']['from'].lower() != address_from.lower():
-                        return {"success": False, "msg": "Sender mismatch"}
 
-                    if event['args']['value'] < int(amount):
-                        return {"success": False,
-                                "msg": f"Insufficient amount: sent {event['args']['value']}, expected {amount}"}
+_admin_account = None
 
-                    found = True
-                    break
 
-            if not found:
-                return {"success": False, "msg": "Transfer not to your wallet"}
-        else:
-            return {"success": False, "msg": "Unsupported token (use ETH or USDC)"}
-
-        return {
-            "success": True,
-            "verified": True,
-            "tx_hash": tx_hash,
-            "token": token,
-            "block": receipt["blockNumber"]
-        }
-    except Exception as e:
-        return {"success": False, "msg": str(e)}
+def admin_account():
+    """Mint signer - key derivation runs once, on the first mint."""
+    global _admin_account
+    if _admin_account is None:
+        with coldstart.timed("account mainnet"):
+            from eth_account import Account
+            _admin_account = Account.from_key(PRIVATE_KEY)
+    return _admin_account
 
 
-def mint_nft_to_user(user_address):
+async def mint_nft_to_user(user_address, on_signed=None):
     """
     Tato funkce zavolá smart kontrakt a pošle NFT uživateli.
     OPRAVA: Dynamická cena gasu a vyšší limit.
+    Nečeká na vytěžení - vrací tx hash hned po odeslání, potvrzení hlídá mints.py.
+    await on_signed(tx_hash) runs after signing, before the broadcast - if it raises, nothing is sent.
     """
     if not PRIVATE_KEY or not NFT_CONTRACT_ADDRESS:
         return {"success": False, "msg": "Chybí konfigurace serveru (PK nebo Address)"}
 
     try:
         # Inicializace kontraktu
-        contract = w3.eth.contract(address=Web3.to_checksum_address(NFT_CONTRACT_ADDRESS), abi=NFT_ABI)
+        w3 = await chain.get_w3(NETWORK)
+        contract = await chain.get_contract(NETWORK, NFT_CONTRACT_ADDRESS, NFT_ABI)
 
         # Admin účet z privátního klíče
-        admin_account = Account.from_key(PRIVATE_KEY)
+        signer = admin_account()
 
-        # 1. Zjistíme aktuální cenu gasu na síti Base
-        current_gas_price = w3.eth.gas_price
+        # 1. EIP-1559 poplatky ze sdíleného oracle (feeHistory, cache per blok)
+        #    maxFee = 2x base fee + tip, takže transakce nezůstane viset
+        fee = await fees.get_fees(NETWORK)
 
-        # Přidáme malou rezervu (např. 10%), aby transakce nezůstala viset
-        adjusted_gas_price = int(current_gas_price * 1.1)
+        # 2. Sestavení transakce s dynamickou cenou (nonce z lokálního manageru)
+        async def sign_and_send(nonce):
+            tx = await contract.functions.airdrop(user_address).build_transaction({
+                'chainId': chain.chain_id(NETWORK),  # Base Mainnet
+                'gas': 500000,  # Zvednuto z 200k na 500k (bezpečnostní rezerva)
+                **fee,  # Použijeme aktuální cenu sítě
+                'nonce': nonce,
+                'from': signer.address
+            })
 
-        # 2. Sestavení transakce s dynamickou cenou
-        tx = contract.functions.airdrop(user_address).build_transaction({
-            'chainId': 8453,  # Base Mainnet
-            'gas': 500000,  # Zvednuto z 200k na 500k (bezpečnostní rezerva)
-            'gasPrice': adjusted_gas_price,  # Použijeme aktuální cenu sítě
-            'nonce': w3.eth.get_transaction_count(admin_account.address),
-            'from': admin_account.address
-        })
+            # Podpis transakce
+            with metrics.timer("sign_duration_seconds", "sign", network=NETWORK, kind="mint"):
+                signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
 
-        # Podpis transakce
-        signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
+            # Odeslání do sítě (v7 fix: raw_transaction)
+            raw_tx = getattr(signed_tx, 'raw_transaction', None)
+            if raw_tx is None:
+                raw_tx = getattr(signed_tx, 'rawTransaction', signed_tx[0])
 
-        # Odeslání do sítě (v7 fix: raw_transaction)
-        raw_tx = getattr(signed_tx, 'raw_transaction', None)
-        if raw_tx is None:
-            raw_tx = getattr(signed_tx, 'rawTransaction', signed_tx[0])
+            # hash je známý už po podpisu - uloží se dřív, než tx opustí server
+            if on_signed is not None:
+                await on_signed(w3.to_hex(signed_tx.hash))
 
-        tx_hash = w3.eth.send_raw_transaction(raw_tx)
+            return await w3.eth.send_raw_transaction(raw_tx)
 
-        # Čekání na potvrzení
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        tx_hash = await nonces.get_manager(NETWORK, signer.address).send(sign_and_send)
 
-        if receipt.status == 1:
-            return {"success": True, "tx_hash": tx_hash.hex()}
-        else:
-            return {"success": False, "msg": "Mint transakce selhala na blockchainu (Reverted)"}
+        return {"success": True, "tx_hash": w3.to_hex(tx_hash)}
 
     except Exception as e:
         print(f"Mint Error: {e}")
-        return {"success": False, "msg": str(e)}
\ No newline at end of file
+        return {"success": False, "msg": str(e)}
+
+
+async def tx_known(tx_hash) -> bool:
+    """Node has the tx (pending or mined) - did a broadcast that errored out get through?"""
+    tx, = await chain.rpc_batch(NETWORK, [("eth_getTransactionByHash", [tx_hash])])
+    return tx is not None
+
+
+async def get_mint_statuses(tx_hashes):
+    """
+    {tx_hash: 1 / 0 / None} - receipt status pro víc mintů najednou (jeden JSON-RPC batch).
+    None = ještě není vytěžená.
+    """
+    return await chain.receipt_statuses(NETWORK, tx_hashes)
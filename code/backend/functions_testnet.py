@@ -1,14 +1,11 @@
-from web3 import Web3
+import asyncio
 import os
-from dotenv import load_dotenv
+import chain, verify_cache, nonces, indexer, coldstart, transfers, fees, ledger, database, metrics
 
-load_dotenv()
-
-#web3 setup
-RPC_URL = "https://sepolia.base.org"
+#web3 setup (async client + pool lives in chain.py)
+NETWORK = "testnet"
 USDC_ADDRESS = "0x036CbD53842c5426634e7929541eC2318f3dCF7e"
 
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
 MY_WALLET = os.getenv("MY_WALLET")
 
 #USDC transaction requirements
@@ -24,64 +21,140 @@ USDC_ABI = [
         "type": "event"
     }
 ]
-usdc_contract = w3.eth.contract(address=Web3.to_checksum_address(USDC_ADDRESS), abi=USDC_ABI)
 
-def verify_testnet_transaction(address_from, address_to, tx_hash, token, amount):
+indexer.configure(NETWORK, USDC_ADDRESS, MY_WALLET)
+
+async def verify_testnet_transaction(address_from, address_to, tx_hash, token, amount):
     # catch errors
     if not address_from or not address_to or not tx_hash or not token or not amount:
         return {"success": False, "msg": "Missing parameters"}
 
-    try:
-        receipt = w3.eth.get_transaction_receipt(tx_hash)
-        if receipt["status"] != 1:
-            return {"success": False, "msg": "Transaction failed"}
-
-        # Get transaction details
-        tx = w3.eth.get_transaction(tx_hash)
-
-        if token == "ETH":
-            if tx['to'].lower() != address_to.lower():
-                return {"success": False, "msg": f"Wrong recipient wallet {tx['to'].lower()}"}
+    key = verify_cache.make_key(NETWORK, tx_hash, token, address_from, address_to, amount)
+    cached = verify_cache.get(key)
+    if cached is not None:
+        return cached
 
-            if tx['from'].lower() != address_from.lower():
-                return {"success": False, "msg": "Sender address mismatch"}
+    # USDC transfer na náš wallet už může být v lokálním indexu - bez RPC
+    if token == "USDC":
+        indexed = indexer.lookup(NETWORK, tx_hash, address_from, None)
+        if indexed is not None:
+            return indexed
 
-            #todo amount check
-
-        elif token == "USDC":
-            if tx['to'].lower() != USDC_ADDRESS.lower():
-                return {"success": False, "msg": "Not a USDC transaction"}
-
-            # Parse Transfer event from logs
-            transfer_events = usdc_contract.events.Transfer().process_receipt(receipt)
-            if not transfer_events:
-                return {"success": False, "msg": "No USDC transfer found"}
-
-            # Find the right transfer event (to your wallet)
-            found = False
-            for event in transfer_events:
-                if event['args']['to'].lower() == MY_WALLET.lower():
-                    # Verify sender
-                    if event['args']['from'].lower() != address_from.lower():
-                        return {"success": False, "msg": "Sender mismatch"}
+    try:
+        w3 = await chain.get_w3(NETWORK)
+        # receipt, tx a head bloku souběžně - latence jednoho round tripu místo tří
+        receipt, tx, head = await asyncio.gather(
+            w3.eth.get_transaction_receipt(tx_hash),
+            w3.eth.get_transaction(tx_hash),
+            w3.eth.block_number,
+        )
+        result = check_testnet_transaction(receipt, tx, address_from, address_to, tx_hash, token, amount)
+
+        # finalized receipt se už nezmění -> výsledek jde do cache
+        if verify_cache.is_final(receipt["blockNumber"], head):
+            verify_cache.put(key, NETWORK, tx_hash, result)
+        return result
+    except Exception as e:
+        return {"success": False, "msg": str(e)}
 
-                    found = True
-                    break
 
-            if not found:
-                return {"success": False, "msg": "Transfer not to your wallet"}
+async def verify_testnet_batch(items):
+    """
+    Bulk verify - items are dicts with the same fields as the single verify.
+    Cached results are answered locally, all the rest is fetched in one
+    JSON-RPC batch (chunked in chain.py). Returns results in input order.
+    """
+    results = [None] * len(items)
+    pending = []
+
+    for i, item in enumerate(items):
+        address_from = item.get("address_from")
+        address_to = item.get("address_to")
+        tx_hash = item.get("tx_hash")
+        token = item.get("token")
+        amount = item.get("amount")
+        if not address_from or not address_to or not tx_hash or not token or not amount:
+            results[i] = {"success": False, "msg": "Missing parameters"}
         else:
-            return {"success": False, "msg": "Unsupported token (use ETH or USDC)"}
-
-        return {
-            "success": True,
-            "verified": True,
-            "tx_hash": tx_hash,
-            "token": token,
-            "block": receipt["blockNumber"]
-        }
+            key = verify_cache.make_key(NETWORK, tx_hash, token, address_from, address_to, amount)
+            cached = verify_cache.get(key)
+            if cached is None and token == "USDC":
+                cached = indexer.lookup(NETWORK, tx_hash, address_from, None)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, key, (address_from, address_to, tx_hash, token, amount)))
+
+    if not pending:
+        return results
+
+    try:
+        found, head = await chain.fetch_transactions(NETWORK, [params[2] for _, _, params in pending])
     except Exception as e:
-        return {"success": False, "msg": str(e)}
+        for i, _, _ in pending:
+            results[i] = {"success": False, "msg": str(e)}
+        return results
+
+    for i, key, params in pending:
+        tx_hash = params[2]
+        receipt, tx = found[tx_hash]
+        if receipt is None:
+            results[i] = {"success": False, "msg": "Transaction not found"}
+            continue
+        try:
+            result = check_testnet_transaction(receipt, tx, *params)
+        except Exception as e:
+            results[i] = {"success": False, "msg": str(e)}
+            continue
+
+        if verify_cache.is_final(receipt["blockNumber"], head):
+            verify_cache.put(key, NETWORK, tx_hash, result)
+        results[i] = result
+
+    return results
+
+
+def check_testnet_transaction(receipt, tx, address_from, address_to, tx_hash, token, amount):
+    """Per-token checks on an already fetched receipt + transaction."""
+    if receipt["status"] != 1:
+        return {"success": False, "msg": "Transaction failed"}
+
+    if token == "ETH":
+        if tx['to'].lower() != address_to.lower():
+            return {"success": False, "msg": f"Wrong recipient wallet {tx['to'].lower()}"}
+
+        if tx['from'].lower() != address_from.lower():
+            return {"success": False, "msg": "Sender address mismatch"}
+
+        #todo amount check
+
+    elif token == "USDC":
+        if tx['to'].lower() != USDC_ADDRESS.lower():
+            return {"success": False, "msg": "Not a USDC transaction"}
+
+        # Transfer logs matched on raw topics, only our wallet's transfer gets decoded
+        seen, matches = transfers.get_matcher(USDC_ADDRESS, MY_WALLET).match(receipt["logs"])
+        if not seen:
+            return {"success": False, "msg": "No USDC transfer found"}
+
+        # First transfer to your wallet
+        if not matches:
+            return {"success": False, "msg": "Transfer not to your wallet"}
+
+        # Verify sender
+        if matches[0][0] != transfers.address_topic(address_from):
+            return {"success": False, "msg": "Sender mismatch"}
+    else:
+        return {"success": False, "msg": "Unsupported token (use ETH or USDC)"}
+
+    return {
+        "success": True,
+        "verified": True,
+        "tx_hash": tx_hash,
+        "token": token,
+        "block": receipt["blockNumber"]
+    }
+
 
 
 # MetaMask sending
@@ -109,109 +182,118 @@ ERC20_ABI = [
 ]
 
 
-def validateAddress(user_address):
-    if not user_address:
-        return {"success": False, "msg": "Address is required"}
+USDC_PAYOUT = 1_000000  # 1 USDC (6 decimals)
+ETH_DRIP = 100_000_000_000_000  # 0.0001 ETH (wei)
+ETH_GAS_RESERVE = 50_000_000_000_000  # 0.00005 ETH - Rezerva na poplatky
 
-    if not user_address.startswith("0x") or len(user_address) != 42:
-        return {"success": False, "msg": "Invalid address format"}
+_faucet_account = None
 
-    try:
-        w3.to_checksum_address(user_address)
-    except:
-        return {"success": False, "msg": "Invalid address"}
 
-    return {"success": True}
+def faucet_account():
+    global _faucet_account
+    if _faucet_account is None:
+        with coldstart.timed("account testnet"):
+            from eth_account import Account
+            _faucet_account = Account.from_key(PRIVATE_KEY)
+    return _faucet_account
 
 
-def try_sending(user_address):
-    try:
-        # ✅ FIX: Převod na checksum address (vyřeší type error)
-        user_checksum = w3.to_checksum_address(user_address)
-
-        account = w3.eth.account.from_key(PRIVATE_KEY)
-        faucet_address = account.address
+async def faucet_balances():
+    """(USDC, ETH) balance faucet walletu - oba dotazy souběžně."""
+    w3 = await chain.get_w3(NETWORK)
+    usdc_contract = await chain.get_contract(NETWORK, USDC_ADDRESS, ERC20_ABI)
+    faucet_address = faucet_account().address
+    usdc_balance, eth_balance = await asyncio.gather(
+        usdc_contract.functions.balanceOf(faucet_address).call(),
+        w3.eth.get_balance(faucet_address),
+    )
+    return usdc_balance, eth_balance
 
-        usdc_contract = w3.eth.contract(address=USDC_ADDRESS, abi=ERC20_ABI)
 
-        # Zkontroluj balance BOT walletu
-        balance = usdc_contract.functions.balanceOf(faucet_address).call()
-        amount = 1_000000  # 1 USDC (6 decimals)
+# payout kind -> what it takes from the faucet wallet, message when it's not there
+PAYOUT_COST = {
+    "usdc": {"usdc": USDC_PAYOUT},
+    "eth": {"eth": ETH_DRIP + ETH_GAS_RESERVE},
+}
+EMPTY_MSG = {
+    "usdc": "Faucet is empty! Please donate testnet USDC.",
+    "eth": "Faucet wallet is empty / Low balance.",
+}
+LEDGER_DB_WALLET = os.getenv("MM_WALLET")  # MY_WALLET row the real balances are mirrored to
 
-        if balance < amount:
-            return {"success": False, "msg": "Faucet is empty! Please donate testnet USDC."}
 
-        nonce = w3.eth.get_transaction_count(faucet_address)
+async def _ledger_balances():
+    usdc_balance, eth_balance = await faucet_balances()
+    return {"usdc": usdc_balance, "eth": eth_balance}
 
-        # ✅ FIX: Použití checksum address
-        transfer_function = usdc_contract.functions.transfer(user_checksum, amount)
 
-        transaction = transfer_function.build_transaction({
-            "from": faucet_address,
-            "nonce": nonce,
-            "gas": 100000,
-            "maxFeePerGas": w3.to_wei("2", "gwei"),
-            "maxPriorityFeePerGas": w3.to_wei("1", "gwei"),
-            "chainId": 84532  # Base Sepolia
+async def _mirror_balances(balances):
+    if LEDGER_DB_WALLET:
+        await asyncio.to_thread(database.update_fields, "MY_WALLET", LEDGER_DB_WALLET, {
+            "balance-USDC": balances["usdc"] / 10 ** 6,
+            "balance-ETH": balances["eth"] / 10 ** 18,
         })
 
-        signed_tx = w3.eth.account.sign_transaction(transaction, PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
 
-        return {
-            "success": True,
-            "msg": "1 USDC sent successfully to Base Sepolia testnet!",
-            "txHash": w3.to_hex(tx_hash),
-            "from": faucet_address,
-            "to": user_checksum,
-            "amount": "1 USDC"
-        }
+# balance checks go here instead of balanceOf / get_balance before every send
+faucet_ledger = ledger.Ledger(NETWORK, _ledger_balances, _mirror_balances)
 
-    except Exception as e:
-        return {"success": False, "msg": f"Transaction failed: {str(e)}"}
 
-# functions_testnet.py
-# (Přidej toto na konec souboru nebo mezi ostatní funkce)
+async def send_usdc(user_address, fee=None):
+    """Podpis + broadcast 1 USDC, bez kontroly balance (tu dělá volající). Vrací tx hash (hex)."""
+    w3 = await chain.get_w3(NETWORK)
+    # ✅ FIX: Převod na checksum address (vyřeší type error)
+    user_checksum = w3.to_checksum_address(user_address)
+    faucet_address = faucet_account().address
 
-def drip_testnet_eth(user_address):
-    """
-    Pošle 0.0001 ETH na Base Sepolia uživateli.
-    """
-    try:
-        # Validace a checksum adresy
-        if not Web3.is_checksum_address(user_address):
-            user_address = Web3.to_checksum_address(user_address)
+    usdc_contract = await chain.get_contract(NETWORK, USDC_ADDRESS, ERC20_ABI)
+    transfer_function = usdc_contract.functions.transfer(user_checksum, USDC_PAYOUT)
+    # EIP-1559 poplatky ze sdíleného oracle (cache, bez RPC volání na každý send)
+    if fee is None:
+        fee = await fees.get_fees(NETWORK)
 
-        # Načteme účet (používáme stejný PRIVATE_KEY jako pro ostatní operace)
-        account = w3.eth.account.from_key(PRIVATE_KEY)
-        faucet_address = account.address
+    async def sign_and_send(nonce):
+        transaction = await transfer_function.build_transaction({
+            "from": faucet_address,
+            "nonce": nonce,
+            "gas": 100000,
+            **fee,
+            "chainId": chain.chain_id(NETWORK)  # Base Sepolia
+        })
+        with metrics.timer("sign_duration_seconds", "sign", network=NETWORK, kind="usdc"):
+            signed_tx = w3.eth.account.sign_transaction(transaction, PRIVATE_KEY)
+        return await w3.eth.send_raw_transaction(signed_tx.raw_transaction)
 
-        # Kontrola, zda máme dost ETH na rozdávání
-        balance = w3.eth.get_balance(faucet_address)
-        amount_to_send = w3.to_wei(0.0001, 'ether')
-        gas_reserve = w3.to_wei(0.00005, 'ether') # Rezerva na poplatky
+    # nonce z lokálního manageru - žádný get_transaction_count, souběžné sendy se nepřepisují
+    tx_hash = await nonces.get_manager(NETWORK, faucet_address).send(sign_and_send)
+    return w3.to_hex(tx_hash)
 
-        if balance < (amount_to_send + gas_reserve):
-             return {"success": False, "msg": "Faucet wallet is empty / Low balance."}
 
-        # Sestavení transakce
-        nonce = w3.eth.get_transaction_count(faucet_address)
+async def send_eth(user_address, fee=None):
+    """Podpis + broadcast 0.0001 ETH, bez kontroly balance. Vrací tx hash (hex)."""
+    w3 = await chain.get_w3(NETWORK)
 
+    # Validace a checksum adresy
+    user_address = w3.to_checksum_address(user_address)
+    faucet_address = faucet_account().address
+
+    if fee is None:
+        fee = await fees.get_fees(NETWORK)
+
+    # Sestavení, podpis a odeslání (nonce přidělí lokální manager)
+    async def sign_and_send(nonce):
         tx = {
             'nonce': nonce,
             'to': user_address,
-            'value': amount_to_send,
+            'value': ETH_DRIP,
             'gas': 21000, # Standardní transfer ETH
-            'gasPrice': w3.eth.gas_price,
-            'chainId': 84532 # Base Sepolia
+            **fee,
+            'chainId': chain.chain_id(NETWORK) # Base Sepolia
         }
+        with metrics.timer("sign_duration_seconds", "sign", network=NETWORK, kind="eth"):
+            signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
+        return await w3.eth.send_raw_transaction(signed_tx.raw_transaction)
 
-        # Podpis a odeslání
-        signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    tx_hash = await nonces.get_manager(NETWORK, faucet_address).send(sign_and_send)
+    return w3.to_hex(tx_hash)
 
-        return {"success": True, "tx_hash": w3.to_hex(tx_hash)}
-
-    except Exception as e:
-        print(f"Faucet Error: {e}")
-        return {"success": False, "msg": str(e)}
\ No newline at end of file
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+
+import database
+import metrics
+import ratelimit
+
+# Idempotency-Key for the endpoints that pay out / mint (send-test, drip-eth, buy-nft).
+# The first request with a key claims it (IDEMPOTENCY_KEYS row, status in_progress)
+# and runs; its response is stored. Retries with the same key never run again:
+# - same instance, still running -> wait for the running request
+# - finished -> the stored response is replayed (memory first, then the DB)
+# - running on another instance -> the row is polled until it's done
+# - its request died (crash, frozen instance) -> a retry takes the key over once
+#   the row's lease (locked_until, renewed while the request runs) has run out
+# A key sent with a different body is rejected (422). Server errors and 429 are
+# not stored - the key is released and a retry runs normally.
+HEADER = "idempotency-key"
+KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", str(24 * 3600)))
+WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "15"))
+POLL_INTERVAL = float(os.getenv("IDEMPOTENCY_POLL_INTERVAL", "0.25"))
+LEASE = float(os.getenv("IDEMPOTENCY_LEASE", "30"))  # seconds an in_progress key stays locked without renewal
+MAX_CACHED = int(os.getenv("IDEMPOTENCY_MAX_CACHED", "10000"))
+MAX_KEY_LENGTH = 255
+RETRYABLE_STATUS = {409, 429}
+
+_done = {}  # key -> (expires, request_hash, status_code, response)
+_running = {}  # key -> (request_hash, task)
+
+
+def _consume(task):
+    # the exception goes to every waiter; this only keeps asyncio quiet
+    if not task.cancelled():
+        task.exception()
+
+
+def request_hash(data) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def _check(stored_hash: str, digest: str, endpoint: str):
+    if stored_hash != digest:
+        metrics.inc("idempotency_requests_total", endpoint=endpoint, outcome="mismatch")
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request.")
+
+
+def _remember(key: str, digest: str, status_code: int, response):
+    if len(_done) >= MAX_CACHED:
+        now = time.monotonic()
+        for cached_key in [k for k, v in _done.items() if v[0] <= now]:
+            del _done[cached_key]
+        if len(_done) >= MAX_CACHED:
+            _done.clear()
+    entry = (time.monotonic() + KEY_TTL, digest, status_code, response)
+    _done[key] = entry
+    return entry
+
+
+def _replay(entry):
+    return ORJSONResponse(content=entry[3], status_code=entry[2], headers={"Idempotent-Replayed": "true"})
+
+
+async def _renew(key: str):
+    while True:
+        await asyncio.sleep(LEASE / 3)
+        await asyncio.to_thread(database.extend_idempotency_key, key, LEASE)
+
+
+def _expired(row) -> bool:
+    created = ratelimit.parse_timestamp(row.get("created_at"))
+    return created is not None and created < time.time() - KEY_TTL
+
+
+async def run(request, endpoint: str, data, fn):
+    """await fn() at most once per Idempotency-Key header; without the header just await fn()."""
+    client_key = request.headers.get(HEADER)
+    if not client_key:
+        return await fn()
+    if len(client_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long.")
+
+    key = f"{endpoint}|{client_key}"
+    digest = request_hash(data)
+
+    entry = _done.get(key)
+    if entry is not None:
+        if entry[0] > time.monotonic():
+            _check(entry[1], digest, endpoint)
+            metrics.inc("idempotency_requests_total", endpoint=endpoint, outcome="replayed")
+            return _replay(entry)
+        del _done[key]
+
+    running = _running.get(key)
+    if running is not None:
+        _check(running[0], digest, endpoint)
+        metrics.inc("idempotency_requests_total", endpoint=endpoint, outcome="shared")
+        entry, _ = await asyncio.shield(running[1])
+        return _replay(entry)
+
+    task = asyncio.ensure_future(_first(key, digest, endpoint, fn))
+    task.add_done_callback(_consume)
+    _running[key] = (digest, task)
+    # a client that disconnects must not cancel the payout for its retries
+    entry, owner = await asyncio.shield(task)
+    if not owner:
+        return _replay(entry)
+    if entry[2] != 200:
+        raise HTTPException(status_code=entry[2], detail=entry[3]["detail"])
+    return entry[3]
+
+
+async def _first(key: str, digest: str, endpoint: str, fn):
+    """-> (entry, True) if fn ran here, (stored entry, False) if another request ran it."""
+    try:
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while True:
+            claimed = await asyncio.to_thread(database.claim_idempotency_key, key, digest, LEASE)
+            if claimed is None:
+                # DB unavailable -> only this instance is protected (_running)
+                break
+            created, row = claimed
+            if created:
+                break
+            if row is not None:
+                _check(row["request_hash"], digest, endpoint)
+                if _expired(row):
+                    await asyncio.to_thread(database.release_idempotency_key, key)
+                    continue
+                if row["status"] == "done":
+                    metrics.inc("idempotency_requests_total", endpoint=endpoint, outcome="replayed")
+                    return _remember(key, digest, row["status_code"], row["response"]), False
+            if time.monotonic() >= deadline:
+                metrics.inc("idempotency_requests_total", endpoint=endpoint, outcome="in_progress")
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress.")
+            await asyncio.sleep(POLL_INTERVAL)
+
+        metrics.inc("idempotency_requests_total", endpoint=endpoint, outcome="run")
+        renewing = asyncio.ensure_future(_renew(key))
+        try:
+            status_code, response = 200, await fn()
+        except HTTPException as e:
+            if e.status_code >= 500 or e.status_code in RETRYABLE_STATUS:
+                await asyncio.to_thread(database.release_idempotency_key, key)
+                raise
+            status_code, response = e.status_code, {"detail": e.detail}
+        except Exception:
+            await asyncio.to_thread(database.release_idempotency_key, key)
+            raise
+        finally:
+            renewing.cancel()
+
+        await asyncio.to_thread(database.finish_idempotency_key, key, status_code, response)
+        return _remember(key, digest, status_code, response), True
+    finally:
+        _running.pop(key, None)
@@ -0,0 +1,245 @@
+import asyncio
+import os
+import sqlite3
+import threading
+
+import chain, verify_cache
+
+# USDC Transfer indexer - follows new blocks with eth_getLogs (USDC contract,
+# Transfer topic, `to` = our wallet) and keeps the decoded transfers in a local
+# SQLite file. USDC verification looks here first and only goes to the RPC on a miss.
+# Reorgs: every round re-scans the last REORG_DEPTH blocks and replaces what was
+# indexed there, so a transfer that got reorged out disappears again.
+# The index answers only what the RPC path would answer the same way: tx.to of every
+# transfer's tx is stored with it, and only final blocks (verify_cache.is_final
+# against the indexed head) count - anything else falls back to the RPC.
+ENABLED = os.getenv("INDEXER_ENABLED", "false").lower() in ("1", "true", "yes")
+DB_PATH = os.getenv("INDEXER_DB", "transfer_index.db")
+POLL_INTERVAL = float(os.getenv("INDEXER_POLL_INTERVAL", "2"))
+REORG_DEPTH = int(os.getenv("INDEXER_REORG_DEPTH", "20"))
+BACKFILL = int(os.getenv("INDEXER_BACKFILL", "5000"))  # blocks to index on the very first start
+MAX_RANGE = int(os.getenv("INDEXER_MAX_RANGE", "1000"))  # blocks per eth_getLogs call
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+SCHEMA = """
+create table if not exists transfers (
+    network text not null,
+    tx_hash text not null,
+    log_index integer not null,
+    block_number integer not null,
+    from_address text not null,
+    to_address text not null,
+    value text not null,
+    tx_to text,  -- `to` of the transaction (USDC contract for a direct transfer call)
+    primary key (network, tx_hash, log_index)
+);
+create index if not exists transfers_block_idx on transfers (network, block_number);
+create table if not exists checkpoints (
+    network text primary key,
+    block_number integer not null
+);
+"""
+
+
+def address_topic(address: str) -> str:
+    """0xAbC... -> 32-byte topic (left padded)"""
+    return "0x" + address.lower()[2:].rjust(64, "0")
+
+
+class TransferIndex:
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("pragma journal_mode=WAL")
+        self.conn.execute("pragma synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("pragma table_info(transfers)")}
+        if "tx_to" not in columns:
+            # index files from before tx_to - their rows fall back to the RPC
+            self.conn.execute("alter table transfers add column tx_to text")
+        self.lock = threading.Lock()
+
+    def checkpoint(self, network: str):
+        with self.lock:
+            row = self.conn.execute("select block_number from checkpoints where network = ?", (network,)).fetchone()
+        return row[0] if row else None
+
+    def replace_range(self, network: str, from_block: int, to_block: int, transfers: list):
+        """Drop what was indexed in [from_block, to_block], store the fresh transfers + checkpoint."""
+        with self.lock:
+            self.conn.execute("begin")
+            try:
+                self.conn.execute(
+                    "delete from transfers where network = ? and block_number between ? and ?",
+                    (network, from_block, to_block),
+                )
+                self.conn.executemany(
+                    "insert or replace into transfers values (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(network, *t) for t in transfers],
+                )
+                self.conn.execute(
+                    "insert into checkpoints (network, block_number) values (?, ?) "
+                    "on conflict (network) do update set block_number = excluded.block_number",
+                    (network, to_block),
+                )
+                self.conn.execute("commit")
+            except Exception:
+                self.conn.execute("rollback")
+                raise
+
+    def find(self, network: str, tx_hash: str):
+        """-> [(block_number, from_address, to_address, value, tx_to), ...] in log order"""
+        with self.lock:
+            rows = self.conn.execute(
+                "select block_number, from_address, to_address, value, tx_to from transfers "
+                "where network = ? and tx_hash = ? order by log_index",
+                (network, tx_hash.lower()),
+            ).fetchall()
+        return [(block, sender, recipient, int(value), tx_to) for block, sender, recipient, value, tx_to in rows]
+
+    def tx_targets(self, network: str, tx_hashes: list) -> dict:
+        """tx_to already known for these hashes -> {tx_hash: tx_to}"""
+        if not tx_hashes:
+            return {}
+        with self.lock:
+            rows = self.conn.execute(
+                f"select tx_hash, tx_to from transfers where network = ? and tx_to is not null "
+                f"and tx_hash in ({', '.join('?' * len(tx_hashes))})",
+                (network, *tx_hashes),
+            ).fetchall()
+        return dict(rows)
+
+
+_index = None
+_targets = {}  # network -> (usdc address, our wallet)
+_tasks = []
+
+
+def get_index() -> TransferIndex:
+    global _index
+    if _index is None:
+        _index = TransferIndex(DB_PATH)
+    return _index
+
+
+def configure(network: str, usdc_address: str, wallet: str):
+    if wallet:
+        _targets[network] = (usdc_address, wallet)
+
+
+def _decode(log: dict):
+    return (
+        log["transactionHash"].lower(),
+        int(log["logIndex"], 16),
+        int(log["blockNumber"], 16),
+        "0x" + log["topics"][1][-40:],
+        "0x" + log["topics"][2][-40:],
+        str(int(log["data"], 16)),
+    )
+
+
+async def index_once(network: str):
+    """One round: checkpoint - REORG_DEPTH .. head. Returns the new checkpoint."""
+    usdc_address, wallet = _targets[network]
+    index = get_index()
+
+    head_hex, = await chain.rpc_batch(network, [("eth_blockNumber", [])])
+    head = int(head_hex, 16)
+    checkpoint = index.checkpoint(network)
+    if checkpoint is None:
+        checkpoint = max(0, head - BACKFILL)
+    from_block = max(0, checkpoint - REORG_DEPTH + 1)
+    to_block = head
+
+    calls = []
+    for start in range(from_block, to_block + 1, MAX_RANGE):
+        end = min(start + MAX_RANGE - 1, to_block)
+        log_filter = {
+            "fromBlock": hex(start),
+            "toBlock": hex(end),
+            "address": usdc_address,
+            "topics": [TRANSFER_TOPIC, None, address_topic(wallet)],
+        }
+        calls.append(("eth_getLogs", [log_filter]))
+
+    results = await chain.rpc_batch(network, calls)
+    if any(logs is None for logs in results):
+        raise RuntimeError("eth_getLogs failed")
+
+    transfers = [_decode(log) for logs in results for log in logs if not log.get("removed")]
+
+    # tx.to of new transfers (the re-scanned window mostly has them already)
+    targets = index.tx_targets(network, list({t[0] for t in transfers}))
+    missing = list({t[0] for t in transfers} - targets.keys())
+    if missing:
+        txs = await chain.rpc_batch(network, [("eth_getTransactionByHash", [h]) for h in missing])
+        for tx_hash, tx in zip(missing, txs):
+            if tx is not None and tx.get("to"):
+                targets[tx_hash] = tx["to"].lower()
+    transfers = [(*t, targets.get(t[0])) for t in transfers]
+    index.replace_range(network, from_block, to_block, transfers)
+    return to_block
+
+
+def lookup(network: str, tx_hash: str, address_from: str, min_amount=None):
+    """
+    Verification from the index, same rules as the RPC check: a success result if
+    tx_hash is a final, direct USDC call whose first transfer to our wallet is from
+    address_from (and >= min_amount). None otherwise -> caller asks the RPC, which
+    also gives the failure reason.
+    """
+    if not ENABLED or network not in _targets:
+        return None
+    usdc_address = _targets[network][0]
+    try:
+        index = get_index()
+        transfers = index.find(network, tx_hash)
+        head = index.checkpoint(network)
+    except Exception as e:
+        print(f"Indexer lookup error: {e}")
+        return None
+    if not transfers:
+        return None
+
+    # indexed transfers are only the ones to our wallet, in log order
+    block_number, sender, _, value, tx_to = transfers[0]
+    if tx_to != usdc_address.lower() or sender != address_from.lower():
+        return None
+    if min_amount is not None and value < int(min_amount):
+        return None
+    if not verify_cache.is_final(block_number, head):
+        return None
+    return {
+        "success": True,
+        "verified": True,
+        "tx_hash": tx_hash,
+        "token": "USDC",
+        "block": block_number,
+    }
+
+
+async def _run(network: str):
+    while True:
+        try:
+            await index_once(network)
+        except Exception as e:
+            print(f"Indexer error ({network}): {e}")
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+def start():
+    if not ENABLED or _tasks:
+        return
+    for network in _targets:
+        _tasks.append(asyncio.create_task(_run(network)))
+
+
+async def stop():
+    for task in _tasks:
+        task.cancel()
+    for task in _tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _tasks.clear()
@@ -0,0 +1,122 @@
+import asyncio
+import itertools
+import os
+import time
+
+
+# In-process balance ledger of the faucet wallet.
+# Payouts reserve their amount when they are queued, the reservation is
+# committed (deducted) once the tx is broadcast or released if it never goes
+# out - so a balance check is a dict lookup, not a balanceOf / get_balance call.
+# A timer reconciles the ledger with the chain; committed sends younger than
+# SETTLE_TIME may not be mined yet and are still subtracted from what the chain says.
+RECONCILE_INTERVAL = float(os.getenv("LEDGER_RECONCILE_INTERVAL", "60"))
+SETTLE_TIME = float(os.getenv("LEDGER_SETTLE_TIME", "30"))
+
+
+class Ledger:
+    def __init__(self, name: str, fetch_balances, on_reconcile=None):
+        """
+        fetch_balances() -> awaitable {asset: balance} read from the chain,
+        on_reconcile(balances) -> awaitable, runs after every successful reconcile (e.g. DB mirror).
+        """
+        self.name = name
+        self.fetch_balances = fetch_balances
+        self.on_reconcile = on_reconcile
+        self._balances = None  # asset -> last known balance minus committed sends
+        self._reserved = {}  # reservation id -> {asset: amount}
+        self._unsettled = []  # (committed at, {asset: amount})
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._task = None
+        self.reconciled_at = None
+
+    def available(self, asset: str) -> int:
+        if self._balances is None:
+            return 0
+        reserved = sum(amounts.get(asset, 0) for amounts in self._reserved.values())
+        return self._balances.get(asset, 0) - reserved
+
+    async def reserve(self, amounts: dict):
+        """Reserve {asset: amount}, returns a reservation id or None if there's not enough."""
+        if self._balances is None:
+            await self.reconcile()
+        self.start()
+        if any(self.available(asset) < amount for asset, amount in amounts.items()):
+            return None
+        reservation = next(self._ids)
+        self._reserved[reservation] = dict(amounts)
+        return reservation
+
+    def commit(self, reservation):
+        """The payout went out - its amount leaves the balance for good."""
+        amounts = self._reserved.pop(reservation, None)
+        if amounts is None:
+            return
+        for asset, amount in amounts.items():
+            self._balances[asset] = self._balances.get(asset, 0) - amount
+        self._unsettled.append((time.monotonic(), amounts))
+
+    def release(self, reservation):
+        """The payout never went out - the amount is available again."""
+        self._reserved.pop(reservation, None)
+
+    def refund(self, amounts: dict):
+        """A committed payout reverted on chain - its amount is back (the gas it burnt shows up at the next reconcile)."""
+        if self._balances is None:
+            return
+        for asset, amount in amounts.items():
+            self._balances[asset] = self._balances.get(asset, 0) + amount
+        for i, (_, unsettled) in enumerate(self._unsettled):
+            if unsettled == amounts:
+                # the chain balance never dropped by it - reconcile must not subtract it
+                del self._unsettled[i]
+                break
+
+    async def reconcile(self):
+        async with self._lock:
+            balances = dict(await self.fetch_balances())
+            now = time.monotonic()
+            self._unsettled = [(at, amounts) for at, amounts in self._unsettled if now - at < SETTLE_TIME]
+            for _, amounts in self._unsettled:
+                for asset, amount in amounts.items():
+                    balances[asset] = balances.get(asset, 0) - amount
+            self._balances = balances
+            self.reconciled_at = time.time()
+
+        if self.on_reconcile is not None:
+            try:
+                await self.on_reconcile(balances)
+            except Exception as e:
+                print(f"Ledger mirror error ({self.name}): {e}")
+        return balances
+
+    def snapshot(self) -> dict:
+        assets = self._balances or {}
+        return {
+            "balances": dict(assets),
+            "available": {asset: self.available(asset) for asset in assets},
+            "reservations": len(self._reserved),
+            "reconciled_at": self.reconciled_at,
+        }
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(RECONCILE_INTERVAL)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"Ledger reconcile error ({self.name}): {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
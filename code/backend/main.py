@@ -1,14 +1,40 @@
+import coldstart  # first - times every import below
 from http.client import responses
-from datetime import datetime, timedelta, timezone
-from fastapi import FastAPI, Request, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
-from dotenv import load_dotenv
-import functions_testnet, functions_mainnet, database
-import requests, time
-
-load_dotenv()
-app = FastAPI()
+import time
+import config  # noqa: F401  (loads .env - before any module that reads os.getenv at import time)
+import functions_testnet, functions_mainnet, database, chain, payouts, mints, progress, ratelimit, indexer, fees, metrics, singleflight, idempotency, schemas, versions, events
+import asyncio
+
+
+async def load_pending():
+    """Mints / payouts a stopped instance left behind."""
+    await asyncio.gather(mints.load_pending(), payouts.load_pending())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # nothing slow is awaited here: the signer account (eth_account import) and the
+    # nonce managers load on the first send, pending jobs in the background
+    with coldstart.timed("lifespan"):
+        loading = asyncio.create_task(load_pending())
+        indexer.start()
+    yield
+    loading.cancel()
+    await payouts.stop()
+    await mints.stop()
+    await indexer.stop()
+    await fees.stop()
+    await functions_testnet.faucet_ledger.stop()
+    # shared RPC connection pool
+    await chain.close()
+
+# responses are serialized by the response models (pydantic-core) and rendered with orjson
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -17,9 +43,54 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 MM_WALLET = os.getenv("MM_WALLET")
 
+# concurrent identical requests (client retries) share one run, see singleflight.py
+# *_TTL > 0 also keeps the result that many seconds (opt-in, default off)
+verify_flight = singleflight.Group("verify", float(os.getenv("SINGLEFLIGHT_VERIFY_TTL", "0")))
+get_user_flight = singleflight.Group("get-user", float(os.getenv("SINGLEFLIGHT_GET_USER_TTL", "0")))
+init_user_flight = singleflight.Group("init-user")
+
+def user_changed(wallet):
+    """Writes to a user's rows call this - drops what's kept for the wallet."""
+    get_user_flight.forget(wallet)
+
+# latency histogram per endpoint; with an "X-Trace: 1" request header the
+# DB / RPC / signing breakdown of the request comes back as Server-Timing
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    trace = None
+    if metrics.TRACE_ENABLED and request.headers.get(metrics.TRACE_HEADER):
+        trace = metrics.start_trace()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        seconds = time.perf_counter() - start
+        route = request.scope.get("route")
+        # unmatched paths share one label, so scanners can't blow up the series count
+        endpoint = route.path if route is not None else "unmatched"
+        metrics.observe("http_request_duration_seconds", seconds,
+                        endpoint=endpoint, method=request.method, status=str(status))
+        if trace is not None:
+            trace.add("total", seconds)
+            trace.active = False
+    if trace is not None:
+        response.headers["Server-Timing"] = trace.server_timing()
+    return response
+
+# malformed bodies (schemas.py) -> 400 + one message, same shape as the handlers' HTTPExceptions
+@app.exception_handler(RequestValidationError)
+async def invalid_request(request: Request, exc: RequestValidationError):
+    error = exc.errors()[0]
+    field = ".".join(str(part) for part in error["loc"][1:])
+    msg = error["msg"].removeprefix("Value error, ")
+    return ORJSONResponse({"detail": f"{field}: {msg}" if field else msg}, status_code=400)
+
 # ENDPOINTS
 @app.get("/")
 @app.get("/api")
@@ -30,293 +101,393 @@ def is_up():
         "endpoints": {
             "mainnet_verify": "/api/sme/verify",
             "testnet_verify": "/api/testnet/verify-transaction",
+            "mainnet_verify_batch": "/api/sme/verify-batch",
+            "testnet_verify_batch": "/api/testnet/verify-batch",
+            "startup_timing": "/api/startup-timing",
+            "events": "/api/events/{wallet}",
             "messages": "/api/messages"
         }
     }
 
-@app.post("/api/sme/verify")
-async def sme_verify(request: Request):
-    data = await request.json()
-    address_from = data.get("address_from")
-    tx_hash = data.get("tx_hash")
-    amount = data.get("amount")
-    token = data.get("token", "ETH").upper()
-
-    result = functions_mainnet.verify_mainnet_transaction(address_from, tx_hash, token, amount)
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# one long-lived SSE stream per open app instead of polling: progress flags,
+# completed sections, faucet payout and mint status of the wallet (events.py)
+@app.get("/api/events/{wallet}")
+async def wallet_events(wallet: schemas.Address):
+    if events.hub.full(wallet):
+        raise HTTPException(status_code=429, detail="Too many open event streams for this wallet.")
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events.stream(wallet), media_type="text/event-stream", headers=headers)
+
+@app.get("/api/rpc-status")
+def rpc_status():
+    """Provider pool per network - availability (circuit breaker), request / failure counts, p50 / p95."""
+    return {network: chain.get_pool(network).stats() for network in chain.NETWORKS}
+
+@app.get("/api/startup-timing")
+def startup_timing():
+    """Cold-start profile - import times per module + init times of lazy clients."""
+    return coldstart.report()
+
+@app.post("/api/sme/verify", response_model=schemas.VerifyResponse)
+async def sme_verify(body: schemas.MainnetVerifyRequest):
+    address_from = body.address_from
+    tx_hash = body.tx_hash
+    amount = body.amount
+    token = body.token
+
+    result = await verify_flight.do(
+        ("mainnet", address_from, tx_hash, token, amount),
+        functions_mainnet.verify_mainnet_transaction, address_from, tx_hash, token, amount,
+    )
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("msg"))
     return result
 
-@app.post("/api/testnet/verify-transaction")
-async def testnet_verify(request: Request):
-    data = await request.json()
-    address_from = data.get("address_from")
-    address_to = data.get("address_to")
-    tx_hash = data.get("tx_hash")
-    token = data.get("token", "ETH").upper()
-    amount = data.get("amount")
-
-    result = functions_testnet.verify_testnet_transaction(address_from, address_to, tx_hash, token, amount)
+@app.post("/api/testnet/verify-transaction", response_model=schemas.VerifyResponse)
+async def testnet_verify(body: schemas.TestnetVerifyRequest):
+    address_from = body.address_from
+    address_to = body.address_to
+    tx_hash = body.tx_hash
+    token = body.token
+    amount = body.amount
+
+    result = await verify_flight.do(
+        ("testnet", address_from, address_to, tx_hash, token, amount),
+        functions_testnet.verify_testnet_transaction, address_from, address_to, tx_hash, token, amount,
+    )
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("msg"))
     return result
 
 
+# bulk verify - one JSON-RPC batch for all hashes instead of 2 round trips per hash
+# (items are validated up front, max schemas.MAX_VERIFY_BATCH)
+@app.post("/api/sme/verify-batch", response_model=schemas.VerifyBatchResponse)
+async def sme_verify_batch(body: schemas.MainnetVerifyBatchRequest):
+    items = [item.model_dump() for item in body.items]
+    results = await functions_mainnet.verify_mainnet_batch(items)
+    return {"success": True, "results": results}
+
+@app.post("/api/testnet/verify-batch", response_model=schemas.VerifyBatchResponse)
+async def testnet_verify_batch(body: schemas.TestnetVerifyBatchRequest):
+    items = [item.model_dump() for item in body.items]
+    results = await functions_testnet.verify_testnet_batch(items)
+    return {"success": True, "results": results}
+
+
 #is user eligible for receiving USDC on testnet? did he pay more than withdraw?
+# the check also reserves the payout (practice_received += 1 while below practice_sent)
+# in one atomic write - concurrent requests can't both pass it
 # return 0 - ok, 1 - limit reached, 2- error
-def eligible_rec(wallet: str):
-    sent = database.get_field("USER_INFO", "practice_sent", wallet)
-    received = database.get_field("USER_INFO", "practice_received", wallet)
-
-    if sent is None or received is None:
+def reserve_rec(wallet: str):
+    rows = database.reserve_practice_payout(wallet)
+    user_changed(wallet)
+    if rows is None:
         return 2
-
-    if received >= sent:
-       return 1
+    if not rows:
+        return 1
     return 0
 
-def update_tx(wallet):
-    received = database.get_field("USER_INFO", "practice_received", wallet)
-    if received is None:
-        return False
-    status = database.update_field("USER_INFO", "practice_received", wallet, received+1)
-    if status is None:
-        return False
-
-    bot_bal = database.get_field("MY_WALLET", "balance-USDC", MM_WALLET)
-    if bot_bal is None:
-        return False
-    status = database.update_field("MY_WALLET", "balance-USDC", MM_WALLET, bot_bal-1)
-    if status is None:
-        return False
-    return True
-
-@app.post("/api/testnet/send-test")
-async def testnet_send(request: Request):
-    data = await request.json()
-    wallet = data.get("wallet")
-    if not wallet:
-        raise HTTPException(status_code=400, detail="No wallet!")
-
-    my_wallet_bal = database.get_field("MY_WALLET", "balance-USDC", MM_WALLET)
-    if my_wallet_bal is None:
-        return {"success": False, "msg": "Bot wallet row not found in MY_WALLET table"}
-    is_eligible = eligible_rec(wallet)
-
-    if is_eligible == 1 or my_wallet_bal < 1:
-        return {"success": False, "msg": "Send test USDC first, then withdraw!"}
-    elif is_eligible == 2:
-        raise HTTPException(status_code=400, detail="Error checking status!")
+def release_rec(wallet: str):
+    # payout wasn't sent - give the reservation back
+    # faucet balance itself is tracked by the ledger (functions_testnet.faucet_ledger)
+    rows = database.increment_counters([
+        ("USER_INFO", wallet, {"practice_received": -1}),
+    ])
+    user_changed(wallet)
+    return rows is not None
 
-    result = functions_testnet.validateAddress(wallet)
-    if not result.get("success"):
-        raise HTTPException(status_code=400, detail=result.get("msg"))
-
-    result = functions_testnet.try_sending(wallet)
-    if not result.get("success"):
-        raise HTTPException(status_code=400, detail=result.get("msg"))
+# payout / mint endpoints take an Idempotency-Key header - a retry with the same key
+# gets the first response back instead of a second payout (idempotency.py)
+@app.post("/api/testnet/send-test", response_model=schemas.PayoutResponse, response_model_exclude_none=True)
+async def testnet_send(body: schemas.WalletRequest, request: Request):
+    return await idempotency.run(request, "send-test", body.model_dump(), lambda: send_test(body.wallet))
 
-    result = update_tx(wallet)
-    if not result:
-        raise HTTPException(status_code=400, detail="Error updating trans. count!")
+async def send_test(wallet):
+    if not ratelimit.allow("send-test", wallet):
+        raise HTTPException(status_code=429, detail="Too many requests, try again later.")
 
-    return {"success": True}
+    is_eligible = await asyncio.to_thread(reserve_rec, wallet)
 
-@app.post("/api/database/init-user")
-async def api_init_user(request: Request):
-    data = await request.json()
-    wallet = data.get("wallet")
-    if not wallet:
-        raise HTTPException(status_code=400, detail="No wallet!")
+    if is_eligible == 1:
+        return {"success": False, "msg": "Send test USDC first, then withdraw!"}
+    elif is_eligible == 2:
+        raise HTTPException(status_code=400, detail="Error checking status!")
 
-    result = database.get_user(wallet)
+    # faucet balance is reserved in the in-process ledger - no balance read here
+    job = await payouts.enqueue("usdc", wallet)
+    if job["status"] == "failed":
+        await asyncio.to_thread(send_test_failed, job)
+        return {"success": False, "msg": job["msg"]}
+    return {"success": True, "job_id": job["job_id"], "status": job["status"]}
+
+# counter is taken on enqueue - it goes back if the payout isn't sent
+def send_test_failed(job):
+    if not release_rec(job["wallet"]):
+        print(f"Error releasing trans. count for {job['wallet']} (job {job['job_id']})")
+
+payouts.handle("usdc", on_failed=send_test_failed)
+
+@app.post("/api/testnet/payout-status", response_model=schemas.PayoutStatusResponse)
+async def payout_status(body: schemas.PayoutStatusRequest):
+    job_id = body.job_id
+    job = await payouts.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job!")
+    return {"success": True, "job_id": job_id, "status": job["status"], "tx_hash": job["tx_hash"], "msg": job["msg"]}
+
+@app.post("/api/database/init-user", response_model=schemas.InitUserResponse)
+async def api_init_user(body: schemas.WalletRequest):
+    wallet = body.wallet
+    # duplicate init-user calls share one check-and-create instead of racing it
+    return await init_user_flight.do(wallet, init_user, wallet)
+
+async def init_user(wallet):
+    result = await asyncio.to_thread(database.get_user, wallet)
     if result is not None:
         return {"success": True, "created": False}
 
-    response = database.add_user(wallet)
+    response = await asyncio.to_thread(database.add_user, wallet)
     if response is None:
         raise HTTPException(status_code=500, detail="Error adding user to DB.")
 
+    user_changed(wallet)
     return {"success": True, "created": True}
 
-@app.post("/api/database/delete-user")
-async def api_del_user(request: Request):
-    data = await request.json()
-    wallet = data.get("wallet")
-    if not wallet:
-        raise HTTPException(status_code=400, detail="No wallet!")
-    response = database.delete_user(wallet)
+@app.post("/api/database/delete-user", response_model=schemas.ApiResponse)
+async def api_del_user(body: schemas.WalletRequest):
+    wallet = body.wallet
+    response = await asyncio.to_thread(database.delete_user, wallet)
+    user_changed(wallet)
     if not response:
         raise HTTPException(status_code=500, detail="Error deleting user from DB.")
     return {"success": True}
 
 #returns: ({'wallet': 'test_user', 'id': 18, 'created_at': '2025-12-20T20:16:41.898289+00:00', 'practice_sent': 0, 'practice_received': 0, 'completed_all': False, 'completed_theory': False, 'completed_practice': False}, {'id': 11, 'wallet': 'test_user', 'created_at': '2025-12-20T20:16:41.997225+00:00', 'theory': False, 'faucet': False, 'send': False, 'receive': False, 'mint': False, 'launch': False})
-@app.post("/api/database/get-user")
-async def get_user(request: Request):
-    data = await request.json()
-    wallet = data.get("wallet")
-    if not wallet:
-        raise HTTPException(status_code=400, detail="No wallet!")
-
-    response = database.get_user(wallet)
-    if response is None:
+@app.post("/api/database/get-user", response_model=schemas.UserResponse)
+async def get_user(body: schemas.WalletRequest, request: Request, response: Response):
+    return await read_user(body.wallet, request, response)
+
+USER_CACHE_CONTROL = "private, no-cache"
+
+# same as POST get-user, but cacheable - the browser / CDN keeps it and revalidates with If-None-Match
+@app.get("/api/database/user/{wallet}", response_model=schemas.UserResponse)
+async def get_user_cacheable(wallet: schemas.Address, request: Request, response: Response):
+    return await read_user(wallet, request, response, USER_CACHE_CONTROL)
+
+# user reads carry the wallet's version as ETag (versions.py); If-None-Match with
+# the current one -> 304 from the version alone (memory or one small query), rows aren't read
+async def current_etag(wallet):
+    tag = versions.get(wallet)
+    if tag is None:
+        tag = await asyncio.to_thread(database.get_user_version, wallet)
+    return tag
+
+def not_modified(request: Request, tag, cache_control=None):
+    if_none_match = request.headers.get("if-none-match")
+    if tag is None or not if_none_match or not versions.matches(if_none_match, tag):
+        return None
+    headers = {"ETag": tag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=304, headers=headers)
+
+async def read_user(wallet, request: Request, response: Response, cache_control=None):
+    if request.headers.get("if-none-match"):
+        unchanged = not_modified(request, await current_etag(wallet), cache_control)
+        if unchanged is not None:
+            return unchanged
+
+    # DB call runs off the event loop, so concurrent reads of one wallet can share it
+    user = await get_user_flight.do(wallet, asyncio.to_thread, database.get_user, wallet)
+    if user is None:
         raise HTTPException(status_code=500, detail="Error getting user from DB.")
-    info = response[0]
-    progress = response[1]
+    info = user[0]
+    progress = user[1]
+    response.headers["ETag"] = database.user_etag(info)
+    if cache_control:
+        response.headers["Cache-Control"] = cache_control
     return {"success": True, "info": info, "progress": progress}
 
-@app.post("/api/database/update_field")
-async def update_field(request: Request):
-    data = await request.json()
-    wallet = data.get("wallet")
-    table_name = data.get("table_name")
-    field_name = data.get("field_name")
-    value = data.get("value")
-
-    if not wallet or not table_name or not field_name or value is None:
-        raise HTTPException(status_code=400, detail="Invalid parameters!")
-
-    response = database.update_field(table_name, field_name, wallet, value)
+@app.post("/api/database/update_field", response_model=schemas.ApiResponse)
+async def update_field(body: schemas.UpdateFieldRequest):
+    wallet = body.wallet
+    table_name = body.table_name
+    field_name = body.field_name
+    value = body.value
+    response = await asyncio.to_thread(database.update_field, table_name, field_name, wallet, value)
+    user_changed(wallet)
     if not response:
         raise HTTPException(status_code=400, detail="Error updating field in DB.")
 
     if table_name == "USER_PROGRESS":
-        response = database.check_completion(wallet)
+        response = await asyncio.to_thread(database.check_completion, wallet, changed_fields=[field_name])
         if response is None:
             raise HTTPException(status_code=500, detail="Error checking completion from DB.")
 
     return {"success": True}
 
-@app.post("/api/database/get-field")
-async def get_field(request: Request):
-    data = await request.json()
-    wallet = data.get("wallet")
-    table_name = data.get("table_name")
-    field_name = data.get("field_name")
-    if not wallet or not table_name or not field_name:
-        raise HTTPException(status_code=400, detail="Invalid parameters!")
+# fields the client may patch directly
+PATCH_ALLOWLIST = {
+    "USER_PROGRESS": set(progress.FIELDS),
+}
+
+# several flags of one wallet -> one write per table + one completion check
+@app.post("/api/database/patch", response_model=schemas.PatchResponse)
+async def patch_fields(body: schemas.PatchRequest):
+    wallet = body.wallet
+
+    changes = {}
+    for update in body.updates:
+        table_name = update.table_name
+        field_name = update.field_name
+        if field_name not in PATCH_ALLOWLIST.get(table_name, ()):
+            raise HTTPException(status_code=400, detail=f"Field {table_name}.{field_name} can't be patched!")
+        changes.setdefault(table_name, {})[field_name] = update.value
+
+    response = await asyncio.to_thread(database.patch_fields, wallet, changes)
+    user_changed(wallet)
+    if not response or not all(response.values()):
+        raise HTTPException(status_code=400, detail="Error updating fields in DB.")
+
+    completed = {}
+    if "USER_PROGRESS" in changes:
+        completed = await asyncio.to_thread(database.check_completion, wallet,
+                                            changed_fields=list(changes["USER_PROGRESS"]))
+        if completed is None:
+            raise HTTPException(status_code=500, detail="Error checking completion from DB.")
 
-    response = database.get_field(table_name, field_name, wallet)
-    if response is None:
+    return {"success": True, "completed": completed}
+
+@app.post("/api/database/get-field", response_model=schemas.FieldResponse)
+async def get_field(body: schemas.FieldRequest, request: Request, response: Response):
+    wallet = body.wallet
+    table_name = body.table_name
+    field_name = body.field_name
+
+    # user fields are versioned with the wallet; the tag is taken before the read,
+    # so a write in between only costs the next poll a full read
+    tag = None
+    if table_name in ("USER_INFO", "USER_PROGRESS"):
+        tag = await current_etag(wallet)
+        if tag is not None:
+            tag = versions.field_etag(tag, table_name, field_name)
+            unchanged = not_modified(request, tag)
+            if unchanged is not None:
+                return unchanged
+
+    value = await asyncio.to_thread(database.get_field, table_name, field_name, wallet)
+    if value is None:
         raise HTTPException(status_code=400, detail="Error getting field from DB.")
-    return {"success": True, "value": response}
+    if tag is not None:
+        response.headers["ETag"] = tag
+    return {"success": True, "value": value}
 
 #user sent practice USDC to my bot wallet
-@app.post("/api/database/practice-sent")
-async def practice_sent(request: Request):
-    data = await request.json()
-    wallet = data.get("wallet")
-    if not wallet:
-        raise HTTPException(status_code=400, detail="No wallet!")
-
-    u = database.get_field("USER_INFO", "practice_sent", wallet)
-    b = database.get_field("MY_WALLET", "balance-USDC", MM_WALLET)
-
-    if u is None or b is None:
-        raise HTTPException(status_code=400, detail="Error getting data from DB.")
-
-    user = database.update_field("USER_INFO", "practice_sent", wallet, u+1)
-    bot = database.update_field("MY_WALLET", "balance-USDC", MM_WALLET, b+1)
-
-    if user is None or bot is None:
+@app.post("/api/database/practice-sent", response_model=schemas.ApiResponse)
+async def practice_sent(body: schemas.WalletRequest):
+    wallet = body.wallet
+
+    # the deposit shows up in the faucet ledger with its next on-chain reconcile
+    rows = await asyncio.to_thread(database.increment_counters, [
+        ("USER_INFO", wallet, {"practice_sent": 1}),
+    ])
+    user_changed(wallet)
+    if rows is None:
         raise HTTPException(status_code=400, detail="Error updating data to DB.")
 
     return {"success": True}
 
-@app.post("/api/add-donation")
-async def add_donation(request: Request):
-    data = await request.json()
-    amount = data.get("amount")
-    if not amount:
-        raise HTTPException(status_code=400, detail="No amount!")
-
-    prev_c, prev_a = database.get_my_donations()
-    if prev_c is None or prev_a is None:
-        raise HTTPException(status_code=400, detail="Error getting donations from DB.")
+@app.post("/api/add-donation", response_model=schemas.ApiResponse)
+async def add_donation(body: schemas.DonationRequest):
+    amount = body.amount
 
-    response = database.update_field("MY_WALLET", "real_count", MM_WALLET, prev_c+1)
-    if response is None:
-        raise HTTPException(status_code=400, detail="Error updating donation count to DB.")
-    response = database.update_field("MY_WALLET", "real_amount", MM_WALLET, prev_a+amount)
+    response = await asyncio.to_thread(database.increment_counters, [
+        ("MY_WALLET", MM_WALLET, {"real_count": 1, "real_amount": amount}),
+    ])
     if response is None:
-        raise HTTPException(status_code=400, detail="Error updating donation amount to DB.")
+        raise HTTPException(status_code=400, detail="Error updating donations in DB.")
     return {"success": True}
 
 
-@app.post("/api/buy-nft")
-async def buy_nft(request: Request):
-    data = await request.json()
-    wallet = data.get("wallet")
-    tx_hash = data.get("tx_hash")
+@app.post("/api/buy-nft", response_model=schemas.MintResponse)
+async def buy_nft(body: schemas.BuyNftRequest, request: Request):
+    return await idempotency.run(request, "buy-nft", body.model_dump(), lambda: submit_mint(body.wallet))
 
-    if not wallet:
-        raise HTTPException(status_code=400, detail="Chybí wallet address")
+async def submit_mint(wallet):
+    user = await asyncio.to_thread(database.get_user, wallet)
+    info = user[0] if user is not None else {}
 
-    is_completed = database.get_field("USER_INFO", "completed_all", wallet)
-
-    if not is_completed:
+    if not info.get("completed_all"):
         raise HTTPException(status_code=400, detail="Nemáš splněný celý kurz (completed_all is False).")
 
-    mint_result = functions_mainnet.mint_nft_to_user(wallet)
+    # NFT už má (i z doby před MINT_JOBS) -> žádný druhý airdrop
+    if info.get("claimed_nft"):
+        job = await asyncio.to_thread(database.get_mint_job, wallet)
+        return {"success": True, "mint_tx": job["tx_hash"] if job else None, "status": "confirmed"}
+
+    # rezervace jobu v DB (jeden aktivní mint na wallet) + odeslání tx,
+    # claimed_nft nastaví tracker v mints.py po potvrzení
+    mint_result = await mints.submit(wallet)
 
     if not mint_result.get("success"):
         raise HTTPException(status_code=500, detail=f"Mint selhal: {mint_result.get('msg')}")
 
-    database.update_field("USER_INFO", "claimed_nft", wallet, True)
+    return {"success": True, "mint_tx": mint_result.get("tx_hash"), "status": mint_result["status"]}
 
-    return {"success": True, "mint_tx": mint_result.get("tx_hash")}
 
+@app.post("/api/mint-status", response_model=schemas.MintResponse)
+async def mint_status(body: schemas.WalletRequest):
+    wallet = body.wallet
 
-@app.post("/api/testnet/drip-eth")
-async def drip_eth(request: Request):
-    data = await request.json()
-    wallet = data.get("wallet")
+    job = await asyncio.to_thread(database.get_mint_job, wallet)
+    if job is None:
+        return {"success": True, "status": "none", "mint_tx": None}
 
-    if not wallet:
-        raise HTTPException(status_code=400, detail="No wallet provided!")
+    try:
+        job = await mints.refresh(job)
+    except Exception as e:
+        print(f"Mint status error: {e}")
+    return {"success": True, "status": job["status"], "mint_tx": job["tx_hash"]}
 
-    # --- 1. KROK: KONTROLA COOLDOWNU ---
-    raw_drip_time = database.get_field("USER_INFO", "last_drip", wallet)
 
-    if raw_drip_time:
-        now = datetime.now(timezone.utc)
+@app.post("/api/testnet/drip-eth", response_model=schemas.PayoutResponse, response_model_exclude_none=True)
+async def drip_eth(body: schemas.WalletRequest, request: Request):
+    return await idempotency.run(request, "drip-eth", body.model_dump(), lambda: drip(body.wallet))
 
-        # Ošetření vstupu (str vs datetime)
-        if isinstance(raw_drip_time, str):
-            clean_time_str = raw_drip_time.replace(" ", "T")
-            last_drip = datetime.fromisoformat(clean_time_str)
-        elif hasattr(raw_drip_time, 'combine'):
-            last_drip = datetime.combine(raw_drip_time, datetime.min.time())
-        else:
-            last_drip = raw_drip_time
+async def drip(wallet):
+    if not ratelimit.allow("drip-eth", wallet):
+        raise HTTPException(status_code=429, detail="Too many requests, try again later.")
 
-        # Ujištění se o časové zóně
-        if last_drip.tzinfo is None:
-            last_drip = last_drip.replace(tzinfo=timezone.utc)
-
-        if now - last_drip < timedelta(hours=48):
-            cooldown_end = last_drip + timedelta(hours=48)
-            diff = cooldown_end - now
-            hours_left = max(0, int(diff.total_seconds())) // 3600
-            return {"success": False, "msg": f"Cooldown active! Wait {hours_left}h more."}
-
-    bot_eth_balance = database.get_field("MY_WALLET", "balance-ETH", MM_WALLET)
-    if bot_eth_balance is None:
-        bot_eth_balance = 0.0
-
-    if bot_eth_balance < 0.0001:
-        return {"success": False, "msg": "Faucet is currently empty (Internal Limit)."}
-
-    result = functions_testnet.drip_testnet_eth(wallet)
-
-    if not result.get("success"):
-        raise HTTPException(status_code=500, detail=result.get("msg"))
-
-    new_time = str(datetime.now(timezone.utc))
-
-    database.update_field("USER_INFO", "last_drip", wallet, new_time)
-
-    new_balance = float(bot_eth_balance) - 0.0001
-    database.update_field("MY_WALLET", "balance-ETH", MM_WALLET, new_balance)
-
-    return result
\ No newline at end of file
+    # --- 1. KROK: KONTROLA COOLDOWNU ---
+    # expirace cooldownu je v paměti, DB (last_drip) se čte jen při cache miss (ve worker threadu);
+    # druhý dotaz je jen z paměti a vidí drip, který mezitím spustil jiný request
+    remaining = await asyncio.to_thread(ratelimit.drip_cooldowns.remaining, wallet)
+    if remaining <= 0:
+        remaining = ratelimit.drip_cooldowns.remaining(wallet)
+    if remaining > 0:
+        hours_left = remaining // 3600
+        return {"success": False, "msg": f"Cooldown active! Wait {hours_left}h more."}
+
+    # cooldown is reserved in memory right away - retries while the payout is queued get rejected
+    ratelimit.drip_cooldowns.start(wallet, persist=False)
+
+    # payout goes to the queue (faucet balance reserved in the ledger), cooldown (last_drip) is written once it's broadcast
+    job = await payouts.enqueue("eth", wallet)
+    if job["status"] == "failed":
+        ratelimit.drip_cooldowns.clear(wallet)
+        return {"success": False, "msg": job["msg"]}
+    return {"success": True, "job_id": job["job_id"], "status": job["status"]}
+
+def drip_sent(job):
+    ratelimit.drip_cooldowns.start(job["wallet"])
+
+def drip_failed(job):
+    # a drip that reverted after broadcast had its last_drip written already
+    ratelimit.drip_cooldowns.clear(job["wallet"], persist=job["tx_hash"] is not None)
+
+payouts.handle("eth", on_sent=drip_sent, on_failed=drip_failed)
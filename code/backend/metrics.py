@@ -0,0 +1,122 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+# Hot-path instrumentation - latency histograms in Prometheus text format (/metrics).
+# timer() records into a histogram and, if the current request asked for a trace
+# (TRACE_HEADER), also into that request's breakdown, returned as Server-Timing.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TRACE_HEADER = "x-trace"
+TRACE_ENABLED = os.getenv("METRICS_TRACE", "true").lower() in ("1", "true", "yes")
+
+HELP = {
+    "http_request_duration_seconds": "Endpoint latency",
+    "db_call_duration_seconds": "Storage call latency by operation and table",
+    "rpc_call_duration_seconds": "JSON-RPC call latency by network and method",
+    "sign_duration_seconds": "Transaction signing time",
+    "rpc_provider_duration_seconds": "JSON-RPC request latency by provider and outcome",
+    "rpc_hedged_requests_total": "Reads sent to a second provider because the first was slow",
+    "singleflight_calls_total": "Coalesced calls - run / shared with a running call / kept result",
+    "idempotency_requests_total": "Requests with an Idempotency-Key by outcome (run / replayed / shared / ...)",
+    "events_published_total": "Events pushed to wallets with an open event stream, by type",
+    "events_dropped_total": "Event backlogs dropped for subscribers that didn't keep up",
+}
+
+_histograms = {}  # name -> {labels tuple: [bucket counts..., sum, count]}
+_counters = {}  # name -> {labels tuple: value}
+
+
+def observe(name: str, seconds: float, **labels):
+    series = _histograms.setdefault(name, {})
+    key = tuple(sorted(labels.items()))
+    values = series.get(key)
+    if values is None:
+        values = series[key] = [0] * len(BUCKETS) + [0.0, 0]
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            values[i] += 1
+    values[-2] += seconds
+    values[-1] += 1
+
+
+def inc(name: str, value: float = 1, **labels):
+    series = _counters.setdefault(name, {})
+    key = tuple(sorted(labels.items()))
+    series[key] = series.get(key, 0) + value
+
+
+class Trace:
+    """Per-request breakdown, only filled while the request is running."""
+
+    __slots__ = ("spans", "active")
+
+    def __init__(self):
+        self.spans = []
+        self.active = True
+
+    def add(self, name: str, seconds: float):
+        # background tasks started by a request inherit its context - they must not keep appending
+        if self.active:
+            self.spans.append((name, seconds))
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. db.get_user.USER_SNAPSHOT;dur=12.3"""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans)
+
+
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace() -> Trace:
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+
+@contextmanager
+def timer(name: str, span: str = None, **labels):
+    """with timer("db_call_duration_seconds", "db.get_field", op="get_field", table="USER_INFO"): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        observe(name, seconds, **labels)
+        trace = _trace.get()
+        if trace is not None and span is not None:
+            trace.add(span, seconds)
+
+
+def _labels(key: tuple, extra: str = None) -> str:
+    parts = [f'{name}="{value}"' for name, value in key]
+    if extra is not None:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render() -> str:
+    lines = []
+    for name, series in sorted(_histograms.items()):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, values in sorted(series.items()):
+            # observe() bumps every bucket >= the value, so counts are already cumulative
+            for bound, count in zip(BUCKETS, values):
+                le = 'le="%s"' % bound
+                lines.append(f"{name}_bucket{_labels(key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_labels(key, le)} {values[-1]}")
+            lines.append(f"{name}_sum{_labels(key)} {values[-2]}")
+            lines.append(f"{name}_count{_labels(key)} {values[-1]}")
+    for name, series in sorted(_counters.items()):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for key, value in sorted(series.items()):
+            lines.append(f"{name}{_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    _histograms.clear()
+    _counters.clear()
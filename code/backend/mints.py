@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+
+import database, events, functions_mainnet, ratelimit
+
+# Mint jobs - /api/buy-nft only submits the airdrop tx and records a pending
+# mint, this tracker polls receipts of all pending mints in one JSON-RPC batch
+# and sets claimed_nft once the mint is confirmed. Status changes go to the
+# wallet's event stream (events.py).
+# The tx hash is stored before the broadcast, so a send that errors out (timeout)
+# or a process that dies can be reconciled against the chain later; a reservation
+# that never got a signed tx expires after RESERVATION_TTL.
+POLL_INTERVAL = float(os.getenv("MINT_POLL_INTERVAL", "3"))
+RESERVATION_TTL = int(os.getenv("MINT_RESERVATION_TTL", "120"))
+
+_pending = {}  # tx_hash -> wallet
+_tracker = None
+
+
+ACTIVE = ("pending", "confirmed")
+
+
+def _stale(job: dict) -> bool:
+    updated = ratelimit.parse_timestamp(job.get("updated_at") or job.get("created_at"))
+    return updated is not None and time.time() - updated > RESERVATION_TTL
+
+
+async def _expire(job: dict) -> dict:
+    await asyncio.to_thread(database.set_mint_job, job["id"], "failed")
+    return dict(job, status="failed")
+
+
+async def submit(wallet: str) -> dict:
+    """
+    Reserve the wallet's mint job, then send the mint tx -> {"success", "tx_hash", "status"}.
+    The DB allows one active (pending / confirmed) job per wallet, so of concurrent
+    calls only one sends an airdrop, the others get the active job back (after
+    refresh(), so an abandoned reservation doesn't block the wallet).
+    """
+    job = await asyncio.to_thread(database.reserve_mint_job, wallet)
+    if job is None:
+        active = await asyncio.to_thread(database.get_mint_job, wallet)
+        if active is not None and active["status"] in ACTIVE:
+            try:
+                active = await refresh(active)
+            except Exception as e:
+                print(f"Mint refresh error: {e}")
+            if active["status"] in ACTIVE:
+                return {"success": True, "tx_hash": active["tx_hash"], "status": active["status"]}
+            job = await asyncio.to_thread(database.reserve_mint_job, wallet)
+        if job is None:
+            return {"success": False, "msg": "Mint could not be reserved, try again."}
+
+    signed = []
+
+    async def on_signed(tx_hash):
+        # no stored hash = no broadcast, the reservation could never be reconciled
+        if not await asyncio.to_thread(database.set_mint_job, job["id"], "pending", tx_hash):
+            raise RuntimeError("Mint job could not be saved")
+        signed.append(tx_hash)
+
+    result = await functions_mainnet.mint_nft_to_user(wallet, on_signed=on_signed)
+    if not result.get("success"):
+        if not signed:
+            await asyncio.to_thread(database.set_mint_job, job["id"], "failed")
+            return result
+        # the broadcast errored out, but it may have reached the node (e.g. a timeout)
+        try:
+            sent = await functions_mainnet.tx_known(signed[-1])
+        except Exception as e:
+            print(f"Mint reconcile error: {e}")
+            sent = True  # unsure - stays pending, refresh() settles it
+        if not sent:
+            await asyncio.to_thread(database.set_mint_job, job["id"], "failed")
+            return result
+        result = {"success": True, "tx_hash": signed[-1]}
+
+    # the job row got its tx_hash in on_signed already
+    tx_hash = result["tx_hash"]
+    _pending[tx_hash] = wallet
+    events.publish(wallet, "mint", status="pending", mint_tx=tx_hash)
+    start()
+    return {"success": True, "tx_hash": tx_hash, "status": "pending"}
+
+
+def _finish(tx_hash: str, wallet: str, status: int):
+    if status == 1:
+        database.update_field("USER_INFO", "claimed_nft", wallet, True)
+        database.update_mint_job(tx_hash, "confirmed")
+    else:
+        database.update_mint_job(tx_hash, "failed")
+    _pending.pop(tx_hash, None)
+    events.publish(wallet, "mint", status="confirmed" if status == 1 else "failed", mint_tx=tx_hash)
+
+
+async def check_pending(tx_hashes=None):
+    """One receipt round for the given (default: all) pending mints."""
+    if tx_hashes is None:
+        tx_hashes = list(_pending)
+    statuses = await functions_mainnet.get_mint_statuses(tx_hashes)
+    for tx_hash, status in statuses.items():
+        if status is not None and tx_hash in _pending:
+            _finish(tx_hash, _pending[tx_hash], status)
+    return statuses
+
+
+async def refresh(job: dict) -> dict:
+    """
+    Mint job from DB -> re-checked on chain if it's still pending (no tracker on serverless).
+    A stale reservation without a tx, or whose tx the node never got, is expired (failed).
+    """
+    if job["status"] != "pending":
+        return job
+    if not job["tx_hash"]:
+        return await _expire(job) if _stale(job) else job
+    _pending.setdefault(job["tx_hash"], job["wallet"])
+    statuses = await check_pending([job["tx_hash"]])
+    status = statuses.get(job["tx_hash"])
+    if status is not None:
+        return dict(job, status="confirmed" if status == 1 else "failed")
+    if _stale(job) and not await functions_mainnet.tx_known(job["tx_hash"]):
+        # signed and stored, but the process died before the broadcast
+        _pending.pop(job["tx_hash"], None)
+        return await _expire(job)
+    return job
+
+
+async def _run():
+    while _pending:
+        await asyncio.sleep(POLL_INTERVAL)
+        try:
+            await check_pending()
+        except Exception as e:
+            print(f"Mint tracker error: {e}")
+
+
+def start():
+    global _tracker
+    if _pending and (_tracker is None or _tracker.done()):
+        _tracker = asyncio.create_task(_run())
+
+
+async def load_pending():
+    """Pick up mints that were still pending when the process stopped."""
+    for job in await asyncio.to_thread(database.get_pending_mints) or []:
+        if job["tx_hash"]:
+            _pending[job["tx_hash"]] = job["wallet"]
+        elif _stale(job):
+            # reserved, never signed - nothing was sent
+            await _expire(job)
+    start()
+
+
+async def stop():
+    global _tracker
+    if _tracker is not None:
+        _tracker.cancel()
+        try:
+            await _tracker
+        except asyncio.CancelledError:
+            pass
+    _tracker = None
@@ -0,0 +1,110 @@
+import asyncio
+
+import aiohttp
+
+import chain, rpcpool
+
+# Local nonce allocation for our signing wallets (faucet/bot, NFT admin).
+# One manager per (chain, signer): syncs from the node's pending count on
+# first use / after errors and hands out nonces under a lock, so several
+# sends can be in flight at once without asking the node every time.
+
+NONCE_ERRORS = ("nonce too low", "already known", "replacement transaction underpriced", "nonce too high")
+
+
+def is_nonce_error(error) -> bool:
+    msg = str(error).lower()
+    return any(text in msg for text in NONCE_ERRORS)
+
+
+def is_ambiguous_error(error) -> bool:
+    """
+    No clear answer from the node (timeout, dropped connection, 5xx) - the tx may be out.
+    A connection that was never made is clear: the tx didn't leave.
+    """
+    if isinstance(error, aiohttp.ClientConnectorError):
+        return False
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError, rpcpool.ProviderError, ConnectionError))
+
+
+class NonceManager:
+    def __init__(self, network: str, address: str):
+        self.network = network
+        self.address = address
+        self._next = None  # None = sync from node on next allocate
+        self._in_flight = set()
+        self._lock = asyncio.Lock()
+
+    async def _sync_locked(self):
+        w3 = await chain.get_w3(self.network)
+        self._next = await w3.eth.get_transaction_count(self.address, "pending")
+        self._in_flight.clear()
+
+    async def sync(self):
+        async with self._lock:
+            await self._sync_locked()
+
+    async def allocate(self) -> int:
+        async with self._lock:
+            if self._next is None:
+                await self._sync_locked()
+            nonce = self._next
+            self._next += 1
+            self._in_flight.add(nonce)
+            return nonce
+
+    def confirm(self, nonce: int):
+        """Node accepted the tx with this nonce."""
+        self._in_flight.discard(nonce)
+
+    async def forget(self, nonce: int):
+        """Not known whether the tx with this nonce reached the node - resync from pending before next send."""
+        async with self._lock:
+            self._in_flight.discard(nonce)
+            self._next = None
+
+    async def release(self, nonce: int):
+        """Tx with this nonce never reached the node - don't leave a gap."""
+        async with self._lock:
+            self._in_flight.discard(nonce)
+            if self._next is not None and nonce == self._next - 1:
+                # last one handed out - just reuse it
+                self._next = nonce
+            else:
+                # hole in the middle - the node knows best, resync before next send
+                self._next = None
+
+    async def send(self, build_and_send, retries: int = 2):
+        """
+        build_and_send(nonce) -> awaitable (signs + broadcasts with that nonce).
+        Nonce errors (someone else used the wallet, dropped tx, ...) resync and retry.
+        The nonce is reused only if the node clearly didn't take the tx - after a
+        transport error it may be out, reusing it could replace it.
+        """
+        for attempt in range(retries + 1):
+            nonce = await self.allocate()
+            try:
+                result = await build_and_send(nonce)
+            except Exception as e:
+                if is_ambiguous_error(e):
+                    await self.forget(nonce)
+                    raise
+                await self.release(nonce)
+                if is_nonce_error(e) and attempt < retries:
+                    await self.sync()
+                    continue
+                raise
+            self.confirm(nonce)
+            return result
+
+
+_managers = {}
+
+
+def get_manager(network: str, address: str) -> NonceManager:
+    key = (chain.chain_id(network), address.lower())
+    manager = _managers.get(key)
+    if manager is None:
+        manager = NonceManager(network, address)
+        _managers[key] = manager
+    return manager
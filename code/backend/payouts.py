@@ -0,0 +1,328 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+import chain, database, events, fees, functions_testnet, ratelimit
+
+# Faucet payout queue for /api/testnet/send-test and /api/testnet/drip-eth.
+# Endpoints only enqueue and return a job id, one background worker drains the
+# queue in batches: the amount is reserved in the faucet ledger on enqueue,
+# nonces come from the nonce manager and the whole batch is broadcast concurrently.
+# Sent payouts are then watched until their receipt is in (status confirmed / failed);
+# every status change is pushed to the wallet's event stream (events.py).
+# Jobs are kept in PAYOUT_JOBS (sql/010_payout_jobs.sql) too: payout-status works on
+# any instance, and a job left queued by an instance that stopped / froze is resumed
+# by the next one that sees it (load_pending / get_job) after RESUME_AFTER. The worker
+# claims jobs (queued -> sending) before it sends, so only one instance sends a job.
+# A job that was "sending" when its process died is not resumed (the tx may be out).
+BATCH_SIZE = int(os.getenv("PAYOUT_BATCH_SIZE", "20"))
+BATCH_WAIT = float(os.getenv("PAYOUT_BATCH_WAIT", "0.05"))  # seconds to let a batch fill up
+JOB_TTL = int(os.getenv("PAYOUT_JOB_TTL", "3600"))  # finished jobs are kept this long
+CONFIRM_INTERVAL = float(os.getenv("PAYOUT_CONFIRM_INTERVAL", "3"))
+CONFIRM_TIMEOUT = int(os.getenv("PAYOUT_CONFIRM_TIMEOUT", "600"))  # a tx not mined by then stays "sent"
+RESUME_AFTER = int(os.getenv("PAYOUT_RESUME_AFTER", "30"))  # seconds a job may sit queued before another instance takes it
+
+KINDS = ("usdc", "eth")
+# job is out of the queue: sent = broadcast, confirmed = mined, failed = not sent / reverted
+DONE_STATUSES = ("sent", "confirmed", "failed")
+
+_jobs = {}
+_handlers = {}  # kind -> (on_sent, on_failed)
+_handling = set()  # running handler calls
+_reservations = {}  # job id -> faucet ledger reservation
+_unconfirmed = {}  # tx_hash -> sent job
+_queue = None
+_worker = None
+_confirmer = None
+
+
+def _prune():
+    now = time.time()
+    for job_id in [j for j, job in _jobs.items()
+                   if job["status"] in DONE_STATUSES and now - job["updated_at"] > JOB_TTL]:
+        del _jobs[job_id]
+
+
+def _update(job: dict, **fields):
+    job.update(fields)
+    job["updated_at"] = time.time()
+
+
+def _timestamp(value: float) -> str:
+    return datetime.fromtimestamp(value, timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _row(job: dict) -> dict:
+    return dict(job, created_at=_timestamp(job["created_at"]), updated_at=_timestamp(job["updated_at"]))
+
+
+def _job(row: dict) -> dict:
+    job = {key: row[key] for key in ("job_id", "kind", "wallet", "status", "tx_hash", "msg")}
+    job["created_at"] = ratelimit.parse_timestamp(row["created_at"])
+    job["updated_at"] = ratelimit.parse_timestamp(row["updated_at"])
+    return job
+
+
+async def _save(jobs: list):
+    if jobs and await asyncio.to_thread(database.save_payout_jobs, [_row(job) for job in jobs]) is None:
+        print(f"Error saving {len(jobs)} payout jobs")
+
+
+def _publish(job: dict):
+    events.publish(job["wallet"], "payout", job_id=job["job_id"], kind=job["kind"],
+                   status=job["status"], tx_hash=job["tx_hash"], msg=job["msg"])
+
+
+def handle(kind: str, on_sent=None, on_failed=None):
+    """
+    Callbacks of a payout kind: on_sent(job) runs after broadcast, on_failed(job) if it's
+    not sent. Registered per kind, not per job - a resumed job runs them on any instance.
+    """
+    _handlers[kind] = (on_sent, on_failed)
+
+
+def _start():
+    global _queue, _worker
+    if _queue is None:
+        _queue = asyncio.Queue()
+    if _worker is None or _worker.done():
+        _worker = asyncio.create_task(_run())
+
+
+async def enqueue(kind: str, wallet: str) -> dict:
+    """
+    Queue a payout, returns the job right away.
+    If the faucet can't cover it the job comes back already failed (nothing queued).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown payout kind {kind}")
+
+    _start()
+    _prune()
+    now = time.time()
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "kind": kind,
+        "wallet": wallet,
+        "status": "queued",
+        "tx_hash": None,
+        "msg": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    ledger = functions_testnet.faucet_ledger
+    reservation, msg = await _reserve(kind)
+    if reservation is None:
+        job.update(status="failed", msg=msg)
+        _jobs[job["job_id"]] = job
+        return job
+
+    if await asyncio.to_thread(database.save_payout_jobs, [_row(job)]) is None:
+        ledger.release(reservation)
+        job.update(status="failed", msg="Payout could not be queued, try again.")
+        _jobs[job["job_id"]] = job
+        return job
+
+    _jobs[job["job_id"]] = job
+    _reservations[job["job_id"]] = reservation
+    await _queue.put(job)
+    return job
+
+
+async def _reserve(kind: str):
+    """Faucet ledger reservation for a payout -> (reservation, None) or (None, why not)."""
+    try:
+        reservation = await functions_testnet.faucet_ledger.reserve(functions_testnet.PAYOUT_COST[kind])
+    except Exception as e:
+        print(f"Faucet ledger error: {e}")
+        return None, "Faucet balance unavailable, try again later."
+    if reservation is None:
+        return None, functions_testnet.EMPTY_MSG[kind]
+    return reservation, None
+
+
+async def _resume(job: dict):
+    """Queue a job another instance left queued - reserved here like a new one, the claim decides who sends it."""
+    _start()
+    _jobs[job["job_id"]] = job
+    reservation, msg = await _reserve(job["kind"])
+    if reservation is None:
+        # failed only if it's still ours to fail - claimed elsewhere it's left to that instance
+        claimed = await asyncio.to_thread(database.claim_payout_jobs, [job["job_id"]])
+        if not claimed:
+            _jobs.pop(job["job_id"], None)
+            return
+        _finish(job, "failed", msg=msg)
+        await _save([job])
+        return
+    _reservations[job["job_id"]] = reservation
+    _queue.put_nowait(job)
+
+
+def _stale(job: dict) -> bool:
+    return job["status"] == "queued" and time.time() - job["updated_at"] > RESUME_AFTER
+
+
+async def get_job(job_id: str):
+    """Job of this instance, else the stored one (a stale queued job gets resumed here)."""
+    job = _jobs.get(job_id)
+    if job is not None:
+        return dict(job)
+    row = await asyncio.to_thread(database.get_payout_job, job_id)
+    if row is None:
+        return None
+    job = _job(row)
+    if _stale(job) and job["job_id"] not in _jobs:
+        await _resume(job)
+    return dict(job)
+
+
+async def load_pending():
+    """Pick up payouts left queued by instances that stopped before sending them."""
+    before = _timestamp(time.time() - RESUME_AFTER)
+    for row in await asyncio.to_thread(database.get_queued_payouts, before) or []:
+        if row["job_id"] not in _jobs:
+            await _resume(_job(row))
+
+
+async def _run():
+    while True:
+        job = await _queue.get()
+        batch = [job]
+        await asyncio.sleep(BATCH_WAIT)
+        while len(batch) < BATCH_SIZE and not _queue.empty():
+            batch.append(_queue.get_nowait())
+        try:
+            batch = await _claim(batch)
+            if batch:
+                await _process(batch)
+        except Exception as e:
+            print(f"Payout batch error: {e}")
+            failed = [job for job in batch if job["status"] in ("queued", "sending")]
+            for job in failed:
+                _finish(job, "failed", msg=str(e))
+            await _save(failed)
+
+
+def _finish(job: dict, status: str, tx_hash=None, msg=None):
+    _update(job, status=status, tx_hash=tx_hash, msg=msg)
+    reservation = _reservations.pop(job["job_id"], None)
+    if status == "sent":
+        functions_testnet.faucet_ledger.commit(reservation)
+        _watch(job)
+    else:
+        functions_testnet.faucet_ledger.release(reservation)
+    _publish(job)
+    _handle(job)
+
+
+def _handle(job: dict):
+    on_sent, on_failed = _handlers.get(job["kind"], (None, None))
+    callback = on_sent if job["status"] == "sent" else on_failed
+    if callback is not None:
+        # handlers write to the DB - they run in a worker thread, not on the event loop
+        task = asyncio.ensure_future(_call(callback, dict(job)))
+        _handling.add(task)
+        task.add_done_callback(_handling.discard)
+
+
+async def _call(callback, job: dict):
+    try:
+        await asyncio.to_thread(callback, job)
+    except Exception as e:
+        print(f"Payout callback error: {e}")
+
+
+def _drop(job: dict):
+    """Job was claimed by another instance - it sends it and keeps its status."""
+    functions_testnet.faucet_ledger.release(_reservations.pop(job["job_id"], None))
+    _jobs.pop(job["job_id"], None)
+
+
+async def _claim(batch: list) -> list:
+    """One claim for the whole batch -> the jobs to send here, the ones another instance took are left to it."""
+    claimed = await asyncio.to_thread(database.claim_payout_jobs, [job["job_id"] for job in batch])
+    if claimed is None:
+        raise RuntimeError("Payout jobs could not be claimed, try again.")
+    claimed = {row["job_id"] for row in claimed}
+    for job in batch:
+        if job["job_id"] not in claimed:
+            _drop(job)
+    return [job for job in batch if job["job_id"] in claimed]
+
+
+async def _process(batch: list):
+    # funds were reserved on enqueue, fees come from the shared oracle - one lookup per batch
+    fee = await fees.get_fees(functions_testnet.NETWORK)
+
+    for job in batch:
+        _update(job, status="sending")
+
+    async def send(job):
+        try:
+            if job["kind"] == "usdc":
+                tx_hash = await functions_testnet.send_usdc(job["wallet"], fee=fee)
+            else:
+                tx_hash = await functions_testnet.send_eth(job["wallet"], fee=fee)
+        except Exception as e:
+            _finish(job, "failed", msg=f"Transaction failed: {str(e)}")
+            return
+        _finish(job, "sent", tx_hash=tx_hash)
+
+    await asyncio.gather(*(send(job) for job in batch))
+    await _save(batch)
+
+
+def _watch(job: dict):
+    global _confirmer
+    _unconfirmed[job["tx_hash"]] = job
+    if _confirmer is None or _confirmer.done():
+        _confirmer = asyncio.create_task(_confirm())
+
+
+async def _confirm():
+    """Receipts of all sent payouts in one JSON-RPC batch per round."""
+    while _unconfirmed:
+        await asyncio.sleep(CONFIRM_INTERVAL)
+        try:
+            statuses = await chain.receipt_statuses(functions_testnet.NETWORK, list(_unconfirmed))
+        except Exception as e:
+            print(f"Payout confirm error: {e}")
+            continue
+        now = time.time()
+        done = []
+        for tx_hash, status in statuses.items():
+            job = _unconfirmed.get(tx_hash)
+            if job is None:
+                continue
+            if status is None:
+                if now - job["updated_at"] > CONFIRM_TIMEOUT:
+                    del _unconfirmed[tx_hash]
+                continue
+            del _unconfirmed[tx_hash]
+            if status == 1:
+                _update(job, status="confirmed")
+                _publish(job)
+            else:
+                # nothing reached the wallet - same as a payout that wasn't sent
+                functions_testnet.faucet_ledger.refund(functions_testnet.PAYOUT_COST[job["kind"]])
+                _update(job, status="failed", msg="Transaction reverted")
+                _publish(job)
+                _handle(job)
+            done.append(job)
+        await _save(done)
+
+
+async def stop():
+    global _worker, _confirmer
+    for task in (_worker, _confirmer):
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    _worker = None
+    _confirmer = None
@@ -0,0 +1,60 @@
+# USER_PROGRESS lesson flags packed into one integer column (flags).
+# Bit order must never change - new lessons are appended at the end.
+FIELDS = (
+    "faucet", "send", "receive", "mint", "launch",
+    "lab1", "lab2", "lab3", "lab4", "lab5",
+    "theory1", "theory2", "theory3", "theory4", "theory5",
+)
+
+BITS = {field: 1 << i for i, field in enumerate(FIELDS)}
+
+
+def mask(*fields) -> int:
+    result = 0
+    for field in fields:
+        result |= BITS[field]
+    return result
+
+
+# USER_INFO completion flag -> mask of its section
+SECTION_MASKS = {
+    "completed_practice": mask("faucet", "send", "receive", "mint", "launch"),
+    "completed_security": mask("lab1", "lab2", "lab3", "lab4", "lab5"),
+    "completed_theory": mask("theory1", "theory2", "theory3", "theory4", "theory5"),
+}
+
+
+class Progress:
+    __slots__ = ("flags",)
+
+    def __init__(self, flags: int = 0):
+        self.flags = flags or 0
+
+    @classmethod
+    def from_dict(cls, row: dict):
+        """Old row format (one boolean column per lesson)."""
+        flags = 0
+        for field, bit in BITS.items():
+            if row.get(field):
+                flags |= bit
+        return cls(flags)
+
+    def has(self, field: str) -> bool:
+        return bool(self.flags & BITS[field])
+
+    def set(self, field: str, value: bool = True):
+        if value:
+            self.flags |= BITS[field]
+        else:
+            self.flags &= ~BITS[field]
+
+    def is_complete(self, section: str) -> bool:
+        section_mask = SECTION_MASKS[section]
+        return self.flags & section_mask == section_mask
+
+    def to_dict(self) -> dict:
+        """{field: bool} - the shape the API / frontend work with."""
+        return {field: bool(self.flags & bit) for field, bit in BITS.items()}
+
+    def __repr__(self):
+        return f"Progress({self.flags:#x})"
@@ -0,0 +1,155 @@
+import os
+import time
+from datetime import datetime, timezone
+
+import database
+
+# Rate limiting for the faucet endpoints.
+# - token buckets per wallet and one global bucket per endpoint
+# - drip cooldowns cached in memory as epoch seconds (expiry), in front of a
+#   shared store (USER_INFO.last_drip by default), so spam still in cooldown
+#   is rejected without touching the DB or the RPC node
+DRIP_COOLDOWN = int(os.getenv("DRIP_COOLDOWN", str(48 * 3600)))
+NEGATIVE_TTL = int(os.getenv("COOLDOWN_NEGATIVE_TTL", "60"))  # "no cooldown" answers are trusted this long
+MAX_TRACKED = int(os.getenv("RATE_LIMIT_MAX_TRACKED", "100000"))
+
+# endpoint -> (wallet capacity, wallet refill per second, global capacity, global refill per second)
+LIMITS = {
+    "drip-eth": (3, 1 / 60, 50, 5.0),
+    "send-test": (5, 1 / 30, 100, 10.0),
+}
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, amount: float = 1) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < amount:
+            return False
+        self.tokens -= amount
+        return True
+
+
+_global_buckets = {}
+_wallet_buckets = {}
+
+
+def allow(endpoint: str, wallet: str) -> bool:
+    """Per-wallet + global token bucket of the endpoint."""
+    wallet_cap, wallet_rate, global_cap, global_rate = LIMITS[endpoint]
+
+    key = (endpoint, wallet.lower())
+    bucket = _wallet_buckets.get(key)
+    if bucket is None:
+        if len(_wallet_buckets) >= MAX_TRACKED:
+            _wallet_buckets.clear()
+        bucket = _wallet_buckets[key] = TokenBucket(wallet_cap, wallet_rate)
+    if not bucket.take():
+        return False
+
+    global_bucket = _global_buckets.get(endpoint)
+    if global_bucket is None:
+        global_bucket = _global_buckets[endpoint] = TokenBucket(global_cap, global_rate)
+    return global_bucket.take()
+
+
+def parse_timestamp(value):
+    """last_drip from the DB (str / date / datetime) -> epoch seconds, None if empty"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace(" ", "T"))
+    elif not isinstance(value, datetime):
+        # plain date
+        value = datetime.combine(value, datetime.min.time())
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+class CooldownStore:
+    """Shared cooldown storage - get/set expiry (epoch seconds) per wallet."""
+
+    def get(self, wallet: str):
+        raise NotImplementedError
+
+    def set(self, wallet: str, until: int):
+        raise NotImplementedError
+
+    def clear(self, wallet: str):
+        raise NotImplementedError
+
+
+class LastDripStore(CooldownStore):
+    """USER_INFO.last_drip - the store every instance already shares."""
+
+    def get(self, wallet: str):
+        last_drip = parse_timestamp(database.get_field("USER_INFO", "last_drip", wallet))
+        return last_drip + DRIP_COOLDOWN if last_drip is not None else 0
+
+    def set(self, wallet: str, until: int):
+        last_drip = datetime.fromtimestamp(until - DRIP_COOLDOWN, timezone.utc)
+        database.update_field("USER_INFO", "last_drip", wallet, last_drip.isoformat(timespec="milliseconds"))
+
+    def clear(self, wallet: str):
+        database.update_field("USER_INFO", "last_drip", wallet, None)
+
+
+class Cooldowns:
+    def __init__(self, store: CooldownStore = None):
+        self.store = store
+        self._until = {}  # wallet -> expiry epoch
+        self._checked = {}  # wallet -> when the store last said "no cooldown"
+
+    def remaining(self, wallet: str) -> int:
+        """Seconds of cooldown left, 0 if the wallet may drip."""
+        key = wallet.lower()
+        now = int(time.time())
+        until = self._until.get(key)
+        if until is not None and until > now:
+            return until - now
+
+        if self.store is None or now - self._checked.get(key, 0) < NEGATIVE_TTL:
+            return 0
+
+        until = self.store.get(wallet) or 0
+        if until > now:
+            self._remember(key, until)
+            return until - now
+        if len(self._checked) >= MAX_TRACKED:
+            self._checked = {k: at for k, at in self._checked.items() if now - at < NEGATIVE_TTL}
+        self._checked[key] = now
+        return 0
+
+    def _remember(self, key: str, until: int):
+        if len(self._until) >= MAX_TRACKED:
+            now = int(time.time())
+            self._until = {k: v for k, v in self._until.items() if v > now}
+        self._until[key] = until
+        self._checked.pop(key, None)
+
+    def start(self, wallet: str, persist: bool = True) -> int:
+        """Cooldown starts now (memory right away, shared store if persist)."""
+        until = int(time.time()) + DRIP_COOLDOWN
+        self._remember(wallet.lower(), until)
+        if persist and self.store is not None:
+            self.store.set(wallet, until)
+        return until
+
+    def clear(self, wallet: str, persist: bool = False):
+        """Cooldown is gone (memory, shared store too if persist)."""
+        self._until.pop(wallet.lower(), None)
+        if persist and self.store is not None:
+            self.store.clear(wallet)
+
+
+drip_cooldowns = Cooldowns(LastDripStore())
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import aiohttp
+import metrics
+
+# Multi-provider JSON-RPC pool, one per network (endpoint list in chain.NETWORKS).
+# - every provider keeps its recent latencies and consecutive errors
+# - circuit breaker: BREAKER_ERRORS errors in a row take a provider out for
+#   BREAKER_COOLDOWN seconds, after that one request tries it again
+# - idempotent reads are hedged: if the fastest provider hasn't answered within
+#   its p95 latency, the same request goes to the next one too, first answer wins
+# - writes (eth_sendRawTransaction, ...) go to one provider only and move on to
+#   the next one only if the request never got out (connection refused)
+BREAKER_ERRORS = int(os.getenv("RPC_BREAKER_ERRORS", "3"))
+BREAKER_COOLDOWN = float(os.getenv("RPC_BREAKER_COOLDOWN", "30"))
+HEDGE = os.getenv("RPC_HEDGE", "true").lower() in ("1", "true", "yes")
+HEDGE_MIN_DELAY = float(os.getenv("RPC_HEDGE_MIN_DELAY", "0.05"))
+HEDGE_MAX_DELAY = float(os.getenv("RPC_HEDGE_MAX_DELAY", "2"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("RPC_HEDGE_DEFAULT_DELAY", "0.5"))  # until there are enough samples
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+READ_METHODS = {
+    "eth_blockNumber", "eth_chainId", "eth_call", "eth_estimateGas", "eth_feeHistory",
+    "eth_gasPrice", "eth_getBalance", "eth_getBlockByNumber", "eth_getBlockByHash",
+    "eth_getCode", "eth_getLogs", "eth_getTransactionByHash", "eth_getTransactionCount",
+    "eth_getTransactionReceipt", "eth_maxPriorityFeePerGas", "net_version",
+}
+
+# JSON-RPC errors that are the provider's fault, not the request's
+PROVIDER_ERROR_CODES = {-32005, -32016, 429}
+
+
+class ProviderError(Exception):
+    pass
+
+
+class Provider:
+    def __init__(self, url: str):
+        self.url = url
+        self.name = urlparse(url).netloc or url  # no paths in labels - they often carry API keys
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.errors = 0  # consecutive
+        self.open_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def _percentile(self, p: float):
+        if not self.latencies:
+            return None
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(len(values) * p))]
+
+    def score(self) -> float:
+        """Median latency, providers without data are tried early."""
+        median = self._percentile(0.5)
+        return median if median is not None else 0.0
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, self._percentile(0.95)))
+
+    def success(self, seconds: float):
+        self.latencies.append(seconds)
+        self.errors = 0
+        self.open_until = 0.0
+
+    def failure(self):
+        self.failures += 1
+        self.errors += 1
+        if self.errors >= BREAKER_ERRORS:
+            self.open_until = time.monotonic() + BREAKER_COOLDOWN
+
+    def stats(self) -> dict:
+        p50, p95 = self._percentile(0.5), self._percentile(0.95)
+        return {
+            "provider": self.name,
+            "available": self.available(),
+            "requests": self.requests,
+            "failures": self.failures,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class Pool:
+    def __init__(self, network: str, urls: list, get_session):
+        self.network = network
+        self.providers = [Provider(url) for url in urls]
+        self.get_session = get_session
+
+    def ordered(self) -> list:
+        """Available providers, fastest first; if the breaker is open everywhere, all of them."""
+        available = [p for p in self.providers if p.available()]
+        if not available:
+            return sorted(self.providers, key=lambda p: p.open_until)
+        return sorted(available, key=lambda p: p.score())
+
+    async def _post(self, provider: Provider, payload):
+        session = await self.get_session()
+        provider.requests += 1
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            async with session.post(provider.url, json=payload) as response:
+                if response.status == 429 or response.status >= 500:
+                    raise ProviderError(f"{provider.name}: HTTP {response.status}")
+                response.raise_for_status()
+                body = await response.json(content_type=None)
+            if isinstance(payload, list) and not isinstance(body, list):
+                # whole batch rejected (rate limit, batch not supported, ...)
+                raise ProviderError(f"{provider.name}: JSON-RPC batch failed: {body}")
+            if isinstance(body, dict) and (body.get("error") or {}).get("code") in PROVIDER_ERROR_CODES:
+                raise ProviderError(f"{provider.name}: {body['error']}")
+        except asyncio.CancelledError:
+            # lost a hedge race - says nothing about the provider
+            outcome = "cancelled"
+            raise
+        except Exception:
+            provider.failure()
+            raise
+        else:
+            outcome = "ok"
+            provider.success(time.perf_counter() - start)
+            return body
+        finally:
+            metrics.observe("rpc_provider_duration_seconds", time.perf_counter() - start,
+                            network=self.network, provider=provider.name, outcome=outcome)
+
+    async def request(self, payload, read: bool):
+        """JSON-RPC payload (one call or a batch) -> response body."""
+        providers = self.ordered()
+        if not read:
+            return await self._write(providers, payload)
+        if not HEDGE or len(providers) == 1:
+            return await self._failover(providers, payload)
+        return await self._hedged(providers, payload)
+
+    async def _write(self, providers: list, payload):
+        last_error = None
+        for provider in providers:
+            try:
+                return await self._post(provider, payload)
+            except aiohttp.ClientConnectorError as e:
+                # never reached the node - safe to try the next one
+                last_error = e
+        raise last_error
+
+    async def _failover(self, providers: list, payload):
+        last_error = None
+        for provider in providers:
+            try:
+                return await self._post(provider, payload)
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    async def _hedged(self, providers: list, payload):
+        primary, rest = providers[0], providers[1:]
+        tasks = {asyncio.create_task(self._post(primary, payload))}
+        last_error = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=primary.hedge_delay())
+            while True:
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                # primary is slow or failed -> next provider joins
+                if rest:
+                    if not done:
+                        metrics.inc("rpc_hedged_requests_total", network=self.network)
+                    tasks.add(asyncio.create_task(self._post(rest.pop(0), payload)))
+                if not tasks:
+                    raise last_error
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> list:
+        return [provider.stats() for provider in self.providers]
@@ -0,0 +1,157 @@
+import os
+import re
+from typing import Annotated, Any, Literal, Optional, Union
+
+from pydantic import AfterValidator, BaseModel, BeforeValidator, ConfigDict, Field, PositiveFloat, PositiveInt, model_validator
+
+# Request / response models of the API (main.py). Bodies are parsed and validated
+# in one pass (pydantic-core) before a handler runs, so a malformed request never
+# gets to the DB or RPC. Validation errors come back as 400 + detail, like the
+# HTTPExceptions of the handlers.
+MAX_VERIFY_BATCH = int(os.getenv("MAX_VERIFY_BATCH", "200"))
+MAX_PATCH_UPDATES = int(os.getenv("MAX_PATCH_UPDATES", "50"))
+
+_ADDRESS = re.compile(r"0x[0-9a-fA-F]{40}")
+_TX_HASH = re.compile(r"0x[0-9a-fA-F]{64}")
+
+
+def _address(value: str) -> str:
+    # same rule validateAddress had (0x + 40 hex chars), without the checksum round trip
+    if not _ADDRESS.fullmatch(value):
+        raise ValueError("Invalid address format")
+    return value
+
+
+def _tx_hash(value: str) -> str:
+    if not _TX_HASH.fullmatch(value):
+        raise ValueError("Invalid transaction hash format")
+    return value
+
+
+def _upper(value):
+    return value.upper() if isinstance(value, str) else value
+
+
+Address = Annotated[str, AfterValidator(_address)]
+TxHash = Annotated[str, AfterValidator(_tx_hash)]
+Token = Annotated[Literal["ETH", "USDC"], BeforeValidator(_upper)]
+# USDC in base units ("1000000" is accepted too); ETH amounts aren't checked on chain yet,
+# so decimal ETH values ("0.001") pass like they did before the schemas
+Amount = Union[PositiveInt, PositiveFloat]
+FieldValue = Union[bool, int, float, str]
+
+
+class ApiRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+
+# REQUESTS
+class WalletRequest(ApiRequest):
+    wallet: Address
+
+
+class MainnetVerifyRequest(ApiRequest):
+    address_from: Address
+    tx_hash: TxHash
+    amount: Amount
+    token: Token = "ETH"
+
+    @model_validator(mode="after")
+    def _usdc_base_units(self):
+        if self.token == "USDC":
+            if isinstance(self.amount, float) and not self.amount.is_integer():
+                raise ValueError("USDC amount must be in base units (integer)")
+            self.amount = int(self.amount)
+        return self
+
+
+class TestnetVerifyRequest(MainnetVerifyRequest):
+    address_to: Address
+
+
+class MainnetVerifyBatchRequest(ApiRequest):
+    items: list[MainnetVerifyRequest] = Field(min_length=1, max_length=MAX_VERIFY_BATCH)
+
+
+class TestnetVerifyBatchRequest(ApiRequest):
+    items: list[TestnetVerifyRequest] = Field(min_length=1, max_length=MAX_VERIFY_BATCH)
+
+
+class PayoutStatusRequest(ApiRequest):
+    job_id: str = Field(min_length=1)
+
+
+class FieldRequest(WalletRequest):
+    table_name: str = Field(min_length=1)
+    field_name: str = Field(min_length=1)
+
+
+class UpdateFieldRequest(FieldRequest):
+    value: FieldValue
+
+
+class FieldUpdate(ApiRequest):
+    table_name: str
+    field_name: str
+    value: FieldValue
+
+
+class PatchRequest(WalletRequest):
+    updates: list[FieldUpdate] = Field(min_length=1, max_length=MAX_PATCH_UPDATES)
+
+
+class DonationRequest(ApiRequest):
+    amount: Union[PositiveInt, PositiveFloat]
+
+
+class BuyNftRequest(WalletRequest):
+    tx_hash: Optional[TxHash] = None
+
+
+# RESPONSES
+class ApiResponse(BaseModel):
+    success: bool
+
+
+class VerifyResponse(ApiResponse):
+    # verify result fields differ by token / network
+    model_config = ConfigDict(extra="allow")
+
+
+class VerifyBatchResponse(ApiResponse):
+    results: list[dict[str, Any]]
+
+
+class PayoutResponse(ApiResponse):
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+    msg: Optional[str] = None
+
+
+class PayoutStatusResponse(ApiResponse):
+    job_id: str
+    status: str
+    tx_hash: Optional[str] = None
+    msg: Optional[str] = None
+
+
+class InitUserResponse(ApiResponse):
+    created: bool
+
+
+class UserResponse(ApiResponse):
+    info: dict[str, Any]
+    progress: dict[str, Any]
+
+
+class FieldResponse(ApiResponse):
+    value: Any
+
+
+class PatchResponse(ApiResponse):
+    completed: dict[str, bool]
+
+
+class MintResponse(ApiResponse):
+    status: str
+    mint_tx: Optional[str] = None
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import time
+
+import metrics
+
+# Single-flight: concurrent identical calls (same operation + arguments) share
+# one underlying run instead of each doing its own DB / RPC round trips.
+# Optionally (ttl > 0) the result is also kept for a few seconds, so a retry
+# storm right after the call finished doesn't start it again.
+MAX_RESULTS = int(os.getenv("SINGLEFLIGHT_MAX_RESULTS", "10000"))
+
+
+def _consume(task):
+    # the exception is re-raised to every waiter; this only keeps asyncio quiet
+    # when all of them went away (client disconnects)
+    if not task.cancelled():
+        task.exception()
+
+
+class Group:
+    def __init__(self, name: str, ttl: float = 0.0):
+        self.name = name
+        self.ttl = ttl
+        self._calls = {}  # key -> running task
+        self._results = {}  # key -> (expires, result), only with ttl
+
+    async def do(self, key, fn, *args, **kwargs):
+        """await fn(*args, **kwargs), shared with every concurrent do() of the same key."""
+        if self.ttl:
+            hit = self._results.get(key)
+            if hit is not None:
+                if hit[0] > time.monotonic():
+                    metrics.inc("singleflight_calls_total", group=self.name, outcome="cached")
+                    return hit[1]
+                del self._results[key]
+
+        task = self._calls.get(key)
+        if task is None:
+            metrics.inc("singleflight_calls_total", group=self.name, outcome="run")
+            task = asyncio.ensure_future(self._run(key, fn, args, kwargs))
+            task.add_done_callback(_consume)
+            self._calls[key] = task
+        else:
+            metrics.inc("singleflight_calls_total", group=self.name, outcome="shared")
+        # a caller that gets cancelled must not cancel the run for the others
+        return await asyncio.shield(task)
+
+    async def _run(self, key, fn, args, kwargs):
+        try:
+            result = await fn(*args, **kwargs)
+        finally:
+            self._calls.pop(key, None)
+        if self.ttl:
+            if len(self._results) >= MAX_RESULTS:
+                now = time.monotonic()
+                self._results = {k: v for k, v in self._results.items() if v[0] > now}
+                if len(self._results) >= MAX_RESULTS:
+                    self._results.clear()
+            self._results[key] = (time.monotonic() + self.ttl, result)
+        return result
+
+    def forget(self, key):
+        """Drop a kept result (the data behind it just changed)."""
+        self._results.pop(key, None)
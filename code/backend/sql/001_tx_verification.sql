@@ -0,0 +1,10 @@
+-- Persistent tier of the verification cache (verify_cache.py)
+create table if not exists "TX_VERIFICATION" (
+    key text primary key,
+    network text not null,
+    tx_hash text not null,
+    result jsonb not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists tx_verification_tx_hash_idx on "TX_VERIFICATION" (tx_hash);
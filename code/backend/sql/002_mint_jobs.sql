@@ -0,0 +1,12 @@
+-- NFT mints submitted by /api/buy-nft, confirmed by the tracker in mints.py
+create table if not exists "MINT_JOBS" (
+    id bigint generated always as identity primary key,
+    wallet text not null,
+    tx_hash text not null unique,
+    status text not null default 'pending',  -- pending / confirmed / failed
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists mint_jobs_wallet_idx on "MINT_JOBS" (wallet);
+create index if not exists mint_jobs_pending_idx on "MINT_JOBS" (status) where status = 'pending';
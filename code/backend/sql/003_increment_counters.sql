@@ -0,0 +1,38 @@
+-- Atomic counter changes (database.increment_counters)
+-- changes = [{"table": "USER_INFO", "wallet": "0x..", "deltas": {"practice_received": 1}}, ...]
+-- All changes run in one statement/transaction, returns the updated rows.
+create or replace function increment_counters(changes jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    change jsonb;
+    field text;
+    sets text;
+    updated jsonb;
+    result jsonb := '[]'::jsonb;
+begin
+    for change in select * from jsonb_array_elements(changes) loop
+        if change->>'table' not in ('USER_INFO', 'MY_WALLET') then
+            raise exception 'table % not allowed', change->>'table';
+        end if;
+
+        sets := '';
+        for field in select * from jsonb_object_keys(change->'deltas') loop
+            sets := sets || case when sets = '' then '' else ', ' end
+                || format('%I = %I + %L::numeric', field, field, change->'deltas'->>field);
+        end loop;
+
+        execute format(
+            'update %I set %s where wallet = $1 returning to_jsonb(%I.*)',
+            change->>'table', sets, change->>'table'
+        ) into updated using change->>'wallet';
+
+        if updated is null then
+            raise exception 'no % row for wallet %', change->>'table', change->>'wallet';
+        end if;
+        result := result || jsonb_build_array(updated);
+    end loop;
+    return result;
+end;
+$$;
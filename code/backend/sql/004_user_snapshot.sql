@@ -0,0 +1,8 @@
+-- USER_INFO + USER_PROGRESS of one wallet in a single query (database.get_user)
+create or replace view "USER_SNAPSHOT" as
+select
+    i.wallet,
+    to_jsonb(i.*) as info,
+    to_jsonb(p.*) as progress
+from "USER_INFO" i
+join "USER_PROGRESS" p on p.wallet = i.wallet;
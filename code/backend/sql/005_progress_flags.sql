@@ -0,0 +1,46 @@
+-- USER_PROGRESS: 15 boolean lesson columns -> one integer bitset (progress.py, bit i = progress.FIELDS[i])
+alter table "USER_PROGRESS" add column if not exists flags integer not null default 0;
+
+update "USER_PROGRESS" set flags =
+      (faucet::int   << 0)
+    | (send::int     << 1)
+    | (receive::int  << 2)
+    | (mint::int     << 3)
+    | (launch::int   << 4)
+    | (lab1::int     << 5)
+    | (lab2::int     << 6)
+    | (lab3::int     << 7)
+    | (lab4::int     << 8)
+    | (lab5::int     << 9)
+    | (theory1::int  << 10)
+    | (theory2::int  << 11)
+    | (theory3::int  << 12)
+    | (theory4::int  << 13)
+    | (theory5::int  << 14);
+
+-- the snapshot view references the whole row, recreate it around the column drop
+drop view if exists "USER_SNAPSHOT";
+
+alter table "USER_PROGRESS"
+    drop column faucet, drop column send, drop column receive, drop column mint, drop column launch,
+    drop column lab1, drop column lab2, drop column lab3, drop column lab4, drop column lab5,
+    drop column theory1, drop column theory2, drop column theory3, drop column theory4, drop column theory5;
+
+create or replace view "USER_SNAPSHOT" as
+select
+    i.wallet,
+    to_jsonb(i.*) as info,
+    to_jsonb(p.*) as progress
+from "USER_INFO" i
+join "USER_PROGRESS" p on p.wallet = i.wallet;
+
+-- atomic bit set / clear (database.update_field on USER_PROGRESS)
+create or replace function set_progress_flags(p_wallet text, p_set integer, p_clear integer)
+returns setof "USER_PROGRESS"
+language sql
+as $$
+    update "USER_PROGRESS"
+    set flags = (flags | p_set) & ~p_clear
+    where wallet = p_wallet
+    returning *;
+$$;
@@ -0,0 +1,12 @@
+-- Idempotency-Key records of the payout / mint endpoints (idempotency.py)
+create table if not exists "IDEMPOTENCY_KEYS" (
+    key text primary key,               -- endpoint|client key
+    request_hash text not null,         -- sha256 of the request body, a reused key with another body is rejected
+    status text not null default 'in_progress',  -- in_progress / done
+    status_code integer,
+    response jsonb,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists idempotency_keys_created_idx on "IDEMPOTENCY_KEYS" (created_at);
@@ -0,0 +1,42 @@
+-- per-wallet version for ETags (versions.py): every update of the wallet's
+-- USER_INFO or USER_PROGRESS row bumps USER_INFO.version
+alter table "USER_INFO" add column if not exists version bigint not null default 0;
+
+create or replace function bump_user_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.version = old.version then
+        new.version := old.version + 1;
+    end if;
+    return new;
+end;
+$$;
+
+create or replace trigger user_info_version
+before update on "USER_INFO"
+for each row execute function bump_user_version();
+
+create or replace function bump_user_version_from_progress()
+returns trigger
+language plpgsql
+as $$
+begin
+    update "USER_INFO" set version = version + 1 where wallet = new.wallet;
+    return null;
+end;
+$$;
+
+create or replace trigger user_progress_version
+after update on "USER_PROGRESS"
+for each row execute function bump_user_version_from_progress();
+
+-- the snapshot view picks up the new column
+create or replace view "USER_SNAPSHOT" as
+select
+    i.wallet,
+    to_jsonb(i.*) as info,
+    to_jsonb(p.*) as progress
+from "USER_INFO" i
+join "USER_PROGRESS" p on p.wallet = i.wallet;
@@ -0,0 +1,13 @@
+-- one active mint per wallet (mints.submit): the job row is reserved before the
+-- airdrop tx is sent and gets its tx_hash afterwards
+alter table "MINT_JOBS" alter column tx_hash drop not null;
+
+-- wallets that got more than one airdrop before this - the first active job stays
+update "MINT_JOBS" set status = 'duplicate'
+where status in ('pending', 'confirmed')
+  and id not in (
+      select min(id) from "MINT_JOBS" where status in ('pending', 'confirmed') group by wallet
+  );
+
+create unique index if not exists mint_jobs_active_wallet_idx
+    on "MINT_JOBS" (wallet) where status in ('pending', 'confirmed');
@@ -0,0 +1,12 @@
+-- send-test eligibility check + reservation in one statement (database.reserve_practice_payout):
+-- practice_received is bumped only while it's below practice_sent, so concurrent
+-- requests can't both pass the check. Returns the updated row, null if not eligible.
+create or replace function reserve_practice_payout(p_wallet text)
+returns jsonb
+language sql
+as $$
+    update "USER_INFO"
+    set practice_received = practice_received + 1
+    where wallet = p_wallet and practice_received < practice_sent
+    returning to_jsonb("USER_INFO".*);
+$$;
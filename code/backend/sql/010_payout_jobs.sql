@@ -0,0 +1,15 @@
+-- faucet payouts of send-test / drip-eth (payouts.py). Any instance can read a
+-- job's status, the worker claims queued jobs (queued -> sending) before it sends,
+-- so a job resumed by another instance is never sent twice.
+create table if not exists "PAYOUT_JOBS" (
+    job_id text primary key,
+    kind text not null,                     -- usdc / eth
+    wallet text not null,
+    status text not null default 'queued',  -- queued / sending / sent / confirmed / failed
+    tx_hash text,
+    msg text,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists payout_jobs_queued_idx on "PAYOUT_JOBS" (updated_at) where status = 'queued';
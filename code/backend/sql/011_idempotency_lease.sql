@@ -0,0 +1,4 @@
+-- in_progress idempotency keys hold a short lease (idempotency.py renews it while the
+-- request runs); a retry takes over a key whose request died instead of getting
+-- 409 until the key expires
+alter table "IDEMPOTENCY_KEYS" add column if not exists locked_until timestamptz not null default now();
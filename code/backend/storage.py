@@ -0,0 +1,780 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import coldstart
+from progress import Progress
+
+# Storage backends behind database.py.
+# STORAGE_BACKEND=supabase (default) - hosted Postgres via the Supabase client
+# STORAGE_BACKEND=sqlite            - local SQLite file in WAL mode (SQLITE_PATH),
+#                                     for benchmarks / load tests / small deployments
+
+USER_INFO_DEFAULTS = {
+    "practice_sent": 0,
+    "practice_received": 0,
+    "completed_theory": False,
+    "completed_practice": False,
+    "completed_security": False,
+    "completed_all": False,
+    "claimed_nft": False,
+    "last_drip": None,
+}
+
+
+def timestamp(seconds: float = 0) -> str:
+    """UTC now (+ seconds) in the same text form as the SQLite column defaults - timestamps compare as text there."""
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat(timespec="milliseconds")
+
+
+class Storage:
+    """Interface - every method raises on backend errors, database.py decides what to do with them."""
+
+    def add_user(self, wallet: str):
+        """-> (info_rows, progress_rows)"""
+        raise NotImplementedError
+
+    def get_user_info(self, wallet: str):
+        raise NotImplementedError
+
+    def get_user_progress(self, wallet: str):
+        raise NotImplementedError
+
+    def get_user(self, wallet: str):
+        """-> (info, progress) or None if the wallet is unknown. Backends override this with one query."""
+        info = self.get_user_info(wallet)
+        progress = self.get_user_progress(wallet)
+        if info is None or progress is None:
+            return None
+        return info, progress
+
+    def get_user_version(self, wallet: str):
+        """-> (id, version) of the wallet's USER_INFO row, None if the wallet is unknown"""
+        raise NotImplementedError
+
+    def get_field(self, table_name: str, field_name: str, wallet: str):
+        raise NotImplementedError
+
+    def update_field(self, table_name: str, field_name: str, wallet: str, value):
+        """-> list of updated rows"""
+        raise NotImplementedError
+
+    def update_fields(self, table_name: str, wallet: str, fields: dict):
+        """Several columns of one row in one write -> list of updated rows"""
+        raise NotImplementedError
+
+    def set_progress_flags(self, wallet: str, set_mask: int, clear_mask: int = 0):
+        """USER_PROGRESS.flags = (flags | set_mask) & ~clear_mask, atomically -> list of updated rows"""
+        raise NotImplementedError
+
+    def delete_user(self, wallet: str):
+        """-> {"progress_deleted": [...], "info_deleted": [...]}"""
+        raise NotImplementedError
+
+    def increment_counters(self, changes: list):
+        """
+        changes = [(table_name, wallet, {field: delta, ...}), ...]
+        Applied atomically (one statement per row, one round trip), -> list of updated rows.
+        """
+        raise NotImplementedError
+
+    def reserve_practice_payout(self, wallet: str):
+        """practice_received += 1 only if it stays <= practice_sent, atomically -> list of updated rows ([] = not eligible)"""
+        raise NotImplementedError
+
+    def get_my_donations(self):
+        """-> (real_count, real_amount)"""
+        raise NotImplementedError
+
+    def get_verification(self, key: str):
+        raise NotImplementedError
+
+    def save_verification(self, key: str, network: str, tx_hash: str, result: dict):
+        raise NotImplementedError
+
+    def reserve_mint_job(self, wallet: str):
+        """Insert a pending job without tx_hash -> the row, None if the wallet already has an active job."""
+        raise NotImplementedError
+
+    def set_mint_job(self, job_id: int, status: str, tx_hash: str = None):
+        raise NotImplementedError
+
+    def update_mint_job(self, tx_hash: str, status: str):
+        raise NotImplementedError
+
+    def get_mint_job(self, wallet: str):
+        raise NotImplementedError
+
+    def get_pending_mints(self):
+        raise NotImplementedError
+
+    def save_payout_jobs(self, jobs: list):
+        """Insert / overwrite payout job rows (job_id, kind, wallet, status, tx_hash, msg, created_at, updated_at)"""
+        raise NotImplementedError
+
+    def claim_payout_jobs(self, job_ids: list):
+        """queued -> sending for the given jobs, atomically -> list of claimed rows (others were claimed elsewhere)"""
+        raise NotImplementedError
+
+    def get_payout_job(self, job_id: str):
+        raise NotImplementedError
+
+    def get_queued_payouts(self, before: str):
+        """Jobs still queued, last updated before the given timestamp"""
+        raise NotImplementedError
+
+    def claim_idempotency_key(self, key: str, request_hash: str, lease: float):
+        """
+        Insert an in_progress record locked for lease seconds -> (True, row) if it's new,
+        or if an in_progress record of the same request had its lease run out (taken over);
+        (False, existing row) otherwise.
+        """
+        raise NotImplementedError
+
+    def extend_idempotency_key(self, key: str, lease: float):
+        """in_progress record stays locked for another lease seconds"""
+        raise NotImplementedError
+
+    def finish_idempotency_key(self, key: str, status_code: int, response):
+        raise NotImplementedError
+
+    def release_idempotency_key(self, key: str):
+        raise NotImplementedError
+
+
+class SupabaseStorage(Storage):
+    def __init__(self, url: str, key: str):
+        from supabase import create_client
+        self.client = create_client(url, key)
+
+    def add_user(self, wallet: str):
+        info = self.client.table("USER_INFO").insert({"wallet": wallet, **USER_INFO_DEFAULTS}).execute()
+        progress = self.client.table("USER_PROGRESS").insert({"wallet": wallet, "flags": 0}).execute()
+        return info.data, progress.data
+
+    def _single(self, table_name: str, columns: str, wallet: str):
+        response = (
+            self.client.table(table_name).select(columns).eq("wallet", wallet)
+            .maybe_single()  # returns Dict / None
+            .execute()
+        )
+        return response.data if response is not None else None
+
+    def get_user_info(self, wallet: str):
+        return self._single("USER_INFO", "*", wallet)
+
+    def get_user_progress(self, wallet: str):
+        return self._single("USER_PROGRESS", "*", wallet)
+
+    def get_user(self, wallet: str):
+        # view from sql/004_user_snapshot.sql - both rows in one query
+        row = self._single("USER_SNAPSHOT", "info,progress", wallet)
+        if row is None:
+            return None
+        return row["info"], row["progress"]
+
+    def get_user_version(self, wallet: str):
+        # USER_INFO.version is bumped by triggers (sql/007_user_version.sql)
+        row = self._single("USER_INFO", "id,version", wallet)
+        if row is None:
+            return None
+        return row["id"], row["version"]
+
+    def get_field(self, table_name: str, field_name: str, wallet: str):
+        row = self._single(table_name, field_name, wallet)
+        if row is None:
+            return None
+        return row[field_name]
+
+    def update_field(self, table_name: str, field_name: str, wallet: str, value):
+        return self.update_fields(table_name, wallet, {field_name: value})
+
+    def update_fields(self, table_name: str, wallet: str, fields: dict):
+        response = self.client.table(table_name).update(fields).eq("wallet", wallet).execute()
+        return response.data
+
+    def set_progress_flags(self, wallet: str, set_mask: int, clear_mask: int = 0):
+        # Postgres function from sql/005_progress_flags.sql
+        params = {"p_wallet": wallet, "p_set": set_mask, "p_clear": clear_mask}
+        return self.client.rpc("set_progress_flags", params).execute().data
+
+    def delete_user(self, wallet: str):
+        prog_resp = self.client.table("USER_PROGRESS").delete().eq("wallet", wallet).execute()
+        info_resp = self.client.table("USER_INFO").delete().eq("wallet", wallet).execute()
+        return {"progress_deleted": prog_resp.data, "info_deleted": info_resp.data}
+
+    def increment_counters(self, changes: list):
+        payload = [{"table": table_name, "wallet": wallet, "deltas": deltas}
+                   for table_name, wallet, deltas in changes]
+        # Postgres function from sql/003_increment_counters.sql
+        return self.client.rpc("increment_counters", {"changes": payload}).execute().data
+
+    def reserve_practice_payout(self, wallet: str):
+        # Postgres function from sql/009_reserve_practice_payout.sql
+        row = self.client.rpc("reserve_practice_payout", {"p_wallet": wallet}).execute().data
+        return [row] if row else []
+
+    def get_my_donations(self):
+        response = self.client.table("MY_WALLET").select("*").execute()
+        return response.data[0]["real_count"], response.data[0]["real_amount"]
+
+    def get_verification(self, key: str):
+        response = self.client.table("TX_VERIFICATION").select("result").eq("key", key).maybe_single().execute()
+        row = response.data if response is not None else None
+        return row["result"] if row is not None else None
+
+    def save_verification(self, key: str, network: str, tx_hash: str, result: dict):
+        row = {"key": key, "network": network, "tx_hash": tx_hash.lower(), "result": result}
+        return self.client.table("TX_VERIFICATION").upsert(row).execute().data
+
+    def reserve_mint_job(self, wallet: str):
+        from postgrest.exceptions import APIError
+
+        # unique index mint_jobs_active_wallet_idx (sql/008_mint_reservation.sql) decides
+        try:
+            rows = self.client.table("MINT_JOBS").insert({"wallet": wallet, "status": "pending"}).execute().data
+        except APIError as e:
+            if e.code == "23505":  # unique_violation
+                return None
+            raise
+        return rows[0]
+
+    def set_mint_job(self, job_id: int, status: str, tx_hash: str = None):
+        fields = {"status": status, "updated_at": timestamp()}
+        if tx_hash is not None:
+            fields["tx_hash"] = tx_hash
+        return self.client.table("MINT_JOBS").update(fields).eq("id", job_id).execute().data
+
+    def update_mint_job(self, tx_hash: str, status: str):
+        fields = {"status": status, "updated_at": timestamp()}
+        return self.client.table("MINT_JOBS").update(fields).eq("tx_hash", tx_hash).execute().data
+
+    def get_mint_job(self, wallet: str):
+        response = (
+            self.client.table("MINT_JOBS").select("*").eq("wallet", wallet)
+            .order("created_at", desc=True).limit(1).execute()
+        )
+        return response.data[0] if response.data else None
+
+    def get_pending_mints(self):
+        return self.client.table("MINT_JOBS").select("*").eq("status", "pending").execute().data
+
+    def save_payout_jobs(self, jobs: list):
+        return self.client.table("PAYOUT_JOBS").upsert(jobs).execute().data
+
+    def claim_payout_jobs(self, job_ids: list):
+        fields = {"status": "sending", "updated_at": timestamp()}
+        return (
+            self.client.table("PAYOUT_JOBS").update(fields)
+            .in_("job_id", job_ids).eq("status", "queued").execute().data
+        )
+
+    def get_payout_job(self, job_id: str):
+        response = self.client.table("PAYOUT_JOBS").select("*").eq("job_id", job_id).maybe_single().execute()
+        return response.data if response is not None else None
+
+    def get_queued_payouts(self, before: str):
+        return (
+            self.client.table("PAYOUT_JOBS").select("*")
+            .eq("status", "queued").lt("updated_at", before).execute().data
+        )
+
+    def claim_idempotency_key(self, key: str, request_hash: str, lease: float):
+        now = timestamp()
+        locked_until = timestamp(lease)
+        # insert ... on conflict do nothing - only a new row comes back
+        row = {"key": key, "request_hash": request_hash, "status": "in_progress", "locked_until": locked_until}
+        inserted = (
+            self.client.table("IDEMPOTENCY_KEYS")
+            .upsert(row, on_conflict="key", ignore_duplicates=True).execute().data
+        )
+        if inserted:
+            return True, inserted[0]
+        # the request holding the key died - its lease ran out, this one takes over
+        taken = (
+            self.client.table("IDEMPOTENCY_KEYS").update({"locked_until": locked_until, "updated_at": now})
+            .eq("key", key).eq("request_hash", request_hash).eq("status", "in_progress")
+            .lt("locked_until", now).execute().data
+        )
+        if taken:
+            return True, taken[0]
+        existing = self.client.table("IDEMPOTENCY_KEYS").select("*").eq("key", key).maybe_single().execute()
+        return False, existing.data if existing is not None else None
+
+    def extend_idempotency_key(self, key: str, lease: float):
+        fields = {"locked_until": timestamp(lease)}
+        return self.client.table("IDEMPOTENCY_KEYS").update(fields).eq("key", key).eq("status", "in_progress").execute().data
+
+    def finish_idempotency_key(self, key: str, status_code: int, response):
+        fields = {"status": "done", "status_code": status_code, "response": response,
+                  "updated_at": timestamp()}
+        return self.client.table("IDEMPOTENCY_KEYS").update(fields).eq("key", key).execute().data
+
+    def release_idempotency_key(self, key: str):
+        return self.client.table("IDEMPOTENCY_KEYS").delete().eq("key", key).execute().data
+
+
+MINT_JOBS_SQLITE = """
+create table if not exists "MINT_JOBS" (
+    id integer primary key autoincrement,
+    wallet text not null,
+    tx_hash text unique,  -- null while the mint is reserved but not sent yet
+    status text not null default 'pending',
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+"""
+
+# one active (pending / confirmed) mint per wallet, see sql/008_mint_reservation.sql
+MINT_JOBS_ACTIVE_INDEX = """
+update "MINT_JOBS" set status = 'duplicate'
+where status in ('pending', 'confirmed')
+  and id not in (select min(id) from "MINT_JOBS" where status in ('pending', 'confirmed') group by wallet);
+create unique index if not exists mint_jobs_active_wallet_idx
+    on "MINT_JOBS" (wallet) where status in ('pending', 'confirmed');
+"""
+
+# locked_until as in sql/011_idempotency_lease.sql
+IDEMPOTENCY_KEYS_SQLITE = """
+create table if not exists "IDEMPOTENCY_KEYS" (
+    key text primary key,
+    request_hash text not null,
+    status text not null default 'in_progress',
+    status_code integer,
+    response text,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    locked_until text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+"""
+
+SQLITE_SCHEMA = """
+create table if not exists "USER_INFO" (
+    id integer primary key autoincrement,
+    wallet text not null unique,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    practice_sent integer not null default 0,
+    practice_received integer not null default 0,
+    completed_theory boolean not null default 0,
+    completed_practice boolean not null default 0,
+    completed_security boolean not null default 0,
+    completed_all boolean not null default 0,
+    claimed_nft boolean not null default 0,
+    last_drip text,
+    version integer not null default 0  -- bumped by the triggers below (SQLITE_TRIGGERS)
+);
+create table if not exists "USER_PROGRESS" (
+    id integer primary key autoincrement,
+    wallet text not null unique,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    flags integer not null default 0  -- lesson bitset, see progress.py
+);
+create table if not exists "MY_WALLET" (
+    id integer primary key autoincrement,
+    wallet text not null unique,
+    "balance-USDC" real not null default 0,
+    "balance-ETH" real not null default 0,
+    real_count integer not null default 0,
+    real_amount real not null default 0
+);
+create table if not exists "TX_VERIFICATION" (
+    key text primary key,
+    network text not null,
+    tx_hash text not null,
+    result text not null,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+""" + MINT_JOBS_SQLITE + """create index if not exists mint_jobs_wallet_idx on "MINT_JOBS" (wallet);
+""" + IDEMPOTENCY_KEYS_SQLITE + """create table if not exists "PAYOUT_JOBS" (
+    job_id text primary key,
+    kind text not null,
+    wallet text not null,
+    status text not null default 'queued',
+    tx_hash text,
+    msg text,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+create index if not exists payout_jobs_queued_idx on "PAYOUT_JOBS" (updated_at) where status = 'queued';
+"""
+
+# same as sql/007_user_version.sql - any update of a wallet's rows bumps USER_INFO.version
+SQLITE_TRIGGERS = """
+create trigger if not exists user_info_version after update on "USER_INFO"
+for each row when new.version = old.version
+begin
+    update "USER_INFO" set version = old.version + 1 where id = new.id;
+end;
+create trigger if not exists user_progress_version after update on "USER_PROGRESS"
+for each row
+begin
+    update "USER_INFO" set version = version + 1 where wallet = new.wallet;
+end;
+"""
+
+
+class SqliteStorage(Storage):
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("pragma journal_mode=WAL")
+        self.conn.execute("pragma synchronous=NORMAL")
+        self.conn.executescript(SQLITE_SCHEMA)
+        self._migrate_progress()
+        self._migrate_version()
+        self._migrate_mint_jobs()
+        self._migrate_idempotency_lease()
+        self.conn.executescript(SQLITE_TRIGGERS)
+        self.lock = threading.Lock()
+        # table -> {column: declared type}, used to whitelist identifiers and to map booleans back
+        self.columns = {}
+        for table in ("USER_INFO", "USER_PROGRESS", "MY_WALLET", "TX_VERIFICATION", "MINT_JOBS", "IDEMPOTENCY_KEYS", "PAYOUT_JOBS"):
+            rows = self.conn.execute(f'pragma table_info("{table}")').fetchall()
+            self.columns[table] = {row["name"]: row["type"].lower() for row in rows}
+
+    def _migrate_progress(self):
+        """DB files from before the bitset - boolean lesson columns -> flags."""
+        old_columns = {row["name"] for row in self.conn.execute('pragma table_info("USER_PROGRESS")')}
+        if "flags" in old_columns:
+            return
+        self.conn.execute("begin")
+        try:
+            self.conn.execute('alter table "USER_PROGRESS" add column flags integer not null default 0')
+            rows = self.conn.execute('select * from "USER_PROGRESS"').fetchall()
+            for row in rows:
+                flags = Progress.from_dict(dict(row)).flags
+                self.conn.execute('update "USER_PROGRESS" set flags = ? where id = ?', (flags, row["id"]))
+            for column in old_columns - {"id", "wallet", "created_at"}:
+                self.conn.execute(f'alter table "USER_PROGRESS" drop column "{column}"')
+            self.conn.execute("commit")
+        except Exception:
+            self.conn.execute("rollback")
+            raise
+
+    def _migrate_version(self):
+        """DB files from before USER_INFO.version."""
+        columns = {row["name"] for row in self.conn.execute('pragma table_info("USER_INFO")')}
+        if "version" not in columns:
+            self.conn.execute('alter table "USER_INFO" add column version integer not null default 0')
+
+    def _migrate_idempotency_lease(self):
+        """DB files from before IDEMPOTENCY_KEYS.locked_until (or with the nullable column)."""
+        columns = {row["name"]: row for row in self.conn.execute('pragma table_info("IDEMPOTENCY_KEYS")')}
+        if "locked_until" in columns and columns["locked_until"]["notnull"]:
+            return
+        # SQLite can't add NOT NULL with a non-constant default - copy into a new table;
+        # a missing lease counts as run out, old timestamps get the 'T' separator
+        locked_until = "locked_until" if "locked_until" in columns else "null"
+        self.conn.execute("begin")
+        try:
+            self.conn.execute('alter table "IDEMPOTENCY_KEYS" rename to "IDEMPOTENCY_KEYS_OLD"')
+            self.conn.execute(IDEMPOTENCY_KEYS_SQLITE)
+            self.conn.execute(
+                'insert into "IDEMPOTENCY_KEYS" select key, request_hash, status, status_code, response, '
+                "replace(created_at, ' ', 'T'), replace(updated_at, ' ', 'T'), "
+                f"replace(coalesce({locked_until}, created_at), ' ', 'T') from \"IDEMPOTENCY_KEYS_OLD\""
+            )
+            self.conn.execute('drop table "IDEMPOTENCY_KEYS_OLD"')
+            self.conn.execute("commit")
+        except Exception:
+            self.conn.execute("rollback")
+            raise
+
+    def _migrate_mint_jobs(self):
+        """DB files from before mint reservations - nullable tx_hash + one active job per wallet."""
+        columns = {row["name"]: row for row in self.conn.execute('pragma table_info("MINT_JOBS")')}
+        if columns["tx_hash"]["notnull"]:
+            # SQLite can't drop NOT NULL - copy into a new table
+            self.conn.execute("begin")
+            try:
+                self.conn.execute('alter table "MINT_JOBS" rename to "MINT_JOBS_OLD"')
+                self.conn.execute('drop index if exists mint_jobs_wallet_idx')
+                self.conn.execute(MINT_JOBS_SQLITE)
+                self.conn.execute('insert into "MINT_JOBS" select * from "MINT_JOBS_OLD"')
+                self.conn.execute('drop table "MINT_JOBS_OLD"')
+                self.conn.execute("commit")
+            except Exception:
+                self.conn.execute("rollback")
+                raise
+            self.conn.execute('create index if not exists mint_jobs_wallet_idx on "MINT_JOBS" (wallet)')
+        exists = self.conn.execute(
+            "select 1 from sqlite_master where type = 'index' and name = 'mint_jobs_active_wallet_idx'"
+        ).fetchone()
+        if not exists:
+            self.conn.executescript(MINT_JOBS_ACTIVE_INDEX)
+
+    def _column(self, table_name: str, field_name: str) -> str:
+        # table / field names come from the API - only known identifiers get into SQL
+        if table_name not in self.columns or field_name not in self.columns[table_name]:
+            raise ValueError(f"Unknown field {table_name}.{field_name}")
+        return f'"{field_name}"'
+
+    def _row(self, table_name: str, row):
+        if row is None:
+            return None
+        types = self.columns[table_name]
+        return {key: bool(row[key]) if types.get(key) == "boolean" and row[key] is not None else row[key]
+                for key in row.keys()}
+
+    def _query(self, table_name: str, sql: str, params=()):
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self._row(table_name, row) for row in rows]
+
+    def add_user(self, wallet: str):
+        with self.lock:
+            self.conn.execute("begin")
+            try:
+                info = self.conn.execute('insert into "USER_INFO" (wallet) values (?) returning *', (wallet,)).fetchall()
+                progress = self.conn.execute('insert into "USER_PROGRESS" (wallet) values (?) returning *', (wallet,)).fetchall()
+                self.conn.execute("commit")
+            except Exception:
+                self.conn.execute("rollback")
+                raise
+        return ([self._row("USER_INFO", row) for row in info],
+                [self._row("USER_PROGRESS", row) for row in progress])
+
+    def get_user_info(self, wallet: str):
+        rows = self._query("USER_INFO", 'select * from "USER_INFO" where wallet = ?', (wallet,))
+        return rows[0] if rows else None
+
+    def get_user_progress(self, wallet: str):
+        rows = self._query("USER_PROGRESS", 'select * from "USER_PROGRESS" where wallet = ?', (wallet,))
+        return rows[0] if rows else None
+
+    def get_user(self, wallet: str):
+        # one join, columns prefixed by table so info / progress can be split again
+        columns = ", ".join(
+            [f'i."{c}" as "i.{c}"' for c in self.columns["USER_INFO"]]
+            + [f'p."{c}" as "p.{c}"' for c in self.columns["USER_PROGRESS"]]
+        )
+        sql = f'select {columns} from "USER_INFO" i join "USER_PROGRESS" p on p.wallet = i.wallet where i.wallet = ?'
+        with self.lock:
+            row = self.conn.execute(sql, (wallet,)).fetchone()
+        if row is None:
+            return None
+        info = {key[2:]: row[key] for key in row.keys() if key.startswith("i.")}
+        progress = {key[2:]: row[key] for key in row.keys() if key.startswith("p.")}
+        return self._row("USER_INFO", info), self._row("USER_PROGRESS", progress)
+
+    def get_user_version(self, wallet: str):
+        rows = self._query("USER_INFO", 'select id, version from "USER_INFO" where wallet = ?', (wallet,))
+        return (rows[0]["id"], rows[0]["version"]) if rows else None
+
+    def get_field(self, table_name: str, field_name: str, wallet: str):
+        column = self._column(table_name, field_name)
+        rows = self._query(table_name, f'select {column} from "{table_name}" where wallet = ?', (wallet,))
+        return rows[0][field_name] if rows else None
+
+    def update_field(self, table_name: str, field_name: str, wallet: str, value):
+        return self.update_fields(table_name, wallet, {field_name: value})
+
+    def update_fields(self, table_name: str, wallet: str, fields: dict):
+        sets = ", ".join(f"{self._column(table_name, field)} = ?" for field in fields)
+        return self._query(table_name, f'update "{table_name}" set {sets} where wallet = ? returning *', (*fields.values(), wallet))
+
+    def set_progress_flags(self, wallet: str, set_mask: int, clear_mask: int = 0):
+        return self._query(
+            "USER_PROGRESS",
+            'update "USER_PROGRESS" set flags = (flags | ?) & ~? where wallet = ? returning *',
+            (set_mask, clear_mask, wallet),
+        )
+
+    def delete_user(self, wallet: str):
+        progress = self._query("USER_PROGRESS", 'delete from "USER_PROGRESS" where wallet = ? returning *', (wallet,))
+        info = self._query("USER_INFO", 'delete from "USER_INFO" where wallet = ? returning *', (wallet,))
+        return {"progress_deleted": progress, "info_deleted": info}
+
+    def increment_counters(self, changes: list):
+        statements = []
+        for table_name, wallet, deltas in changes:
+            if table_name not in ("USER_INFO", "MY_WALLET") or not deltas:
+                raise ValueError(f"Can't increment {table_name}")
+            sets = ", ".join(f"{self._column(table_name, field)} = {self._column(table_name, field)} + ?" for field in deltas)
+            sql = f'update "{table_name}" set {sets} where wallet = ? returning *'
+            statements.append((table_name, sql, (*deltas.values(), wallet)))
+
+        updated = []
+        with self.lock:
+            self.conn.execute("begin immediate")
+            try:
+                for table_name, sql, params in statements:
+                    row = self.conn.execute(sql, params).fetchone()
+                    if row is None:
+                        raise LookupError(f"No {table_name} row for wallet")
+                    updated.append(self._row(table_name, row))
+                self.conn.execute("commit")
+            except Exception:
+                self.conn.execute("rollback")
+                raise
+        return updated
+
+    def reserve_practice_payout(self, wallet: str):
+        return self._query(
+            "USER_INFO",
+            'update "USER_INFO" set practice_received = practice_received + 1 '
+            'where wallet = ? and practice_received < practice_sent returning *',
+            (wallet,),
+        )
+
+    def get_my_donations(self):
+        rows = self._query("MY_WALLET", 'select real_count, real_amount from "MY_WALLET" order by id limit 1')
+        return rows[0]["real_count"], rows[0]["real_amount"]
+
+    def get_verification(self, key: str):
+        rows = self._query("TX_VERIFICATION", 'select result from "TX_VERIFICATION" where key = ?', (key,))
+        return json.loads(rows[0]["result"]) if rows else None
+
+    def save_verification(self, key: str, network: str, tx_hash: str, result: dict):
+        return self._query(
+            "TX_VERIFICATION",
+            'insert into "TX_VERIFICATION" (key, network, tx_hash, result) values (?, ?, ?, ?) '
+            'on conflict (key) do update set result = excluded.result returning key',
+            (key, network, tx_hash.lower(), json.dumps(result)),
+        )
+
+    def reserve_mint_job(self, wallet: str):
+        # do nothing on the partial unique index = the wallet has an active job already
+        rows = self._query(
+            "MINT_JOBS",
+            'insert into "MINT_JOBS" (wallet) values (?) on conflict do nothing returning *',
+            (wallet,),
+        )
+        return rows[0] if rows else None
+
+    def set_mint_job(self, job_id: int, status: str, tx_hash: str = None):
+        return self._query(
+            "MINT_JOBS",
+            'update "MINT_JOBS" set status = ?, tx_hash = coalesce(?, tx_hash), updated_at = ? where id = ? returning *',
+            (status, tx_hash, timestamp(), job_id),
+        )
+
+    def update_mint_job(self, tx_hash: str, status: str):
+        return self._query(
+            "MINT_JOBS",
+            'update "MINT_JOBS" set status = ?, updated_at = ? where tx_hash = ? returning *',
+            (status, timestamp(), tx_hash),
+        )
+
+    def get_mint_job(self, wallet: str):
+        rows = self._query("MINT_JOBS", 'select * from "MINT_JOBS" where wallet = ? order by id desc limit 1', (wallet,))
+        return rows[0] if rows else None
+
+    def get_pending_mints(self):
+        return self._query("MINT_JOBS", 'select * from "MINT_JOBS" where status = \'pending\'')
+
+    def save_payout_jobs(self, jobs: list):
+        columns = ("job_id", "kind", "wallet", "status", "tx_hash", "msg", "created_at", "updated_at")
+        sql = (
+            f'insert into "PAYOUT_JOBS" ({", ".join(columns)}) values ({", ".join("?" * len(columns))}) '
+            'on conflict (job_id) do update set status = excluded.status, tx_hash = excluded.tx_hash, '
+            'msg = excluded.msg, updated_at = excluded.updated_at'
+        )
+        with self.lock:
+            self.conn.execute("begin immediate")
+            try:
+                self.conn.executemany(sql, [tuple(job[column] for column in columns) for job in jobs])
+                self.conn.execute("commit")
+            except Exception:
+                self.conn.execute("rollback")
+                raise
+        return jobs
+
+    def claim_payout_jobs(self, job_ids: list):
+        return self._query(
+            "PAYOUT_JOBS",
+            f'update "PAYOUT_JOBS" set status = \'sending\', updated_at = ? '
+            f'where job_id in ({", ".join("?" * len(job_ids))}) and status = \'queued\' returning *',
+            (timestamp(), *job_ids),
+        )
+
+    def get_payout_job(self, job_id: str):
+        rows = self._query("PAYOUT_JOBS", 'select * from "PAYOUT_JOBS" where job_id = ?', (job_id,))
+        return rows[0] if rows else None
+
+    def get_queued_payouts(self, before: str):
+        return self._query(
+            "PAYOUT_JOBS",
+            'select * from "PAYOUT_JOBS" where status = \'queued\' and updated_at < ?',
+            (before,),
+        )
+
+    def _idempotency_row(self, row):
+        if row is not None and row["response"] is not None:
+            row["response"] = json.loads(row["response"])
+        return row
+
+    def claim_idempotency_key(self, key: str, request_hash: str, lease: float):
+        now = timestamp()
+        locked_until = timestamp(lease)
+        rows = self._query(
+            "IDEMPOTENCY_KEYS",
+            'insert into "IDEMPOTENCY_KEYS" (key, request_hash, locked_until) values (?, ?, ?) '
+            'on conflict (key) do nothing returning *',
+            (key, request_hash, locked_until),
+        )
+        if rows:
+            return True, self._idempotency_row(rows[0])
+        # the request holding the key died - its lease ran out, this one takes over
+        rows = self._query(
+            "IDEMPOTENCY_KEYS",
+            'update "IDEMPOTENCY_KEYS" set locked_until = ?, updated_at = ? '
+            'where key = ? and request_hash = ? and status = \'in_progress\' '
+            'and locked_until < ? returning *',
+            (locked_until, now, key, request_hash, now),
+        )
+        if rows:
+            return True, self._idempotency_row(rows[0])
+        rows = self._query("IDEMPOTENCY_KEYS", 'select * from "IDEMPOTENCY_KEYS" where key = ?', (key,))
+        return False, self._idempotency_row(rows[0]) if rows else None
+
+    def extend_idempotency_key(self, key: str, lease: float):
+        return self._query(
+            "IDEMPOTENCY_KEYS",
+            'update "IDEMPOTENCY_KEYS" set locked_until = ? where key = ? and status = \'in_progress\' returning key',
+            (timestamp(lease), key),
+        )
+
+    def finish_idempotency_key(self, key: str, status_code: int, response):
+        return self._query(
+            "IDEMPOTENCY_KEYS",
+            'update "IDEMPOTENCY_KEYS" set status = \'done\', status_code = ?, response = ?, updated_at = ? '
+            'where key = ? returning key',
+            (status_code, json.dumps(response), timestamp(), key),
+        )
+
+    def release_idempotency_key(self, key: str):
+        return self._query("IDEMPOTENCY_KEYS", 'delete from "IDEMPOTENCY_KEYS" where key = ? returning key', (key,))
+
+
+_storage = None
+_storage_lock = threading.Lock()  # get_storage runs in asyncio.to_thread workers
+
+
+def create_storage() -> Storage:
+    backend = os.getenv("STORAGE_BACKEND", "supabase").lower()
+    if backend == "sqlite":
+        return SqliteStorage(os.getenv("SQLITE_PATH", "basecamp.db"))
+    if backend == "supabase":
+        return SupabaseStorage(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SECRET_KEY"))
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend}")
+
+
+def get_storage() -> Storage:
+    """Backend picked by STORAGE_BACKEND, created on first use."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                with coldstart.timed("storage"):
+                    _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage: Storage):
+    """Swap the backend (benchmarks / load tests)."""
+    global _storage
+    _storage = storage
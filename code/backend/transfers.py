@@ -0,0 +1,65 @@
+# ERC-20 Transfer matching straight on raw receipt logs.
+# Instead of ABI-decoding every log (contract.events.Transfer().process_receipt),
+# logs are filtered by contract address + topic0, the indexed from/to topics are
+# compared as bytes against pre-encoded targets and only the value of a matching
+# log is decoded. Works on web3-formatted receipts (HexBytes) and raw JSON-RPC
+# ones (hex strings) alike.
+TRANSFER_TOPIC = bytes.fromhex("ddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef")
+
+_PADDING = bytes(12)
+
+
+def _bytes(value) -> bytes:
+    """HexBytes / bytes pass through, '0x..' strings are decoded."""
+    if isinstance(value, (bytes, bytearray)):
+        return value
+    return bytes.fromhex(value[2:] if value[:2] in ("0x", "0X") else value)
+
+
+def address_topic(address: str) -> bytes:
+    """0xAbC... -> 32-byte topic (left padded)"""
+    return _PADDING + bytes.fromhex(address[2:])
+
+
+class TransferMatcher:
+    """Transfers of one token to one wallet, e.g. USDC -> our wallet."""
+
+    __slots__ = ("token", "to_topic")
+
+    def __init__(self, token_address: str, to_address: str):
+        self.token = token_address.lower()
+        self.to_topic = address_topic(to_address)
+
+    def match(self, logs):
+        """
+        -> (seen, [(from_topic, value), ...])
+        seen = any Transfer of the token at all (to anyone), the list only has
+        the transfers to our wallet, in log order.
+        """
+        seen = False
+        matches = []
+        for log in logs:
+            topics = log["topics"]
+            # Transfer(address indexed, address indexed, uint256) = exactly 3 topics,
+            # ERC-721 Transfer has the same topic0 but 4 topics
+            if len(topics) != 3 or _bytes(topics[0]) != TRANSFER_TOPIC:
+                continue
+            if log["address"].lower() != self.token:
+                continue
+            seen = True
+            if _bytes(topics[2]) != self.to_topic:
+                continue
+            data = _bytes(log["data"])
+            matches.append((_bytes(topics[1]), int.from_bytes(data[:32], "big")))
+        return seen, matches
+
+
+_matchers = {}
+
+
+def get_matcher(token_address: str, to_address: str) -> TransferMatcher:
+    key = (token_address.lower(), to_address.lower())
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers[key] = TransferMatcher(token_address, to_address)
+    return matcher
@@ -0,0 +1,59 @@
+import os
+from collections import OrderedDict
+
+import database
+
+# Cache for verification results of finalized transactions.
+# Tier 1: in-process LRU, tier 2 (optional): TX_VERIFICATION table in the DB.
+# A result is stored only once its block has CONFIRMATIONS blocks on top of it,
+# after that the receipt can't change, so a repeated verify costs no RPC call.
+CONFIRMATIONS = int(os.getenv("VERIFY_CONFIRMATIONS", "10"))
+CACHE_SIZE = int(os.getenv("VERIFY_CACHE_SIZE", "10000"))
+PERSIST = os.getenv("VERIFY_CACHE_PERSIST", "false").lower() in ("1", "true", "yes")
+
+_lru = OrderedDict()
+
+
+def make_key(network: str, tx_hash: str, token: str, sender: str, *extra) -> str:
+    """(network, tx_hash, token, sender, recipient/amount) -> cache key"""
+    parts = [network, tx_hash, token, sender, *extra]
+    return "|".join(str(p).lower() for p in parts)
+
+
+def is_final(block_number, head) -> bool:
+    if block_number is None or head is None:
+        return False
+    return head - block_number >= CONFIRMATIONS
+
+
+def _remember(key: str, result: dict):
+    _lru[key] = result
+    _lru.move_to_end(key)
+    while len(_lru) > CACHE_SIZE:
+        _lru.popitem(last=False)
+
+
+def get(key: str):
+    result = _lru.get(key)
+    if result is not None:
+        _lru.move_to_end(key)
+        return dict(result)
+
+    if not PERSIST:
+        return None
+
+    result = database.get_verification(key)
+    if result is None:
+        return None
+    _remember(key, result)
+    return dict(result)
+
+
+def put(key: str, network: str, tx_hash: str, result: dict):
+    _remember(key, dict(result))
+    if PERSIST:
+        database.save_verification(key, network, tx_hash, result)
+
+
+def clear():
+    _lru.clear()
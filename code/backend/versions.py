@@ -0,0 +1,64 @@
+import os
+import time
+
+
+# Per-wallet version of the user state (USER_INFO + USER_PROGRESS) for ETags.
+# USER_INFO.version is bumped by DB triggers on every update of the wallet's rows
+# (sql/007_user_version.sql), the row id tells a re-created user apart.
+# Known versions are kept in memory: writes made by this process drop the entry
+# right away (database.py), writes made by other instances show up within TTL.
+TTL = float(os.getenv("USER_VERSION_TTL", "5"))
+MAX_CACHED = int(os.getenv("USER_VERSION_MAX_CACHED", "100000"))
+
+_versions = {}  # wallet -> (expires, etag)
+_writes = 0  # bumped by forget() - a read that overlapped a write isn't kept
+
+
+def etag(row_id, version) -> str:
+    return f'W/"{row_id}.{version}"'
+
+
+def field_etag(tag: str, table_name: str, field_name: str) -> str:
+    """get-field responses of one wallet all share its POST URL - the tag names the field too."""
+    return f'{tag[:-1]}.{table_name}.{field_name}"'
+
+
+def get(wallet: str):
+    hit = _versions.get(wallet)
+    if hit is None:
+        return None
+    if hit[0] <= time.monotonic():
+        del _versions[wallet]
+        return None
+    return hit[1]
+
+
+def writes() -> int:
+    """Take before reading a version from the DB, pass to remember()."""
+    return _writes
+
+
+def remember(wallet: str, tag: str, since: int):
+    if since != _writes:
+        return
+    if len(_versions) >= MAX_CACHED:
+        now = time.monotonic()
+        for key in [k for k, v in _versions.items() if v[0] <= now]:
+            del _versions[key]
+        if len(_versions) >= MAX_CACHED:
+            _versions.clear()
+    _versions[wallet] = (time.monotonic() + TTL, tag)
+
+
+def forget(wallet: str):
+    global _writes
+    _writes += 1
+    _versions.pop(wallet, None)
+
+
+def matches(if_none_match: str, tag: str) -> bool:
+    """If-None-Match header (one or more ETags, or *) against the current ETag."""
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison - W/ prefixes don't matter
+    return tag.removeprefix("W/") in (value.strip().removeprefix("W/") for value in if_none_match.split(","))
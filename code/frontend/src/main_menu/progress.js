@@ -192,6 +192,22 @@ function showNftModal() {
 
 
 // === HANDLER PRO MINT (BACKEND VERZE) ===
+// Backend vrací tx hash hned po odeslání mintu - stav hlídáme přes /api/mint-status
+async function waitForMint(wallet, tries = 60) {
+  for (let i = 0; i < tries; i++) {
+    const res = await fetch(`${API_BASE}/api/mint-status`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ wallet: wallet })
+    });
+    const job = await res.json();
+    if (res.ok && job.status === 'confirmed') return job;
+    if (res.ok && job.status === 'failed') throw new Error("Mint transaction reverted");
+    await new Promise((r) => setTimeout(r, 2000));
+  }
+  throw new Error("Mint is taking too long, check your wallet later.");
+}
+
 async function handlePaidClaim(ethProvider, wallet) {
   const mintBtn = document.getElementById('mintNftBtn');
   const ADMIN_WALLET = "0x5b9aCe009440c286E9A236f90118343fc61Ee48F";
@@ -256,6 +272,10 @@ async function handlePaidClaim(ethProvider, wallet) {
         throw new Error(result.detail || "Server mint failed");
     }
 
+    // Mint je odeslaný, čekáme na potvrzení na chainu
+    mintBtn.textContent = "Confirming mint...";
+    await waitForMint(wallet);
+
     // 5. UPDATE UI PO ÚSPĚCHU
     mintBtn.textContent = "NFT Delivered!";
 
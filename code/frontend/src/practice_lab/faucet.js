@@ -5,6 +5,24 @@ const API_BASE = 'https://learn-base-backend.vercel.app';
 let currentWallet = null;
 let addedProgress = false;
 
+// Payout běží na backendu ve frontě - počkáme na tx hash
+async function waitForPayout(jobId, tries = 30) {
+  for (let i = 0; i < tries; i++) {
+    const res = await fetch(`${API_BASE}/api/testnet/payout-status`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ job_id: jobId }),
+    });
+    const job = await res.json();
+    if (!res.ok) return { success: false, msg: job.detail };
+    // "sent" = broadcast, "confirmed" = mined (the backend keeps watching sent payouts)
+    if (job.status === "sent" || job.status === "confirmed") return { success: true, tx_hash: job.tx_hash };
+    if (job.status === "failed") return { success: false, msg: job.msg };
+    await new Promise((r) => setTimeout(r, 1000));
+  }
+  return { success: false, msg: "Payout is taking too long. Try again later." };
+}
+
 // 1. ZÍSKÁNÍ PENĚŽENKY (OPTIMALIZOVANÉ)
 async function getWallet() {
   if (currentWallet) return currentWallet;
@@ -113,7 +131,10 @@ async function claimEthFaucet() {
             body: JSON.stringify({ wallet: wallet }),
         });
 
-        const data = await res.json();
+        let data = await res.json();
+        if (res.ok && data.success && data.job_id) {
+            data = await waitForPayout(data.job_id);
+        }
 
         if (res.ok && data.success) {
             // Úspěch
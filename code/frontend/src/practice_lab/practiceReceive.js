@@ -44,6 +44,25 @@ async function updateReceiveProgress(wallet) {
   return res.ok;
 }
 
+// Payout běží na backendu ve frontě - čekáme, až je tx vytěžená (nebo selže / revertne)
+async function waitForPayout(jobId, onSent, tries = 60) {
+  for (let i = 0; i < tries; i++) {
+    const res = await fetch(`${API_BASE}/api/testnet/payout-status`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ job_id: jobId }),
+    });
+    const job = await res.json();
+    if (!res.ok) return { success: false, msg: job.detail };
+    // "sent" = broadcast, only "confirmed" (mined) means the USDC arrived
+    if (job.status === "confirmed") return { success: true, tx_hash: job.tx_hash };
+    if (job.status === "failed") return { success: false, msg: job.msg };
+    if (job.status === "sent" && onSent) onSent(job.tx_hash);
+    await new Promise((r) => setTimeout(r, 1000));
+  }
+  return { success: false, msg: "Payout is taking too long. Check your wallet later." };
+}
+
 // === 2. LOGIKA RECEIVE ===
 window.requestTestUSDC = async function() {
   const walletInput = document.getElementById('walletInput');
@@ -64,15 +83,24 @@ window.requestTestUSDC = async function() {
     statusDiv.className = 'info-box';
     statusDiv.innerHTML = 'Asking your friend to send you USDC...';
 
-    const response = await fetch('https://learn-base-backend.vercel.app/api/testnet/send-test', {
+    const response = await fetch(`${API_BASE}/api/testnet/send-test`, {
       method: 'POST', headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ wallet: address }),
     });
 
-    const result = await response.json();
+    let result = await response.json();
 
     if (!response.ok || !result.success) throw new Error(result.msg || result.detail || 'Failed to send USDC');
 
+    // send-test only queues the payout - success is shown once it's mined
+    if (result.job_id) {
+      statusDiv.innerHTML = 'Your friend is sending the USDC...';
+      result = await waitForPayout(result.job_id, () => {
+        statusDiv.innerHTML = 'USDC sent, waiting for the network to confirm it...';
+      });
+      if (!result.success) throw new Error(result.msg || 'Failed to send USDC');
+    }
+
     updateReceiveProgress(address);
 
     statusDiv.style.display = 'none';
@@ -80,7 +108,7 @@ window.requestTestUSDC = async function() {
     showModal('success', `
         <strong>Payment Received!</strong><br><br>
         Your friend sent you <strong>1 USDC</strong> on Base Sepolia!<br>
-        <small style="color: #94a3b8;">Transaction should appear in 10–30s</small>
+        <small style="color: #94a3b8;">Tx: ${result.tx_hash}</small>
     `);
 
   } catch (error) {